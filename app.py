@@ -1,11 +1,16 @@
-from flask import Flask, send_from_directory, request, jsonify
+from flask import Flask, Response, send_from_directory, request, jsonify
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 import os
+import sys
 from datetime import datetime
 import json
 import time
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+from compression import SUFFIXES, open_input
+from logindex import LogIndex, case_index_dir
+
 
 app = Flask(__name__, static_url_path='')
 CORS(app)
@@ -17,6 +22,9 @@ ALLOWED_EXTENSIONS = {'txt', 'pdf', 'png', 'jpg', 'jpeg', 'gif', 'docx', 'xlsx',
 # Ensure upload folder exists
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Opened log indexes, keyed by index directory: (terms.idx mtime, LogIndex)
+open_indexes = {}
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
@@ -161,10 +169,69 @@ def get_case_files(case_id):
         
     return jsonify(manifest)
 
+def get_case_index(case_id):
+    """Open (or reuse) the log index built for a case, or return None."""
+    index_dir = case_index_dir(os.path.join(UPLOAD_FOLDER, case_id))
+    terms_path = os.path.join(index_dir, 'terms.idx')
+    if not os.path.exists(terms_path):
+        return None
+
+    mtime = os.path.getmtime(terms_path)
+    cached = open_indexes.get(index_dir)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    if cached:
+        cached[1].close()
+    index = LogIndex(index_dir)
+    open_indexes[index_dir] = (mtime, index)
+    return index
+
+@app.route('/api/cases/<case_id>/search', methods=['GET'])
+def search_case_logs(case_id):
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Missing query parameter q'}), 400
+
+    index = get_case_index(secure_filename(case_id))
+    if index is None:
+        return jsonify({'error': 'No log index found for case'}), 404
+
+    limit = request.args.get('limit', 100, type=int)
+    start = time.perf_counter()
+    results = index.search(query, limit=limit)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    return jsonify({
+        'query': query,
+        'count': len(results),
+        'elapsed_ms': round(elapsed_ms, 2),
+        'results': results
+    })
+
+def stream_decompressed(path, chunk_size=1024 * 1024):
+    """Yield the decompressed content of a .gz/.zst file in chunks."""
+    with open_input(path) as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
 # Download route for accessing uploaded files
 @app.route('/api/download/<path:filepath>')
 def download_file(filepath):
     try:
+        # Outputs may be stored compressed; serve them decompressed under the plain name
+        full_path = os.path.join(UPLOAD_FOLDER, filepath)
+        inside_uploads = os.path.abspath(full_path).startswith(os.path.abspath(UPLOAD_FOLDER) + os.sep)
+        if inside_uploads and not os.path.exists(full_path):
+            for suffix in SUFFIXES.values():
+                if os.path.exists(full_path + suffix):
+                    return Response(
+                        stream_decompressed(full_path + suffix),
+                        mimetype='application/octet-stream',
+                        headers={'Content-Disposition': f'attachment; filename="{os.path.basename(filepath)}"'}
+                    )
         return send_from_directory(UPLOAD_FOLDER, filepath)
     except Exception as e:
         return jsonify({'error': f'Error accessing file: {str(e)}'}), 404
@@ -0,0 +1,64 @@
+import hashlib
+import os
+import tempfile
+import threading
+from compression import SUFFIXES, normalize_compression, open_output
+
+
+class BlobStore:
+    """Content-addressed store for extracted artifacts.
+
+    Blobs live under ``objects/<first two hex digits>/<sha256>``, so files
+    with the same content are written once no matter how many source paths
+    they were found at. The SHA-256 is computed while the data is copied,
+    over the uncompressed bytes when blobs are stored gzip/zstd compressed.
+    Source paths are mapped to hashes by the run's ExtractionManifest.
+    """
+
+    def __init__(self, root, compression=None):
+        self.root = root
+        self.compression = normalize_compression(compression)
+        self.objects_dir = os.path.join(root, "objects")
+        self._lock = threading.Lock()
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+    def blob_path(self, digest):
+        """Return the location of the blob with the given SHA-256."""
+        suffix = SUFFIXES[self.compression] if self.compression else ""
+        return os.path.join(self.objects_dir, digest[:2], digest + suffix)
+
+    def remove_partial(self):
+        """Delete temporary files left behind by an interrupted run."""
+        removed = 0
+        for name in os.listdir(self.objects_dir):
+            if name.endswith(".tmp"):
+                os.remove(os.path.join(self.objects_dir, name))
+                removed += 1
+        return removed
+
+    def put(self, chunks):
+        """Store the data yielded by chunks, returning (digest, blob_path, size, is_new)."""
+        sha256 = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.objects_dir, suffix=".tmp")
+        os.close(fd)
+        try:
+            with open_output(tmp_path, self.compression) as tmp_file:
+                for data in chunks:
+                    sha256.update(data)
+                    tmp_file.write(data)
+                    size += len(data)
+
+            digest = sha256.hexdigest()
+            blob_path = self.blob_path(digest)
+            with self._lock:
+                if os.path.exists(blob_path):
+                    os.remove(tmp_path)
+                    return digest, blob_path, size, False
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                os.replace(tmp_path, blob_path)
+            return digest, blob_path, size, True
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
@@ -0,0 +1,72 @@
+import mmap
+import os
+from pcap import DEFAULT_BATCH_SIZE, PCAP_MAGIC, PcapFormatError, iter_pcap_buffer, iter_pcap_packets
+from pcapng import iter_pcapng_buffer, iter_pcapng_packets
+
+
+PCAPNG_MAGIC = b"\x0a\x0d\x0d\x0a"
+CAPTURE_EXTENSIONS = (".pcap", ".pcapng", ".cap")
+
+
+def detect_capture_format(header):
+    """Return "pcap", "pcapng" or None for the first bytes of a file."""
+    magic = bytes(header[:4])
+    if magic in PCAP_MAGIC:
+        return "pcap"
+    if magic == PCAPNG_MAGIC:
+        return "pcapng"
+    return None
+
+
+def iter_capture_packets(stream, chunk_size=16 * 1024 * 1024):
+    """Yield PACKET_DTYPE arrays for a pcap or pcapng stream (anything with peek, e.g. a BufferedReader)."""
+    capture_format = detect_capture_format(stream.peek(4)[:4])
+    if capture_format == "pcap":
+        return iter_pcap_packets(stream, chunk_size)
+    if capture_format == "pcapng":
+        return iter_pcapng_packets(stream, chunk_size)
+    raise PcapFormatError("Not a pcap or pcapng capture file")
+
+
+class CaptureFile:
+    """A capture file on local disk, read through mmap.
+
+    Packets are decoded straight from the mapping in batches, and
+    ``payload`` returns a zero-copy memoryview of a packet's captured bytes
+    using its ``offset`` column. Views must be released before ``close``.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mmap = None
+        if os.fstat(self._file.fileno()).st_size:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.format = detect_capture_format(self._mmap[:4] if self._mmap else b"")
+        if self.format is None:
+            self.close()
+            raise PcapFormatError(f"{path} is not a pcap or pcapng capture file")
+
+    def packets(self, batch_size=DEFAULT_BATCH_SIZE):
+        """Yield PACKET_DTYPE arrays of at most batch_size packets."""
+        if self.format == "pcap":
+            return iter_pcap_buffer(self._mmap, batch_size)
+        return iter_pcapng_buffer(self._mmap, batch_size)
+
+    def payload(self, packet):
+        """Return the captured bytes of a packet row as a memoryview into the mapping."""
+        offset = int(packet["offset"])
+        return memoryview(self._mmap)[offset:offset + int(packet["caplen"])]
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,163 @@
+import json
+import os
+import threading
+from datetime import datetime
+from compression import resolve_input_path
+
+
+class CheckpointJournal:
+    """Append-only progress journal for resumable extraction runs.
+
+    Finished artifacts and directories are appended as JSON lines, in
+    batches of batch_size entries. Before a batch is written, every sink
+    attached with attach() (record writers, the manifest) is flushed, so an
+    artifact is only journaled once its output is on disk and a crash can
+    at most lose journal entries, never records of a journaled artifact.
+    close() writes the last batch. With resume=True an existing journal is loaded and ``is_done`` reports the
+    work that can be skipped; an artifact only counts as done while its
+    outputs still exist. Without resume the journal starts empty.
+
+    A directory is held while it is traversed, by every job queued for a
+    file in it and by each of its subdirectories. It is journaled once
+    nothing holds it any more, so a failed job keeps its directory and all
+    parents open and they are revisited on resume.
+
+    stamp() may return extra fields stored with every entry, and valid(entry)
+    may reject entries loaded from a previous run (e.g. when their output
+    never reached disk).
+    """
+
+    def __init__(self, path, resume=False, stamp=None, valid=None, batch_size=64):
+        self.path = path
+        self.resume = resume
+        self.stamp = stamp
+        self.valid = valid
+        self.batch_size = batch_size
+        self.sinks = []
+        self._unsaved = []
+        self._entries = {}
+        self._pending = {}
+        self._parents = {}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if resume and os.path.exists(path):
+            self._load()
+            print(f"Resuming from {path}: {len(self._entries)} finished directories and artifacts")
+        self._file = open(path, "a" if resume else "w", encoding="utf-8")
+        if resume and self._file.tell() and not self._ends_with_newline():
+            self._file.write("\n")  # terminate a line torn by the crash
+
+    def _load(self):
+        with open(self.path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                self._entries[(entry.get("type"), entry.get("name"))] = entry
+
+    def _ends_with_newline(self):
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def is_done(self, name, kind="artifact"):
+        """Return True if a previous run finished name and its outputs are intact."""
+        entry = self._entries.get((kind, name))
+        if entry is None:
+            return False
+        if self.valid and not self.valid(entry):
+            return False
+        return all(os.path.exists(resolve_input_path(path)) for path in entry.get("outputs", []))
+
+    def dir_done(self, dir_path):
+        return self.is_done(dir_path, kind="dir")
+
+    def _append(self, kind, name, outputs=None, **fields):
+        entry = {"type": kind, "name": name, "outputs": list(outputs or [])}
+        entry.update(fields)
+        if self.stamp:
+            entry.update(self.stamp())
+        entry["finished_at"] = datetime.utcnow().isoformat() + "Z"
+        self._entries[(kind, name)] = entry
+        # Kept in order, so a directory is never written before the artifacts in it
+        self._unsaved.append(entry)
+        if len(self._unsaved) >= self.batch_size:
+            self._save()
+
+    def _save(self):
+        if not self._unsaved:
+            return
+        for sink in self.sinks:
+            sink.flush()
+        self._file.write("".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in self._unsaved))
+        self._file.flush()
+        self._unsaved = []
+
+    def attach(self, *sinks):
+        """Flush these sinks (anything with flush()) before journal entries are written."""
+        with self._lock:
+            self.sinks.extend(sinks)
+
+    def flush(self):
+        with self._lock:
+            self._save()
+
+    def mark_artifact(self, name, outputs=None, **fields):
+        """Journal an artifact as finished, with the files it produced."""
+        with self._lock:
+            self._append("artifact", name, outputs, **fields)
+
+    def enter(self, dir_path, parent=None):
+        """Start traversing dir_path; holds it (and parent) until release()."""
+        with self._lock:
+            self._pending[dir_path] = 1
+            if parent in self._pending:
+                self._parents[dir_path] = parent
+                self._pending[parent] += 1
+
+    def hold(self, dir_path):
+        with self._lock:
+            if dir_path in self._pending:
+                self._pending[dir_path] += 1
+
+    def release(self, dir_path):
+        """Drop one hold; journal the directory and release its parent at zero."""
+        with self._lock:
+            while dir_path in self._pending:
+                self._pending[dir_path] -= 1
+                if self._pending[dir_path]:
+                    return
+                del self._pending[dir_path]
+                self._append("dir", dir_path)
+                dir_path = self._parents.pop(dir_path, None)
+
+    def track(self, name, dir_path, func):
+        """Hold dir_path and return func wrapped to journal name once it succeeds.
+
+        A job that raises or returns False counts as failed. A string return
+        value is journaled as the artifact's output file.
+        """
+        self.hold(dir_path)
+
+        def job(*args, **kwargs):
+            result = func(*args, **kwargs)
+            if result is not False:
+                self.mark_artifact(name, outputs=[result] if isinstance(result, str) else None)
+                self.release(dir_path)
+            return result
+
+        return job
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._save()
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,153 @@
+import gzip
+import io
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import zstandard
+except ImportError:  # optional; gzip is always available
+    zstandard = None
+
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+DEFAULT_COMPRESSION = "zstd" if zstandard else "gzip"
+COMPRESSION_CHOICES = ["none", "gzip", "zstd"]
+
+
+def normalize_compression(compression):
+    """Map a user supplied compression name to gzip/zstd/None."""
+    if compression in (None, "", "none"):
+        return None
+    if compression == "zstd" and zstandard is None:
+        print("Warning: zstandard is not installed, falling back to gzip")
+        return "gzip"
+    if compression not in SUFFIXES:
+        raise ValueError(f"Unknown compression: {compression}")
+    return compression
+
+
+def output_path(path, compression):
+    """Return path with the suffix of the given compression appended."""
+    compression = normalize_compression(compression)
+    return path + SUFFIXES[compression] if compression else path
+
+
+class ParallelGzipWriter(io.BufferedIOBase):
+    """Gzip writer that compresses fixed-size blocks on a thread pool.
+
+    Every block becomes its own gzip member, in order, which any gzip
+    reader decompresses as one stream (the same trick as pigz). zlib
+    releases the GIL, so large outputs compress on all cores.
+    """
+
+    def __init__(self, path, level=6, threads=None, block_size=1024 * 1024, append=False):
+        super().__init__()
+        self._file = open(path, "ab" if append else "wb")
+        self._level = level
+        self._block_size = block_size
+        self._threads = threads or os.cpu_count() or 1
+        self._executor = ThreadPoolExecutor(max_workers=self._threads)
+        self._pending = deque()
+        self._buffer = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer += data
+        while len(self._buffer) >= self._block_size:
+            self._submit(bytes(self._buffer[:self._block_size]))
+            del self._buffer[:self._block_size]
+        return len(data)
+
+    def _submit(self, block):
+        self._pending.append(self._executor.submit(gzip.compress, block, self._level, mtime=0))
+        # Bound the number of compressed blocks waiting to be written
+        while len(self._pending) > 2 * self._threads:
+            self._file.write(self._pending.popleft().result())
+
+    def flush(self):
+        """Compress the buffered data as a member of its own and write out every pending block.
+
+        Everything written before the flush can then be read back even if
+        the process dies before close().
+        """
+        if self._file.closed:
+            return
+        if self._buffer:
+            self._submit(bytes(self._buffer))
+            self._buffer = bytearray()
+        while self._pending:
+            self._file.write(self._pending.popleft().result())
+        self._file.flush()
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self._buffer:
+                self._submit(bytes(self._buffer))
+                self._buffer = bytearray()
+            while self._pending:
+                self._file.write(self._pending.popleft().result())
+            self._file.close()
+        finally:
+            self._executor.shutdown(wait=True)
+            super().close()
+
+
+def open_output(path, compression=None, level=None, threads=None, encoding=None, newline=None,
+                append=False):
+    """Open a (possibly compressed) output stream for writing.
+
+    path is used as given; use ``output_path`` to add the matching suffix.
+    With an encoding, a text stream is returned. Appending to a compressed
+    file adds a new gzip member / zstd frame, which readers handle.
+    """
+    compression = normalize_compression(compression)
+    mode = "ab" if append else "wb"
+    if compression == "gzip":
+        stream = ParallelGzipWriter(path, level=level or 6, threads=threads, append=append)
+    elif compression == "zstd":
+        cctx = zstandard.ZstdCompressor(level=level or 3, threads=-1 if threads is None else threads)
+        stream = cctx.stream_writer(open(path, mode), closefd=True)
+    else:
+        stream = open(path, mode)
+
+    if encoding:
+        return io.TextIOWrapper(stream, encoding=encoding, newline=newline)
+    return stream
+
+
+def resolve_input_path(path):
+    """Return path, or its .gz/.zst sibling if only the compressed form exists."""
+    if os.path.exists(path):
+        return path
+    for suffix in SUFFIXES.values():
+        if os.path.exists(path + suffix):
+            return path + suffix
+    return path
+
+
+def open_input(path, encoding=None, newline=None):
+    """Open a file for reading, decompressing gzip/zstd content transparently."""
+    path = resolve_input_path(path)
+    with open(path, "rb") as f:
+        magic = f.read(4)
+
+    if magic.startswith(GZIP_MAGIC):
+        stream = gzip.open(path, "rb")
+    elif magic == ZSTD_MAGIC:
+        if zstandard is None:
+            raise RuntimeError(f"{path} is zstd compressed but zstandard is not installed")
+        dctx = zstandard.ZstdDecompressor()
+        stream = io.BufferedReader(dctx.stream_reader(open(path, "rb"), read_across_frames=True, closefd=True))
+    else:
+        stream = open(path, "rb")
+
+    if encoding:
+        return io.TextIOWrapper(stream, encoding=encoding, newline=newline)
+    return stream
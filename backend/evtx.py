@@ -0,0 +1,484 @@
+import struct
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+
+# EVTX layout: a 4 KiB file header followed by independent 64 KiB chunks.
+# Every chunk carries its own string and template tables, so chunks can be
+# parsed in separate processes without sharing any state.
+FILE_HEADER_SIZE = 4096
+CHUNK_SIZE = 65536
+FILE_SIGNATURE = b"ElfFile\x00"
+CHUNK_SIGNATURE = b"ElfChnk\x00"
+RECORD_SIGNATURE = b"\x2a\x2a\x00\x00"
+RECORDS_START = 512
+
+# Tokens allowed in element content besides elements, EndElement and PIs
+VALUE_TOKENS = (0x05, 0x07, 0x08, 0x09, 0x0D, 0x0E)
+
+FILETIME_EPOCH = datetime(1601, 1, 1)
+
+
+class EvtxFormatError(Exception):
+    pass
+
+
+class _Substitution:
+    """Placeholder left in a template tree for a substitution value."""
+    __slots__ = ("index", "optional")
+
+    def __init__(self, index, optional):
+        self.index = index
+        self.optional = optional
+
+
+class _Element:
+    __slots__ = ("name", "attrs", "children")
+
+    def __init__(self, name, attrs, children):
+        self.name = name
+        self.attrs = attrs
+        self.children = children
+
+    def text(self):
+        parts = []
+        for child in self.children:
+            if isinstance(child, _Element):
+                continue
+            if isinstance(child, list):
+                parts.append(",".join(str(v) for v in child))
+            elif child is not None:
+                parts.append(str(child))
+        return "".join(parts)
+
+    def find(self, name):
+        for child in self.children:
+            if isinstance(child, _Element) and child.name == name:
+                return child
+        return None
+
+    def elements(self):
+        return [child for child in self.children if isinstance(child, _Element)]
+
+
+def filetime_to_iso(filetime):
+    """Convert a Windows FILETIME (100ns ticks since 1601) to ISO 8601."""
+    if not filetime:
+        return None
+    try:
+        return (FILETIME_EPOCH + timedelta(microseconds=filetime // 10)).isoformat() + "Z"
+    except OverflowError:
+        return None
+
+
+def _systemtime_to_iso(data):
+    year, month, _, day, hour, minute, second, millis = struct.unpack("<8H", data[:16])
+    try:
+        return datetime(year, month, day, hour, minute, second, millis * 1000).isoformat() + "Z"
+    except ValueError:
+        return None
+
+
+def _sid_to_str(data):
+    revision, count = data[0], data[1]
+    authority = int.from_bytes(data[2:8], "big")
+    subauthorities = struct.unpack_from(f"<{count}I", data, 8)
+    return "S-{}-{}".format(revision, authority) + "".join(f"-{s}" for s in subauthorities)
+
+
+# Fixed-width substitution value types: type -> (struct format, formatter)
+_FIXED_TYPES = {
+    0x03: ("<b", None),
+    0x04: ("<B", None),
+    0x05: ("<h", None),
+    0x06: ("<H", None),
+    0x07: ("<i", None),
+    0x08: ("<I", None),
+    0x09: ("<q", None),
+    0x0A: ("<Q", None),
+    0x0B: ("<f", None),
+    0x0C: ("<d", None),
+    0x0D: ("<I", bool),
+    0x11: ("<Q", filetime_to_iso),
+    0x14: ("<I", hex),
+    0x15: ("<Q", hex),
+}
+
+
+class _ChunkParser:
+    """Binary XML decoder for the records of a single chunk."""
+
+    def __init__(self, data):
+        self.data = data
+        self._names = {}
+        self._templates = {}
+        self._expanding = set()
+
+    def u8(self, pos):
+        return self.data[pos]
+
+    def u16(self, pos):
+        return struct.unpack_from("<H", self.data, pos)[0]
+
+    def u32(self, pos):
+        return struct.unpack_from("<I", self.data, pos)[0]
+
+    def name(self, offset):
+        """Return the element/attribute name stored at a chunk offset."""
+        name = self._names.get(offset)
+        if name is None:
+            length = self.u16(offset + 6)
+            name = self.data[offset + 8:offset + 8 + length * 2].decode("utf-16-le", errors="replace")
+            self._names[offset] = name
+        return name
+
+    def _name_ref(self, pos):
+        """Read a name offset at pos, skipping the name if it is defined inline."""
+        offset = self.u32(pos)
+        pos += 4
+        if offset == pos:
+            pos += 10 + self.u16(pos + 6) * 2
+        return self.name(offset), pos
+
+    # Token stream -> tree
+
+    def parse_fragment(self, pos, values=None, end=None):
+        """Parse a fragment (header plus element or template instance) that ends before end."""
+        end = len(self.data) if end is None else end
+        nodes = []
+        while pos < end:
+            token = self.u8(pos)
+            if token == 0x00:  # EndOfStream
+                pos += 1
+                break
+            elif token == 0x0F:  # FragmentHeader
+                pos += 4
+            elif token == 0x0C:  # TemplateInstance
+                instance, pos = self._template_instance(pos)
+                nodes.extend(instance)
+                break
+            elif token & 0x0F == 0x01:
+                element, pos = self._element(pos, values)
+                nodes.append(element)
+            else:
+                raise EvtxFormatError(f"Unexpected token 0x{token:02x} at offset {pos}")
+        return nodes, pos
+
+    def _element(self, pos, values):
+        token = self.u8(pos)
+        pos += 7  # token, dependency id, data size
+        name, pos = self._name_ref(pos)
+        attrs = {}
+        if token & 0x40:
+            pos += 4  # attribute list size
+            while self.u8(pos) in (0x06, 0x46):
+                attr_name, pos = self._name_ref(pos + 1)
+                parts, pos = self._values(pos, values)
+                attrs[attr_name] = parts
+
+        token = self.u8(pos)
+        pos += 1
+        children = []
+        if token == 0x03:  # CloseEmptyElement
+            return _Element(name, attrs, children), pos
+        if token != 0x02:
+            raise EvtxFormatError(f"Expected CloseStartElement at offset {pos - 1}")
+
+        while True:
+            token = self.u8(pos)
+            kind = token & 0x0F
+            if kind == 0x04:  # EndElement
+                pos += 1
+                break
+            elif kind == 0x01:
+                child, pos = self._element(pos, values)
+                children.append(child)
+            elif kind == 0x0A:  # PITarget
+                _, pos = self._name_ref(pos + 1)
+            elif kind == 0x0B:  # PIData
+                pos += 3 + self.u16(pos + 1) * 2
+            elif kind in VALUE_TOKENS:
+                parts, pos = self._values(pos, values)
+                children.extend(parts)
+            else:
+                raise EvtxFormatError(f"Unexpected token 0x{token:02x} in element content at offset {pos}")
+        return _Element(name, attrs, children), pos
+
+    def _values(self, pos, values):
+        """Parse consecutive value-like tokens (text, refs, substitutions)."""
+        parts = []
+        while True:
+            token = self.u8(pos)
+            kind = token & 0x0F
+            if kind == 0x05:  # Value
+                length = self.u16(pos + 2)
+                parts.append(self.data[pos + 4:pos + 4 + length * 2].decode("utf-16-le", errors="replace"))
+                pos += 4 + length * 2
+            elif kind == 0x07:  # CDATA
+                length = self.u16(pos + 1)
+                parts.append(self.data[pos + 3:pos + 3 + length * 2].decode("utf-16-le", errors="replace"))
+                pos += 3 + length * 2
+            elif kind == 0x08:  # CharRef
+                parts.append(chr(self.u16(pos + 1)))
+                pos += 3
+            elif kind == 0x09:  # EntityRef
+                entity, pos = self._name_ref(pos + 1)
+                parts.append({"amp": "&", "lt": "<", "gt": ">", "quot": '"', "apos": "'"}.get(entity, ""))
+            elif kind in (0x0D, 0x0E):  # Normal / optional substitution
+                index = self.u16(pos + 1)
+                placeholder = _Substitution(index, kind == 0x0E)
+                parts.append(placeholder if values is None else _resolve(placeholder, values))
+                pos += 4
+            else:
+                return parts, pos
+
+    def _template_instance(self, pos):
+        definition = self.u32(pos + 6)
+        pos += 10
+        if definition == pos:
+            pos += 24 + self.u32(pos + 20)  # resident template definition
+
+        template = self._templates.get(definition)
+        if template is None:
+            if definition in self._expanding:
+                raise EvtxFormatError(f"Template at offset {definition} instantiates itself")
+            self._expanding.add(definition)
+            try:
+                template, _ = self.parse_fragment(definition + 24)
+            finally:
+                self._expanding.discard(definition)
+            self._templates[definition] = template
+
+        count = self.u32(pos)
+        pos += 4
+        declarations = [struct.unpack_from("<HBx", self.data, pos + i * 4) for i in range(count)]
+        pos += count * 4
+        values = []
+        for size, value_type in declarations:
+            values.append(self._decode_value(pos, size, value_type))
+            pos += size
+        return [_instantiate(node, values) for node in template], pos
+
+    def _decode_value(self, pos, size, value_type):
+        """Decode the substitution value of size bytes at chunk offset pos."""
+        raw = self.data[pos:pos + size]
+        if value_type == 0x00 or not raw:
+            return None
+        if value_type == 0x01:
+            return raw.decode("utf-16-le", errors="replace").rstrip("\x00")
+        if value_type == 0x02:
+            return raw.decode("latin-1").rstrip("\x00")
+        if value_type in _FIXED_TYPES:
+            fmt, formatter = _FIXED_TYPES[value_type]
+            value = struct.unpack_from(fmt, raw)[0]
+            return formatter(value) if formatter else value
+        if value_type == 0x0E:
+            return raw.hex().upper()
+        if value_type == 0x0F:
+            return "{" + str(uuid.UUID(bytes_le=bytes(raw[:16]))).upper() + "}"
+        if value_type == 0x10:
+            return hex(int.from_bytes(raw, "little"))
+        if value_type == 0x12:
+            return _systemtime_to_iso(raw)
+        if value_type == 0x13:
+            return _sid_to_str(raw)
+        if value_type == 0x21:
+            # Embedded BinXml refers to names and templates by chunk offset,
+            # so it is parsed in place
+            nodes, _ = self.parse_fragment(pos, end=pos + size)
+            return nodes
+        if value_type == 0x81:
+            return [s for s in raw.decode("utf-16-le", errors="replace").split("\x00") if s]
+        if value_type & 0x80 and (value_type & 0x7F) in _FIXED_TYPES:
+            fmt, formatter = _FIXED_TYPES[value_type & 0x7F]
+            width = struct.calcsize(fmt)
+            items = [struct.unpack_from(fmt, raw, i)[0] for i in range(0, len(raw) - width + 1, width)]
+            return [formatter(v) for v in items] if formatter else items
+        return raw.hex().upper()
+
+
+def _resolve(placeholder, values):
+    if placeholder.index >= len(values):
+        return None
+    return values[placeholder.index]
+
+
+def _instantiate(node, values):
+    """Copy a template tree, filling substitution placeholders with values."""
+    if isinstance(node, _Substitution):
+        return _resolve(node, values)
+    if not isinstance(node, _Element):
+        return node
+
+    attrs = {}
+    for name, parts in node.attrs.items():
+        resolved = [_resolve(p, values) if isinstance(p, _Substitution) else p for p in parts]
+        if any(p is None for p in resolved) and all(p is None or p == "" for p in resolved):
+            continue  # optional attribute without a value
+        attrs[name] = "".join(str(p) for p in resolved if p is not None)
+
+    children = []
+    for child in node.children:
+        value = _instantiate(child, values)
+        # Embedded BinXml substitutions expand into element nodes
+        if isinstance(value, list) and value and isinstance(value[0], _Element):
+            children.extend(value)
+        else:
+            children.append(value)
+    return _Element(node.name, attrs, children)
+
+
+def _attr_text(attrs):
+    return {name: "".join(str(p) for p in parts if p is not None) if isinstance(parts, list) else parts
+            for name, parts in attrs.items()}
+
+
+def _event_record(event, record_id, written_time, source_path):
+    """Flatten an <Event> tree into a structured record."""
+    record = {
+        "source": source_path,
+        "record_id": record_id,
+        "time": written_time,
+        "event_id": None,
+        "provider": None,
+        "computer": None,
+        "channel": None,
+        "level": None,
+        "data": {},
+    }
+    system = event.find("System")
+    if system is not None:
+        provider = system.find("Provider")
+        if provider is not None:
+            record["provider"] = _attr_text(provider.attrs).get("Name")
+        event_id = system.find("EventID")
+        if event_id is not None:
+            try:
+                record["event_id"] = int(event_id.text())
+            except ValueError:
+                record["event_id"] = event_id.text()
+        time_created = system.find("TimeCreated")
+        if time_created is not None:
+            record["time"] = _attr_text(time_created.attrs).get("SystemTime") or written_time
+        for field in ("Computer", "Channel", "Level"):
+            element = system.find(field)
+            if element is not None:
+                record[field.lower()] = element.text()
+
+    event_data = event.find("EventData")
+    if event_data is not None:
+        for i, data in enumerate(event_data.elements()):
+            name = _attr_text(data.attrs).get("Name") or f"Data{i}"
+            record["data"][name] = data.text()
+    user_data = event.find("UserData")
+    if user_data is not None:
+        for container in user_data.elements():
+            for field in container.elements():
+                record["data"][field.name] = field.text()
+    return record
+
+
+def parse_chunk(data, source_path=None):
+    """Parse one 64 KiB chunk, returning its event records as dicts."""
+    if data[:8] != CHUNK_SIGNATURE:
+        return []
+
+    parser = _ChunkParser(data)
+    free_space = min(struct.unpack_from("<I", data, 48)[0], len(data))
+    records = []
+    pos = RECORDS_START
+    while pos + 24 <= free_space:
+        if data[pos:pos + 4] != RECORD_SIGNATURE:
+            break
+        size, record_id, written = struct.unpack_from("<IQQ", data, pos + 4)
+        if size < 28 or pos + size > len(data):
+            break
+        try:
+            nodes, _ = parser.parse_fragment(pos + 24)
+            event = next((n for n in nodes if isinstance(n, _Element)), None)
+            if event is not None:
+                records.append(_event_record(event, record_id, filetime_to_iso(written), source_path))
+        except (EvtxFormatError, struct.error, IndexError, ValueError, RecursionError) as e:
+            records.append({"source": source_path, "record_id": record_id,
+                            "time": filetime_to_iso(written), "error": str(e)})
+        pos += size
+    return records
+
+
+def iter_chunks(file_entry, digest=None):
+    """Yield the raw chunks of an EVTX file read straight from the image.
+
+    With a digest (e.g. hashlib.sha256()), every byte of the file is fed
+    to it, including the tail after the last whole chunk.
+    """
+    header = file_entry.read_random(0, FILE_HEADER_SIZE)
+    if header[:8] != FILE_SIGNATURE:
+        raise EvtxFormatError("Not an EVTX file")
+    if digest:
+        digest.update(header)
+
+    file_size = file_entry.info.meta.size
+    offset = FILE_HEADER_SIZE
+    while offset + CHUNK_SIZE <= file_size:
+        data = file_entry.read_random(offset, CHUNK_SIZE)
+        if digest:
+            digest.update(data)
+        if len(data) < CHUNK_SIZE:
+            return
+        if data[:8] == CHUNK_SIGNATURE:
+            yield data
+        offset += CHUNK_SIZE
+    if digest and offset < file_size:
+        digest.update(file_entry.read_random(offset, file_size - offset))
+
+
+class EvtxParseStage:
+    """Parse EVTX chunks across a process pool and stream the records out.
+
+    Chunks are read from the image by the calling thread and handed to the
+    pool; at most ``max_in_flight`` chunks are pending per file, and their
+    records are written to the sink in chunk order.
+    """
+
+    def __init__(self, sink, workers=None, max_in_flight=32):
+        self.sink = sink
+        self.max_in_flight = max_in_flight
+        self._executor = ProcessPoolExecutor(max_workers=workers)
+
+    def parse_entry(self, file_entry, file_path, digest=None):
+        """Parse one EVTX file entry, returning the number of records written."""
+        pending = deque()
+        written = 0
+        try:
+            for index, chunk in enumerate(iter_chunks(file_entry, digest)):
+                pending.append((index, self._executor.submit(parse_chunk, chunk, file_path)))
+                if len(pending) >= self.max_in_flight:
+                    written += self._drain_one(pending, file_path)
+            while pending:
+                written += self._drain_one(pending, file_path)
+        except EvtxFormatError as e:
+            print(f"Skipping {file_path}: {e}")
+        print(f"Parsed {written} event records from {file_path}")
+        return written
+
+    def _drain_one(self, pending, file_path):
+        index, future = pending.popleft()
+        try:
+            records = future.result()
+        except Exception as e:
+            print(f"Skipping chunk {index} of {file_path}: {str(e)}")
+            return 0
+        self.sink.write_many(records)
+        return len(records)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -5,6 +5,7 @@ import json
 from datetime import datetime
 from statistics import mean, stdev
 import logging
+from compression import DEFAULT_COMPRESSION, open_output, output_path
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -122,11 +123,12 @@ def analyze_files(file_entry, parent_path="/", level=0, max_level=1, results=[])
     return results
 
 
-def export_to_json(data, output_file):
-    """Export analysis results to JSON."""
+def export_to_json(data, output_file, compression=None):
+    """Export analysis results to compact JSON, streamed through the optional compressor."""
     try:
-        with open(output_file, "w") as f:
-            json.dump(data, f, indent=4)
+        output_file = output_path(output_file, compression)
+        with open_output(output_file, compression, encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
         logging.info(f"Analysis results exported to {output_file}")
     except Exception as e:
         logging.error(f"Error exporting data to JSON: {e}")
@@ -171,8 +173,8 @@ try:
     anomalies = detect_anomalies(analysis_results)
 
     # Export results and anomalies
-    export_to_json(analysis_results, "analysis_results.json")
-    export_to_json(anomalies, "anomalies.json")
+    export_to_json(analysis_results, "analysis_results.json", DEFAULT_COMPRESSION)
+    export_to_json(anomalies, "anomalies.json", DEFAULT_COMPRESSION)
 
     logging.info(f"Analysis complete. Anomalies detected: {len(anomalies)}")
 except Exception as e:
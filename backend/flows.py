@@ -0,0 +1,107 @@
+import numpy as np
+from pcap import ip_to_str
+
+
+FLOW_KEY = ["src_ip_hi", "src_ip_lo", "dest_ip_hi", "dest_ip_lo", "src_port", "dest_port", "protocol"]
+
+FLOW_DTYPE = np.dtype([
+    ("src_ip_hi", "u8"),
+    ("src_ip_lo", "u8"),
+    ("dest_ip_hi", "u8"),
+    ("dest_ip_lo", "u8"),
+    ("src_port", "u2"),
+    ("dest_port", "u2"),
+    ("protocol", "u1"),
+    ("ip_version", "u1"),
+    ("tcp_flags", "u1"),
+    ("packets", "u8"),
+    ("bytes", "u8"),
+    ("first_seen", "f8"),
+    ("last_seen", "f8"),
+])
+
+
+def group_rows(rows, key=FLOW_KEY):
+    """Sort rows by the key columns; returns (order, start index of every group in the sorted order)."""
+    if not len(rows):
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    order = np.lexsort([rows[name] for name in reversed(key)])
+    change = np.zeros(len(rows), dtype=bool)
+    change[0] = True
+    for name in key:
+        column = rows[name][order]
+        change[1:] |= column[1:] != column[:-1]
+    return order, np.flatnonzero(change)
+
+
+def merge_flows(rows):
+    """Combine FLOW_DTYPE rows that share a 5-tuple into one row each."""
+    order, starts = group_rows(rows)
+    rows = rows[order]
+    merged = rows[starts]  # key columns and ip_version come from the first row of each group
+    merged["packets"] = np.add.reduceat(rows["packets"], starts)
+    merged["bytes"] = np.add.reduceat(rows["bytes"], starts)
+    merged["first_seen"] = np.minimum.reduceat(rows["first_seen"], starts)
+    merged["last_seen"] = np.maximum.reduceat(rows["last_seen"], starts)
+    merged["tcp_flags"] = np.bitwise_or.reduceat(rows["tcp_flags"], starts)
+    return merged
+
+
+def packets_to_flows(packets):
+    """Aggregate one PACKET_DTYPE chunk into flows; non-IP packets are left out."""
+    packets = packets[packets["ip_version"] != 0]
+    rows = np.zeros(len(packets), dtype=FLOW_DTYPE)
+    for name in FLOW_KEY + ["ip_version", "tcp_flags"]:
+        rows[name] = packets[name]
+    rows["packets"] = 1
+    rows["bytes"] = packets["length"]
+    rows["first_seen"] = packets["timestamp"]
+    rows["last_seen"] = packets["timestamp"]
+    return merge_flows(rows)
+
+
+class FlowTable:
+    """Unidirectional 5-tuple flow table, built incrementally from packet chunks.
+
+    Each chunk is reduced to its flows right away; the per-chunk tables are
+    merged once they outgrow the main table, so memory follows the number
+    of flows rather than the number of packets.
+    """
+
+    def __init__(self):
+        self._table = np.zeros(0, dtype=FLOW_DTYPE)
+        self._parts = []
+        self._pending = 0
+        self.packets = 0
+        self.non_ip = 0
+
+    def add(self, packets):
+        flows = packets_to_flows(packets)
+        self.packets += len(packets)
+        self.non_ip += len(packets) - int(flows["packets"].sum())
+        self._parts.append(flows)
+        self._pending += len(flows)
+        if self._pending > max(len(self._table), 65536):
+            self._compact()
+
+    def _compact(self):
+        if self._parts:
+            self._table = merge_flows(np.concatenate([self._table] + self._parts))
+            self._parts = []
+            self._pending = 0
+
+    def flows(self):
+        """Return all flows as a FLOW_DTYPE array, ordered by first_seen."""
+        self._compact()
+        return self._table[np.argsort(self._table["first_seen"], kind="stable")]
+
+    def __len__(self):
+        self._compact()
+        return len(self._table)
+
+
+def describe_flow(flow):
+    """One-line text description of a flow row."""
+    return (f"{ip_to_str(flow['src_ip_hi'], flow['src_ip_lo'])}:{flow['src_port']} -> "
+            f"{ip_to_str(flow['dest_ip_hi'], flow['dest_ip_lo'])}:{flow['dest_port']} "
+            f"proto {flow['protocol']}, {flow['packets']} packets, {flow['bytes']} bytes")
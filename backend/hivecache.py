@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+
+# Bump when the entries produced for the same hive and config change
+HIVE_CACHE_VERSION = 2
+
+
+def config_fingerprint(**config):
+    """Hash of the extraction settings a cached result depends on."""
+    config["version"] = HIVE_CACHE_VERSION
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class HiveCache:
+    """Extracted registry entries per hive, keyed by the hive's SHA-256 and the extraction config.
+
+    Stored in SQLite as a flattened table: one row per key (path, last
+    write time, the full entry as JSON) and one row per value, indexed by
+    path and value name so cached hives can also be queried directly. A
+    hive's rows are written in one transaction, so an interrupted store
+    leaves no partial result behind.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS hives ("
+            "id INTEGER PRIMARY KEY, sha256 TEXT, config TEXT, entries INTEGER, cached_at TEXT, "
+            "UNIQUE (sha256, config))"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS keys ("
+            "hive_id INTEGER, seq INTEGER, path TEXT, last_written TEXT, entry TEXT, "
+            "PRIMARY KEY (hive_id, seq))"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS key_values ("
+            "hive_id INTEGER, seq INTEGER, name TEXT, type TEXT, value TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS keys_path ON keys (path)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS key_values_name ON key_values (name)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS key_values_key ON key_values (hive_id, seq)")
+        self._db.commit()
+
+    def _hive_id(self, sha256, config):
+        row = self._db.execute("SELECT id FROM hives WHERE sha256 = ? AND config = ?",
+                               (sha256, config)).fetchone()
+        return row[0] if row else None
+
+    def has(self, sha256, config):
+        return self._hive_id(sha256, config) is not None
+
+    def entries(self, sha256, config):
+        """Yield the cached entries of a hive in extraction order."""
+        hive_id = self._hive_id(sha256, config)
+        if hive_id is None:
+            return
+        for (entry,) in self._db.execute("SELECT entry FROM keys WHERE hive_id = ? ORDER BY seq", (hive_id,)):
+            yield json.loads(entry)
+
+    def store(self, sha256, config, entries, batch_size=1000):
+        """Replace the cached result of a hive with entries (an iterable); returns their number."""
+        count = 0
+        with self._db:
+            old = self._hive_id(sha256, config)
+            if old is not None:
+                self._db.execute("DELETE FROM keys WHERE hive_id = ?", (old,))
+                self._db.execute("DELETE FROM key_values WHERE hive_id = ?", (old,))
+                self._db.execute("DELETE FROM hives WHERE id = ?", (old,))
+            hive_id = self._db.execute(
+                "INSERT INTO hives (sha256, config, entries, cached_at) VALUES (?, ?, 0, ?)",
+                (sha256, config, datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")),
+            ).lastrowid
+
+            keys, values = [], []
+            for entry in entries:
+                keys.append((hive_id, count, entry["path"], entry.get("last_written"),
+                             json.dumps(entry, ensure_ascii=False, default=str)))
+                for name, value in entry.get("values", {}).items():
+                    values.append((hive_id, count, name, value.get("type"), str(value.get("value"))))
+                count += 1
+                if len(keys) >= batch_size:
+                    self._flush(keys, values)
+            self._flush(keys, values)
+            self._db.execute("UPDATE hives SET entries = ? WHERE id = ?", (count, hive_id))
+        return count
+
+    def _flush(self, keys, values):
+        self._db.executemany("INSERT INTO keys VALUES (?, ?, ?, ?, ?)", keys)
+        self._db.executemany("INSERT INTO key_values VALUES (?, ?, ?, ?, ?)", values)
+        keys.clear()
+        values.clear()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,82 @@
+import io
+
+
+def iter_file_chunks(file_entry, chunk_size=1024 * 1024):
+    """Yield the content of a pytsk3 file entry in chunk_size pieces."""
+    total_size = file_entry.info.meta.size
+    offset = 0
+    while offset < total_size:
+        data = file_entry.read_random(offset, min(chunk_size, total_size - offset))
+        if not data:
+            break
+        yield data
+        offset += len(data)
+
+
+class ImageFileReader(io.RawIOBase):
+    """Read-only, seekable file object over a pytsk3 file entry.
+
+    Reads go straight to ``file_entry.read_random``; nothing is staged on
+    disk. Wrap it in ``io.BufferedReader`` (see ``open_image_file``) so
+    parsers see large sequential reads. With a hashlib object, sequentially
+    read bytes are hashed on the way through.
+    """
+
+    def __init__(self, file_entry, digest=None):
+        super().__init__()
+        self._file_entry = file_entry
+        self._size = file_entry.info.meta.size
+        self._position = 0
+        self._digest = digest
+        self._hashed = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self._size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if position < 0:
+            raise ValueError("Negative seek position")
+        self._position = position
+        return position
+
+    def readinto(self, buffer):
+        remaining = self._size - self._position
+        if remaining <= 0:
+            return 0
+        size = min(len(buffer), remaining)
+        data = self._file_entry.read_random(self._position, size)
+        buffer[:len(data)] = data
+        if self._digest is not None and self._position == self._hashed:
+            self._digest.update(data)
+            self._hashed += len(data)
+        self._position += len(data)
+        return len(data)
+
+    @property
+    def size(self):
+        return self._size
+
+    def hexdigest(self):
+        """Return the content hash once the whole file has been read in order, else None."""
+        if self._digest is None or self._hashed < self._size:
+            return None
+        return self._digest.hexdigest()
+
+
+def open_image_file(file_entry, buffer_size=4 * 1024 * 1024, digest=None):
+    """Open a pytsk3 file entry as a buffered binary stream."""
+    return io.BufferedReader(ImageFileReader(file_entry, digest), buffer_size=buffer_size)
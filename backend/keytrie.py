@@ -0,0 +1,83 @@
+from fnmatch import fnmatchcase
+
+
+WILDCARD_CHARS = "*?["
+
+
+class _Node:
+    __slots__ = ("children", "wild", "deep", "is_deep", "terminal")
+
+    def __init__(self, is_deep=False):
+        self.children = {}
+        self.wild = {}
+        self.deep = None
+        self.is_deep = is_deep
+        self.terminal = False
+
+
+class KeyPathTrie:
+    """Case-insensitive trie of registry key path patterns, one level per path component.
+
+    Components match literally, or with fnmatch wildcards ("*", "?",
+    "[...]") within a single component; a "**" component matches any
+    number of components, including none. A traversal keeps the set of
+    trie nodes its current key path has reached (see start/step): an empty
+    set means nothing below the key can match, and accepts() tells whether
+    the key itself is a target.
+    """
+
+    def __init__(self, patterns=()):
+        self.root = _Node()
+        for pattern in patterns:
+            self.add(pattern)
+
+    def add(self, pattern):
+        """Add a '\\' or '/' separated key path pattern."""
+        node = self.root
+        for part in pattern.replace("/", "\\").split("\\"):
+            if not part:
+                continue
+            part = part.lower()
+            if part == "**":
+                if node.deep is None:
+                    node.deep = _Node(is_deep=True)
+                node = node.deep
+            elif any(c in part for c in WILDCARD_CHARS):
+                node = node.wild.setdefault(part, _Node())
+            else:
+                node = node.children.setdefault(part, _Node())
+        node.terminal = True
+
+    @staticmethod
+    def _closure(nodes):
+        # A "**" may match zero components, so its node is reachable wherever its parent is
+        states = {}
+        for node in nodes:
+            while node is not None and node not in states:
+                states[node] = True
+                node = node.deep
+        return tuple(states)
+
+    def start(self):
+        """State for the hive root."""
+        return self._closure([self.root])
+
+    def step(self, states, name):
+        """State for the subkey called name of a key in the given state."""
+        name = name.lower()
+        reached = []
+        for node in states:
+            child = node.children.get(name)
+            if child is not None:
+                reached.append(child)
+            for pattern, child in node.wild.items():
+                if fnmatchcase(name, pattern):
+                    reached.append(child)
+            if node.is_deep:
+                reached.append(node)
+        return self._closure(reached)
+
+    @staticmethod
+    def accepts(states):
+        """Whether a key in this state matches one of the patterns."""
+        return any(node.terminal for node in states)
@@ -1,7 +1,18 @@
 import pyewf
 import pytsk3
+import hashlib
 import os
-from datetime import datetime
+import threading
+from blobstore import BlobStore
+from checkpoint import CheckpointJournal
+from compression import COMPRESSION_CHOICES, DEFAULT_COMPRESSION
+from evtx import EvtxParseStage
+from imagefile import iter_file_chunks, open_image_file
+from logindex import PARSED_LOGS_DIR, IndexBuilder, case_index_dir
+from manifest import ExtractionManifest, run_manifest_path
+from recordstore import MultiSink, RecordWriter, filter_records
+from textlog import iter_log_lines, summarize_log
+from writerpool import WriterPool
 
 
 # Define a custom class for handling EWF images with pytsk3
@@ -10,85 +21,161 @@ class EWFImgInfo(pytsk3.Img_Info):
 
     def __init__(self, ewf_handle):
         self._ewf_handle = ewf_handle
+        self._lock = threading.Lock()  # seek+read must not interleave across writer threads
         super().__init__()
 
     def read(self, offset, size):
-        self._ewf_handle.seek(offset)
-        return self._ewf_handle.read(size)
+        with self._lock:
+            self._ewf_handle.seek(offset)
+            return self._ewf_handle.read(size)
 
     def get_size(self):
         return self._ewf_handle.get_media_size()
 
 
-# Utility function to format timestamps
-def format_timestamp(timestamp):
-    """Convert timestamp to human-readable format."""
-    if timestamp is None:
-        return "N/A"
-    return datetime.utcfromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
-
-
 # Recursive function to extract logs
-def extract_logs(file_entry, parent_path="/", output_dir="extracted_logs"):
-    """Extract system logs and save them locally."""
+def extract_logs(file_entry, parent_path="/", output_dir="extracted_logs", pool=None, store=None,
+                 evtx_stage=None, log_sink=None, line_sink=None, save_copy=False, manifest=None, journal=None):
+    """Find system logs and parse them in place on the image.
+
+    Text logs are streamed through the line parser and summarised into
+    log_sink, with every line record also passed to line_sink (e.g. an
+    IndexBuilder); .evtx files go to the EvtxParseStage. Copies are only
+    written to the content-addressed BlobStore under output_dir when
+    save_copy is set. Copied and parsed files are recorded in the run's
+    ExtractionManifest. When a WriterPool is given, each file is queued as
+    a job so the traversal does not wait on image reads. With a
+    CheckpointJournal, finished directories and files are journaled and
+    those finished by a previous run are skipped.
+    """
     # Skip entries without metadata or size
     if not file_entry.info.meta or not file_entry.info.meta.size:
         return
 
+    if save_copy and store is None:
+        store = BlobStore(output_dir)
+
     # Construct the full file path
     file_path = os.path.join(parent_path, file_entry.info.name.name.decode())
 
     # Handle directories
     if file_entry.info.meta.type == pytsk3.TSK_FS_META_TYPE_DIR:
+        if journal:
+            if journal.dir_done(file_path):
+                print(f"Skipping finished directory: {file_path}")
+                return
+            journal.enter(file_path, parent_path)
         for sub_entry in file_entry.as_directory():
             if sub_entry.info.name.name not in [b".", b".."]:
-                extract_logs(sub_entry, file_path, output_dir)
+                extract_logs(sub_entry, file_path, output_dir, pool=pool, store=store,
+                             evtx_stage=evtx_stage, log_sink=log_sink, line_sink=line_sink,
+                             save_copy=save_copy, manifest=manifest, journal=journal)
+        if journal:
+            journal.release(file_path)
     else:
         # Handle files with log-related extensions
         log_file_name = file_entry.info.name.name.decode()
         if "log" in log_file_name.lower() or log_file_name.endswith((".evtx", ".log", ".txt")):
             print(f"Found log file: {file_path}")
-            save_file_content(file_entry, file_path, output_dir)
-
-
-# Save file content and metadata locally
-def save_file_content(file_entry, file_path, output_dir):
-    """Save file content locally with timestamps."""
-    # Ensure the output directory exists
-    os.makedirs(output_dir, exist_ok=True)
-    output_file = os.path.join(output_dir, os.path.basename(file_path.replace("/", "_")))
-
-    # Extract timestamps
-    created_time = format_timestamp(file_entry.info.meta.crtime)
-    modified_time = format_timestamp(file_entry.info.meta.mtime)
-    accessed_time = format_timestamp(file_entry.info.meta.atime)
-
-    # Write file content to disk
-    with open(output_file, "wb") as out_file:
-        offset = 0
-        size = 1024 * 1024  # Read in 1MB chunks
-        while offset < file_entry.info.meta.size:
-            data = file_entry.read_random(offset, size)
-            if not data:
-                break
-            out_file.write(data)
-            offset += len(data)
-
-    # Save metadata to a separate file
-    metadata_file = f"{output_file}_metadata.txt"
-    with open(metadata_file, "w") as meta_file:
-        meta_file.write(f"File Path: {file_path}\n")
-        meta_file.write(f"Created Time: {created_time}\n")
-        meta_file.write(f"Modified Time: {modified_time}\n")
-        meta_file.write(f"Accessed Time: {accessed_time}\n")
-
-    print(f"Saved: {output_file} (Metadata: {metadata_file})")
+            jobs = []
+            if save_copy:
+                jobs.append(("copy", save_file_content, store, manifest))
+            if log_file_name.lower().endswith(".evtx"):
+                # Parse event logs chunk by chunk straight from the image
+                if evtx_stage:
+                    jobs.append(("parse", parse_evtx_file, evtx_stage, manifest))
+            elif log_sink:
+                jobs.append(("parse", parse_log_file, log_sink, line_sink, manifest))
+
+            for step, func, *args in jobs:
+                if journal:
+                    name = f"{step}:{file_path}"
+                    if journal.is_done(name):
+                        print(f"Skipping finished {step} of {file_path}")
+                        continue
+                    func = journal.track(name, parent_path, func)
+                if pool:
+                    pool.submit(func, file_entry, file_path, *args)
+                else:
+                    func(file_entry, file_path, *args)
+
+
+def parse_log_file(file_entry, file_path, log_sink, line_sink=None, manifest=None, batch_size=1000):
+    """Parse a text log through a buffered reader over the image, without a copy."""
+    reader = open_image_file(file_entry, digest=hashlib.sha256())
+    records = iter_log_lines(reader, file_path)
+    if line_sink:
+        records = _tee_records(records, line_sink, batch_size)
+    summary = summarize_log(records, file_path, file_entry.info.meta.size)
+    if summary["lines"]:
+        summary["sha256"] = reader.raw.hexdigest()
+        log_sink.write(summary)
+        if manifest:
+            manifest.record(file_entry, file_path, sha256=summary["sha256"],
+                            output=getattr(log_sink, "path", None), kind="text_log")
+        print(f"Parsed {summary['lines']} lines from {file_path}")
+
+
+def parse_evtx_file(file_entry, file_path, evtx_stage, manifest=None):
+    """Parse an event log through the EvtxParseStage, hashing it on the way; returns the record count."""
+    digest = hashlib.sha256()
+    written = evtx_stage.parse_entry(file_entry, file_path, digest)
+    if written and manifest:
+        manifest.record(file_entry, file_path, sha256=digest.hexdigest(),
+                        output=getattr(evtx_stage.sink, "path", None), kind="evtx")
+    return written
+
+
+def _tee_records(records, sink, batch_size):
+    """Pass records through while forwarding them to sink in batches."""
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            sink.write_many(batch)
+            batch = []
+        yield record
+    sink.write_many(batch)
+
+
+# Save file content locally and record it in the manifest
+def save_file_content(file_entry, file_path, store, manifest=None):
+    """Save file content into the blob store and add it to the run manifest."""
+    # Copy file content into the store, hashing it on the way
+    digest, blob_path, size, is_new = store.put(iter_file_chunks(file_entry))
+    if manifest:
+        manifest.record(file_entry, file_path, sha256=digest, output=blob_path, kind="log_copy")
+
+    if is_new:
+        print(f"Saved: {file_path} -> {blob_path}")
+    else:
+        print(f"Duplicate content: {file_path} already stored as {blob_path}")
+    return blob_path
 
 
 # Main script
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Parse system logs from a SMART disk image")
+    parser.add_argument("image_directory", nargs="?", default="/media/pranaash31/USB DISK/manjula/",
+                        help="Directory containing the manjula.sXX split files")
+    parser.add_argument("--case-dir", default=".",
+                        help="Case directory to write parsed_logs into; use uploads/case_<n> so the "
+                             "case's log search finds the index (default: current directory)")
+    parser.add_argument("--save-copy", action="store_true",
+                        help="Also write a copy of every log file to 'extracted_logs'")
+    parser.add_argument("--compress", choices=COMPRESSION_CHOICES, default=DEFAULT_COMPRESSION,
+                        help=f"Compression for copies and parsed records (default: {DEFAULT_COMPRESSION})")
+    parser.add_argument("--manifest-format", choices=["jsonl", "sqlite"], default="jsonl",
+                        help="Format of the per-run extraction manifest (default: jsonl)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted run, skipping work recorded in parsed_logs/checkpoint.jsonl")
+    args = parser.parse_args()
+    logs_dir = os.path.join(args.case_dir, PARSED_LOGS_DIR)
+
     # Define the folder containing the split files
-    split_files_directory = "/media/pranaash31/USB DISK/manjula/"
+    split_files_directory = args.image_directory
 
     # Collect all split files matching the naming pattern
     split_files = sorted(
@@ -114,13 +201,44 @@ if __name__ == "__main__":
         # Open the file system
         fs = pytsk3.FS_Info(img_info)
 
-        # Extract logs from the file system
-        print("Extracting logs from SMART image...")
+        # Parse logs from the file system
+        print("Parsing logs from SMART image...")
         root_dir = fs.open_dir("/")
-        for entry in root_dir:
-            if entry.info.name.name not in [b".", b".."]:
-                extract_logs(entry)
-
-        print("Log extraction complete. Logs saved to 'extracted_logs' directory.")
+        store = BlobStore("extracted_logs", compression=args.compress) if args.save_copy else None
+        with IndexBuilder(case_index_dir(args.case_dir), resume=args.resume) as index, \
+                CheckpointJournal(os.path.join(logs_dir, "checkpoint.jsonl"), resume=args.resume,
+                                  stamp=index.checkpoint, valid=index.covers) as journal:
+            if args.resume:
+                # Drop records of files that were still being parsed when the run died
+                for name in ("evtx_records.jsonl", "text_logs.jsonl"):
+                    kept, dropped = filter_records(
+                        os.path.join(logs_dir, name),
+                        lambda record: journal.is_done(f"parse:{record.get('source')}"),
+                        args.compress,
+                    )
+                    print(f"Kept {kept} records in {name}, dropped {dropped} partial records")
+                if store:
+                    store.remove_partial()
+
+            with RecordWriter(os.path.join(logs_dir, "evtx_records.jsonl"), args.compress,
+                              append=args.resume) as events, \
+                    RecordWriter(os.path.join(logs_dir, "text_logs.jsonl"), args.compress,
+                                 append=args.resume) as text_logs, \
+                    ExtractionManifest(run_manifest_path(logs_dir, args.manifest_format)) as manifest:
+                # A file is only journaled once its records and manifest entry are flushed
+                journal.attach(events, text_logs, manifest)
+                with EvtxParseStage(MultiSink(events, index)) as evtx_stage, \
+                        WriterPool(workers=4, max_pending=64) as pool:
+                    for entry in root_dir:
+                        if entry.info.name.name not in [b".", b".."]:
+                            extract_logs(entry, pool=pool, store=store, evtx_stage=evtx_stage,
+                                         log_sink=text_logs, line_sink=index, save_copy=args.save_copy,
+                                         manifest=manifest, journal=journal)
+
+        print(f"Log parsing complete. Parsed {events.count} event records and {text_logs.count} text logs "
+              f"into '{logs_dir}'.")
+        print(f"Extraction manifest: {manifest.path} ({manifest.count} artifacts)")
+        if args.save_copy:
+            print("Log copies saved to 'extracted_logs' directory.")
     except Exception as e:
         print(f"An error occurred: {e}")
@@ -0,0 +1,442 @@
+import bisect
+import json
+import mmap
+import numpy as np
+import os
+import re
+import struct
+import threading
+import zlib
+
+
+# On-disk layout of an index directory:
+#   docs.jsonl    one line per document (source path), line number = doc id
+#   postings.bin  per-term posting lists, zlib-compressed
+#   terms.dat     sorted UTF-8 terms, concatenated
+#   terms.idx     one TERM_ENTRY per term, in the same order as terms.dat
+#
+# A posting is (doc id, line, byte offset, token position). Postings are
+# varint encoded; a 0 byte means "same document as the previous posting"
+# and is followed by line/offset deltas, anything else is doc id + 1
+# followed by absolute line/offset. Streams therefore stay decodable when
+# segment streams are concatenated at merge time.
+TOKEN = re.compile(r"\w+")
+PARSED_LOGS_DIR = "parsed_logs"
+MAX_TERM_LENGTH = 64
+TERM_ENTRY = struct.Struct("<QIQII")  # term offset, term length, postings offset, length, count
+
+
+def case_index_dir(case_dir):
+    """Index directory of a case whose logs were parsed into case_dir (see logfile.py --case-dir)."""
+    return os.path.join(case_dir, PARSED_LOGS_DIR, "index")
+
+
+def tokenize(text):
+    """Split text into lowercase index terms."""
+    return [t for t in TOKEN.findall(text.lower()) if len(t) <= MAX_TERM_LENGTH]
+
+
+def _encode_varint(value, out):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _decode_postings(data):
+    """Decode a postings stream into (doc, line, offset, position) arrays, vectorized.
+
+    Every varint ends at a byte below 0x80; its 7-bit groups are shifted
+    into place and summed per varint with reduceat. The doc id and the
+    line/offset deltas of "same document" postings are then resolved with
+    cumulative sums over the runs that start at each new-document posting.
+    """
+    raw = np.frombuffer(data, dtype=np.uint8)
+    if not len(raw):
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty, empty
+    ends = np.flatnonzero(raw < 0x80)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    shifts = (np.arange(len(raw)) - np.repeat(starts, ends - starts + 1)) * 7
+    values = np.add.reduceat((raw & 0x7F).astype(np.int64) << shifts, starts).reshape(-1, 4)
+
+    first, lines, offsets, positions = values.T
+    new_doc = first != 0
+    run_start = np.maximum.accumulate(np.where(new_doc, np.arange(len(first)), 0))
+    docs = first[run_start] - 1
+
+    def resolve(column):
+        # Absolute at a run's first posting, deltas after it
+        total = np.cumsum(column)
+        return total - (total - column)[run_start]
+
+    return docs, resolve(lines), resolve(offsets), positions
+
+
+def _record_text(record):
+    """Return the searchable text of a line record or parsed event record."""
+    if "text" in record:
+        return record["text"]
+    parts = [str(record.get(field) or "") for field in ("provider", "event_id", "computer", "channel")]
+    for name, value in (record.get("data") or {}).items():
+        parts.append(f"{name} {value}")
+    return " ".join(parts)
+
+
+class _TermPostings:
+    __slots__ = ("data", "count", "doc", "line", "offset")
+
+    def __init__(self):
+        self.data = bytearray()
+        self.count = 0
+        self.doc = None
+        self.line = 0
+        self.offset = 0
+
+    def add(self, doc, line, offset, position):
+        if doc == self.doc and line >= self.line and offset >= self.offset:
+            self.data.append(0)
+            _encode_varint(line - self.line, self.data)
+            _encode_varint(offset - self.offset, self.data)
+        else:
+            _encode_varint(doc + 1, self.data)
+            _encode_varint(line, self.data)
+            _encode_varint(offset, self.data)
+        _encode_varint(position, self.data)
+        self.doc, self.line, self.offset = doc, line, offset
+        self.count += 1
+
+
+class IndexBuilder:
+    """Build an inverted index from line and event records as they stream in.
+
+    Acts as a record sink (``write``/``write_many``) so it can be fed from
+    the log parsers directly. Postings are kept varint encoded in memory
+    and spilled to segment files once ``max_memory`` bytes accumulate;
+    ``close`` merges the segments into the final index.
+
+    With resume=True the documents and spilled segments of an interrupted
+    (or finished) build are picked up again. Postings still in memory at
+    the crash are lost; ``checkpoint``/``covers`` let a CheckpointJournal
+    tell which finished work actually reached a segment on disk.
+    """
+
+    def __init__(self, index_dir, max_memory=256 * 1024 * 1024, resume=False):
+        self.index_dir = index_dir
+        self.max_memory = max_memory
+        self._lock = threading.Lock()
+        self._docs = {}
+        self._terms = {}
+        self._memory = 0
+        self._segments = []
+        self._next_segment = 0
+        os.makedirs(index_dir, exist_ok=True)
+        if resume:
+            self._load_previous()
+        else:
+            for name in os.listdir(index_dir):
+                if name.startswith("segment-"):
+                    os.remove(os.path.join(index_dir, name))
+        self._durable_segments = self._next_segment
+        self._docs_file = open(os.path.join(index_dir, "docs.jsonl"), "a" if resume else "w", encoding="utf-8")
+
+    def _load_previous(self):
+        """Reload documents and complete segments left by an earlier build."""
+        docs_path = os.path.join(self.index_dir, "docs.jsonl")
+        lines = []
+        if os.path.exists(docs_path):
+            with open(docs_path, "r", encoding="utf-8") as docs:
+                for line in docs:
+                    try:
+                        document = json.loads(line)
+                    except ValueError:
+                        break  # torn by the crash; later lines cannot be trusted
+                    self._docs[document["source"]] = len(lines)
+                    lines.append(line if line.endswith("\n") else line + "\n")
+            with open(docs_path, "w", encoding="utf-8") as docs:
+                docs.writelines(lines)
+
+        meta_path = os.path.join(self.index_dir, "meta.json")
+        if os.path.exists(meta_path):
+            # A finished index: turn its postings back into a single segment,
+            # numbered after the segments it was merged from
+            with open(meta_path, "r", encoding="utf-8") as meta:
+                self._next_segment = json.load(meta).get("segments", 1)
+            path = os.path.join(self.index_dir, f"segment-{self._next_segment - 1:04d}.tmp")
+            with open(os.path.join(self.index_dir, "terms.dat"), "rb") as terms_file, \
+                    open(os.path.join(self.index_dir, "terms.idx"), "rb") as idx_file, \
+                    open(os.path.join(self.index_dir, "postings.bin"), "rb") as postings_file, \
+                    open(path + ".partial", "wb") as segment:
+                terms, idx, postings = terms_file.read(), idx_file.read(), postings_file.read()
+                for i in range(len(idx) // TERM_ENTRY.size):
+                    term_offset, term_length, offset, length, count = TERM_ENTRY.unpack_from(idx, i * TERM_ENTRY.size)
+                    data = zlib.decompress(postings[offset:offset + length])
+                    segment.write(struct.pack("<HII", term_length, len(data), count))
+                    segment.write(terms[term_offset:term_offset + term_length])
+                    segment.write(data)
+            os.replace(path + ".partial", path)
+            os.remove(meta_path)
+            self._segments = [path]
+        else:
+            self._segments = sorted(
+                os.path.join(self.index_dir, name) for name in os.listdir(self.index_dir)
+                if name.startswith("segment-") and name.endswith(".tmp")
+            )
+            if self._segments:
+                self._next_segment = int(os.path.basename(self._segments[-1])[8:12]) + 1
+        print(f"Resuming log index in {self.index_dir}: {len(self._docs)} documents, "
+              f"{len(self._segments)} segments")
+
+    def checkpoint(self):
+        """Fields for a journal entry: the segment now receiving postings."""
+        with self._lock:
+            return {"index_segment": self._next_segment}
+
+    def covers(self, entry):
+        """Whether postings stamped by checkpoint() in an earlier run reached disk."""
+        segment = entry.get("index_segment")
+        return segment is None or segment < self._durable_segments
+
+    def _doc_id(self, source, kind):
+        doc = self._docs.get(source)
+        if doc is None:
+            doc = len(self._docs)
+            self._docs[source] = doc
+            self._docs_file.write(json.dumps({"source": source, "kind": kind}) + "\n")
+        return doc
+
+    def write(self, record):
+        self.write_many([record])
+
+    def write_many(self, records):
+        # Tokenize outside the lock; only posting appends are serialised
+        tokenized = []
+        for record in records:
+            if record.get("error"):
+                continue
+            line = record.get("line", record.get("record_id")) or 0
+            tokens = tokenize(_record_text(record))
+            if tokens:
+                kind = "text" if "text" in record else "event"
+                tokenized.append((record.get("source") or "", kind, line, record.get("offset") or 0, tokens))
+
+        with self._lock:
+            for source, kind, line, offset, tokens in tokenized:
+                doc = self._doc_id(source, kind)
+                for position, term in enumerate(tokens):
+                    postings = self._terms.get(term)
+                    if postings is None:
+                        postings = self._terms[term] = _TermPostings()
+                        self._memory += 64 + len(term)
+                    before = len(postings.data)
+                    postings.add(doc, line, offset, position)
+                    self._memory += len(postings.data) - before
+            if self._memory >= self.max_memory:
+                self._spill()
+
+    def _spill(self):
+        """Write the in-memory postings to a sorted segment file."""
+        path = os.path.join(self.index_dir, f"segment-{self._next_segment:04d}.tmp")
+        self._docs_file.flush()  # every doc id in the segment must be on disk first
+        with open(path + ".partial", "wb") as segment:
+            for term in sorted(self._terms):
+                postings = self._terms[term]
+                encoded = term.encode("utf-8")
+                segment.write(struct.pack("<HII", len(encoded), len(postings.data), postings.count))
+                segment.write(encoded)
+                segment.write(postings.data)
+        os.replace(path + ".partial", path)
+        self._segments.append(path)
+        self._next_segment += 1
+        self._terms = {}
+        self._memory = 0
+
+    @staticmethod
+    def _read_segment(path):
+        with open(path, "rb") as segment:
+            while True:
+                header = segment.read(10)
+                if not header:
+                    return
+                term_length, data_length, count = struct.unpack("<HII", header)
+                term = segment.read(term_length).decode("utf-8")
+                yield term, segment.read(data_length), count
+
+    def close(self):
+        """Merge all segments into the final term dictionary and postings file."""
+        with self._lock:
+            if self._docs_file.closed:
+                return
+            if self._terms or not self._segments:
+                self._spill()
+            self._docs_file.close()
+
+            readers = [self._read_segment(path) for path in self._segments]
+            heads = {}
+            for i, reader in enumerate(readers):
+                head = next(reader, None)
+                if head:
+                    heads[i] = head
+
+            with open(os.path.join(self.index_dir, "postings.bin"), "wb") as postings_file, \
+                    open(os.path.join(self.index_dir, "terms.dat"), "wb") as terms_file, \
+                    open(os.path.join(self.index_dir, "terms.idx"), "wb") as idx_file:
+                term_offset = postings_offset = 0
+                while heads:
+                    term = min(head[0] for head in heads.values())
+                    data = bytearray()
+                    count = 0
+                    # Segment order is arrival order, so concatenation keeps postings ordered
+                    for i in sorted(heads):
+                        if heads[i][0] == term:
+                            data += heads[i][1]
+                            count += heads[i][2]
+                            head = next(readers[i], None)
+                            if head:
+                                heads[i] = head
+                            else:
+                                del heads[i]
+                    compressed = zlib.compress(bytes(data), 6)
+                    encoded = term.encode("utf-8")
+                    postings_file.write(compressed)
+                    terms_file.write(encoded)
+                    idx_file.write(TERM_ENTRY.pack(term_offset, len(encoded), postings_offset,
+                                                   len(compressed), count))
+                    term_offset += len(encoded)
+                    postings_offset += len(compressed)
+
+            for path in self._segments:
+                os.remove(path)
+            with open(os.path.join(self.index_dir, "meta.json"), "w", encoding="utf-8") as meta:
+                json.dump({"documents": len(self._docs), "terms": self._term_count(),
+                           "segments": self._next_segment}, meta)
+            print(f"Built log index in {self.index_dir} ({len(self._docs)} documents)")
+
+    def _term_count(self):
+        return os.path.getsize(os.path.join(self.index_dir, "terms.idx")) // TERM_ENTRY.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class _TermList:
+    """Sequence view over the sorted term dictionary, for bisect."""
+
+    def __init__(self, terms, idx):
+        self._terms = terms
+        self._idx = idx
+
+    def __len__(self):
+        return len(self._idx) // TERM_ENTRY.size
+
+    def entry(self, i):
+        return TERM_ENTRY.unpack_from(self._idx, i * TERM_ENTRY.size)
+
+    def __getitem__(self, i):
+        term_offset, term_length = self.entry(i)[:2]
+        return self._terms[term_offset:term_offset + term_length].decode("utf-8")
+
+
+class LogIndex:
+    """Read side of an index built by IndexBuilder.
+
+    The term dictionary and postings are memory-mapped and terms are found
+    by binary search, so opening an index and answering a query does not
+    require loading it into memory.
+    """
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, "docs.jsonl"), "r", encoding="utf-8") as docs:
+            self.documents = [json.loads(line) for line in docs if line.strip()]
+        self._files = []
+        self._terms = _TermList(self._map("terms.dat"), self._map("terms.idx"))
+        self._postings = self._map("postings.bin")
+
+    def _map(self, name):
+        f = open(os.path.join(self.index_dir, name), "rb")
+        self._files.append(f)
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._files.append(mapped)
+        return mapped
+
+    def _decode(self, term):
+        i = bisect.bisect_left(self._terms, term)
+        if i >= len(self._terms) or self._terms[i] != term:
+            return _decode_postings(b"")
+        _, _, offset, length, count = self._terms.entry(i)
+        return _decode_postings(zlib.decompress(self._postings[offset:offset + length]))
+
+    def postings(self, term):
+        """Return the (doc, line, offset, position) postings of a term."""
+        return list(zip(*(column.tolist() for column in self._decode(term))))
+
+    def _lines(self, term):
+        """(doc, line) keys, byte offsets and token positions of a term's postings, as arrays."""
+        docs, lines, offsets, positions = self._decode(term)
+        return (docs << 32) | lines, offsets, positions
+
+    def _clause_lines(self, clause):
+        """Sorted (doc, line) keys of the lines matching a clause, with the offset of its first term there."""
+        term_lines = [self._lines(term) for term in clause]
+        first_keys, first_offsets, _ = term_lines[0]
+        keys, first = np.unique(first_keys, return_index=True)
+        if len(clause) > 1:
+            # Phrase: the k-th term must be at position start + k of the same line. Lines are
+            # numbered by their rank among the first term's lines, so (line, start) packs into one int
+            span = max((int(positions.max()) for _, _, positions in term_lines if len(positions)), default=0)
+            span += 2 * len(clause)
+            starts = None
+            for k, (term_keys, _, positions) in enumerate(term_lines):
+                rank = np.searchsorted(keys, term_keys)
+                found = rank < len(keys)
+                found[found] = keys[rank[found]] == term_keys[found]
+                packed = rank[found] * span + positions[found] - k + len(clause)
+                starts = np.unique(packed) if starts is None else np.intersect1d(starts, packed)
+            keep = np.zeros(len(keys), dtype=bool)
+            keep[starts // span] = True
+            keys, first = keys[keep], first[keep]
+        return keys, first_offsets[first]
+
+    def search(self, query, limit=100):
+        """Find lines matching every keyword and "quoted phrase" in query."""
+        phrases = re.findall(r'"([^"]+)"', query)
+        keywords = tokenize(re.sub(r'"[^"]*"', " ", query))
+        clauses = [tokenize(phrase) for phrase in phrases] + [[keyword] for keyword in keywords]
+        clauses = [clause for clause in clauses if clause]
+        if not clauses:
+            return []
+
+        # Every clause narrows the sorted key array of the first one; offsets come from the first clause
+        keys = offsets = None
+        for clause in clauses:
+            clause_keys, clause_offsets = self._clause_lines(clause)
+            if keys is None:
+                keys, offsets = clause_keys, clause_offsets
+            else:
+                keep = np.isin(keys, clause_keys, assume_unique=True)
+                keys, offsets = keys[keep], offsets[keep]
+            if not len(keys):
+                return []
+
+        results = []
+        for key, offset in zip(keys[:limit].tolist(), offsets[:limit].tolist()):
+            doc, line = key >> 32, key & 0xFFFFFFFF
+            document = self.documents[doc]
+            results.append({
+                "source": document["source"],
+                "kind": document["kind"],
+                "line" if document["kind"] == "text" else "record_id": line,
+                "offset": offset,
+            })
+        return results
+
+    def close(self):
+        for f in reversed(self._files):
+            f.close()
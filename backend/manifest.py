@@ -0,0 +1,141 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from compression import open_input, open_output
+
+
+FIELDS = ["source_path", "inode", "size", "modified", "accessed", "changed", "born",
+          "sha256", "output", "kind", "recorded_at"]
+
+
+def _iso(timestamp):
+    if not timestamp:
+        return None
+    try:
+        return datetime.utcfromtimestamp(timestamp).isoformat() + "Z"
+    except (OSError, OverflowError, ValueError):
+        return None
+
+
+def file_entry_metadata(file_entry, file_path):
+    """Collect path, inode, size and MACB times of a pytsk3 file entry."""
+    meta = file_entry.info.meta
+    return {
+        "source_path": file_path,
+        "inode": meta.addr,
+        "size": meta.size,
+        "modified": _iso(meta.mtime),
+        "accessed": _iso(meta.atime),
+        "changed": _iso(meta.ctime),
+        "born": _iso(meta.crtime),
+    }
+
+
+class ExtractionManifest:
+    """One append-only manifest per extraction run.
+
+    Every extracted artifact is one entry (source path, inode, MACB times,
+    size, hash, output location) instead of a ``_metadata.txt`` file next
+    to it. Entries are buffered and written in batches: as JSON Lines by
+    default, or into an indexed SQLite table when the path ends in
+    ``.sqlite``/``.db``, one transaction per batch. Thread-safe.
+    """
+
+    def __init__(self, path, batch_size=500, compression=None):
+        self.path = path
+        self.batch_size = batch_size
+        self.count = 0
+        self._lock = threading.Lock()
+        self._batch = []
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        self._db = None
+        self._file = None
+        if path.endswith((".sqlite", ".db")):
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS artifacts ("
+                "id INTEGER PRIMARY KEY, source_path TEXT, inode INTEGER, size INTEGER, "
+                "modified TEXT, accessed TEXT, changed TEXT, born TEXT, "
+                "sha256 TEXT, output TEXT, kind TEXT, recorded_at TEXT)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS artifacts_source ON artifacts (source_path)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS artifacts_sha256 ON artifacts (sha256)")
+            self._db.commit()
+        else:
+            self._file = open_output(path, compression, encoding="utf-8", append=True)
+
+    def record(self, file_entry, file_path, sha256=None, output=None, kind=None):
+        """Add the artifact found at file_path to the manifest."""
+        entry = file_entry_metadata(file_entry, file_path)
+        entry.update({
+            "sha256": sha256,
+            "output": output,
+            "kind": kind,
+            "recorded_at": datetime.utcnow().isoformat() + "Z",
+        })
+        with self._lock:
+            self._batch.append(entry)
+            if len(self._batch) >= self.batch_size:
+                self._flush()
+
+    def _flush(self):
+        if not self._batch:
+            return
+        if self._db is not None:
+            with self._db:  # one transaction per batch
+                self._db.executemany(
+                    f"INSERT INTO artifacts ({', '.join(FIELDS)}) VALUES ({', '.join('?' * len(FIELDS))})",
+                    [[entry[field] for field in FIELDS] for entry in self._batch],
+                )
+        else:
+            self._file.write("".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in self._batch))
+            self._file.flush()
+        self.count += len(self._batch)
+        self._batch = []
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def read_manifest(path):
+    """Yield the entries of a JSONL or SQLite extraction manifest."""
+    if path.endswith((".sqlite", ".db")):
+        db = sqlite3.connect(path)
+        try:
+            for row in db.execute(f"SELECT {', '.join(FIELDS)} FROM artifacts ORDER BY id"):
+                yield dict(zip(FIELDS, row))
+        finally:
+            db.close()
+    else:
+        with open_input(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def run_manifest_path(output_dir, fmt="jsonl"):
+    """Return a fresh per-run manifest path inside output_dir."""
+    run_id = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    extension = "sqlite" if fmt == "sqlite" else "jsonl"
+    return os.path.join(output_dir, f"manifest-{run_id}.{extension}")
@@ -0,0 +1,281 @@
+import numpy as np
+from flows import FLOW_KEY, group_rows
+from pcap import ip_to_str
+
+
+SOURCE_WINDOW = ["src_ip_hi", "src_ip_lo", "window"]
+PORT_KEY_DTYPE = np.dtype([("src_ip_hi", "u8"), ("src_ip_lo", "u8"), ("window", "i8"), ("dest_port", "u2")])
+HOST_KEY_DTYPE = np.dtype([("src_ip_hi", "u8"), ("src_ip_lo", "u8"), ("window", "i8"),
+                           ("dest_ip_hi", "u8"), ("dest_ip_lo", "u8")])
+SOURCE_KEY_DTYPE = np.dtype([("src_ip_hi", "u8"), ("src_ip_lo", "u8"), ("window", "i8")])
+COUNT_DTYPE = np.dtype([("src_ip_hi", "u8"), ("src_ip_lo", "u8"), ("window", "i8"), ("count", "i8")])
+EVENT_DTYPE = np.dtype([("src_ip_hi", "u8"), ("src_ip_lo", "u8"), ("dest_ip_hi", "u8"), ("dest_ip_lo", "u8"),
+                        ("dest_port", "u2"), ("protocol", "u1"), ("time", "f8")])
+EVENT_KEY = ["src_ip_hi", "src_ip_lo", "dest_ip_hi", "dest_ip_lo", "dest_port", "protocol"]
+SERIES_DTYPE = np.dtype([(name, EVENT_DTYPE[name]) for name in EVENT_KEY] +
+                        [("first", "f8"), ("last", "f8"), ("gaps", "i8"), ("total", "f8"), ("squares", "f8")])
+REVERSE_KEY = ["dest_ip_hi", "dest_ip_lo", "src_ip_hi", "src_ip_lo", "dest_port", "src_port", "protocol"]
+
+
+def _times(rows):
+    return rows["timestamp"] if "timestamp" in rows.dtype.names else rows["first_seen"]
+
+
+def _flow_keys(rows, key):
+    keys = np.zeros(len(rows), dtype=[(name, rows.dtype[name]) for name in FLOW_KEY])
+    for name, column in zip(FLOW_KEY, key):
+        keys[name] = rows[column]
+    return keys
+
+
+def connection_starts(rows):
+    """Rows of a chunk that open a connection, i.e. the ones sent by the initiator.
+
+    For packets these are TCP SYNs without ACK and UDP datagrams. Flows
+    are unidirectional, so a flow is left out when the reverse flow in the
+    same chunk started earlier: it carries the replies.
+    """
+    if "timestamp" in rows.dtype.names:
+        syn = (rows["protocol"] == 6) & ((rows["tcp_flags"] & 0x12) == 0x02)
+        return rows[syn | (rows["protocol"] == 17)]
+    rows = rows[rows["ip_version"] != 0]
+    if not len(rows):
+        return rows
+    keys = _flow_keys(rows, FLOW_KEY)
+    order = np.argsort(keys, kind="stable")
+    reverse = _flow_keys(rows, REVERSE_KEY)
+    pos = np.minimum(np.searchsorted(keys[order], reverse), len(rows) - 1)
+    partner = order[pos]
+    reply = (keys[partner] == reverse) & (rows["first_seen"][partner] < rows["first_seen"])
+    return rows[~reply]
+
+
+def _source_keys(rows):
+    keys = np.zeros(len(rows), dtype=SOURCE_KEY_DTYPE)
+    for name in SOURCE_WINDOW:
+        keys[name] = rows[name]
+    return keys
+
+
+def _unique(rows):
+    order, starts = group_rows(rows, list(rows.dtype.names))
+    return rows[order][starts]
+
+
+class _DistinctRows:
+    """Set of distinct rows, deduplicated per chunk and compacted as it grows."""
+
+    def __init__(self, dtype):
+        self._table = np.zeros(0, dtype=dtype)
+        self._parts = []
+        self._pending = 0
+
+    def add(self, rows):
+        rows = _unique(rows)
+        self._parts.append(rows)
+        self._pending += len(rows)
+        if self._pending > max(len(self._table), 1 << 20):
+            self._compact()
+
+    def _compact(self):
+        if self._parts:
+            self._table = _unique(np.concatenate([self._table] + self._parts))
+            self._parts = []
+            self._pending = 0
+
+    def counts(self):
+        """Number of distinct rows per (source, window), sorted by source and window."""
+        self._compact()
+        order, starts = group_rows(self._table, SOURCE_WINDOW)
+        counts = np.zeros(len(starts), dtype=COUNT_DTYPE)
+        keys = self._table[order][starts]
+        for name in SOURCE_WINDOW:
+            counts[name] = keys[name]
+        counts["count"] = np.diff(np.append(starts, len(self._table)))
+        return counts
+
+
+def _lookup_counts(table, keys):
+    """Counts of table (sorted by source, window) for each key row, 0 where absent."""
+    if not len(table):
+        return np.zeros(len(keys), dtype=np.int64)
+    table_keys = _source_keys(table)
+    wanted = _source_keys(keys)
+    pos = np.minimum(np.searchsorted(table_keys, wanted), len(table) - 1)
+    return np.where(table_keys[pos] == wanted, table["count"][pos], 0)
+
+
+class ScanDetector:
+    """Count distinct destination ports and hosts per source in time windows.
+
+    Only connection starts count (see connection_starts), so the replies
+    of a busy server are not mistaken for a scan of its clients' ports.
+    Time is bucketed into windows of ``window`` seconds twice, the second
+    bucketing offset by half a window, so a scan straddling a boundary is
+    still seen whole by one of them. Only distinct (source, window, port)
+    and (source, window, host) rows are kept, so any capture length is
+    processed in one pass over the chunks.
+    """
+
+    def __init__(self, window=60.0, port_threshold=100, host_threshold=50):
+        self.window = window
+        self.port_threshold = port_threshold
+        self.host_threshold = host_threshold
+        self.shifts = (0.0, window / 2)
+        self._ports = [_DistinctRows(PORT_KEY_DTYPE) for _ in self.shifts]
+        self._hosts = [_DistinctRows(HOST_KEY_DTYPE) for _ in self.shifts]
+
+    def add(self, rows):
+        """Add a PACKET_DTYPE or FLOW_DTYPE chunk."""
+        rows = connection_starts(rows)
+        times = _times(rows)
+        for shift, ports, hosts in zip(self.shifts, self._ports, self._hosts):
+            window = np.floor((times + shift) / self.window).astype(np.int64)
+            port_rows = np.zeros(len(rows), dtype=PORT_KEY_DTYPE)
+            host_rows = np.zeros(len(rows), dtype=HOST_KEY_DTYPE)
+            for target in (port_rows, host_rows):
+                target["src_ip_hi"] = rows["src_ip_hi"]
+                target["src_ip_lo"] = rows["src_ip_lo"]
+                target["window"] = window
+            port_rows["dest_port"] = rows["dest_port"]
+            host_rows["dest_ip_hi"] = rows["dest_ip_hi"]
+            host_rows["dest_ip_lo"] = rows["dest_ip_lo"]
+            ports.add(port_rows)
+            hosts.add(host_rows)
+
+    def findings(self):
+        """Return the flagged windows, overlapping ones merged per source."""
+        hits = []
+        for shift, ports, hosts in zip(self.shifts, self._ports, self._hosts):
+            port_counts = ports.counts()
+            host_counts = hosts.counts()
+            flagged = np.concatenate([port_counts[port_counts["count"] >= self.port_threshold],
+                                      host_counts[host_counts["count"] >= self.host_threshold]])
+            if not len(flagged):
+                continue
+            flagged = _unique(_source_keys(flagged))
+            distinct_ports = _lookup_counts(port_counts, flagged)
+            distinct_hosts = _lookup_counts(host_counts, flagged)
+            for key, n_ports, n_hosts in zip(flagged, distinct_ports, distinct_hosts):
+                start = float(key["window"] * self.window - shift)
+                hits.append(((int(key["src_ip_hi"]), int(key["src_ip_lo"])), start, start + self.window,
+                             int(n_ports), int(n_hosts)))
+
+        findings = []
+        for source, start, end, n_ports, n_hosts in sorted(hits):
+            last = findings[-1] if findings else None
+            if last and last["_source"] == source and start < last["window_end"]:
+                last["window_end"] = max(last["window_end"], end)
+                last["distinct_ports"] = max(last["distinct_ports"], n_ports)
+                last["distinct_hosts"] = max(last["distinct_hosts"], n_hosts)
+                continue
+            findings.append({"_source": source, "source": ip_to_str(*source), "window_start": start,
+                             "window_end": end, "distinct_ports": n_ports, "distinct_hosts": n_hosts})
+        for finding in findings:
+            del finding["_source"]
+        return findings
+
+
+class BeaconDetector:
+    """Find connections repeated at a near-constant interval (C2 beaconing).
+
+    Events are connection starts (see connection_starts): flow first_seen
+    times, or TCP SYN and UDP packets. Each chunk is reduced right away to
+    one row per (source, destination, port, protocol) with its first and
+    last time and the count, sum and sum of squares of its inter-arrival
+    gaps, so memory follows the number of flows rather than packets. Gaps
+    shorter than min_interval are treated as one burst.
+    """
+
+    def __init__(self, min_events=6, max_jitter=0.1, min_interval=1.0):
+        self.min_events = min_events
+        self.max_jitter = max_jitter
+        self.min_interval = min_interval
+        self._table = np.zeros(0, dtype=SERIES_DTYPE)
+        self._parts = []
+        self._pending = 0
+
+    def add(self, rows):
+        """Add a PACKET_DTYPE or FLOW_DTYPE chunk."""
+        rows = connection_starts(rows)
+        events = np.zeros(len(rows), dtype=SERIES_DTYPE)
+        for name in EVENT_KEY:
+            events[name] = rows[name]
+        events["first"] = events["last"] = _times(rows)
+        series = self._merge(events)
+        self._parts.append(series)
+        self._pending += len(series)
+        if self._pending > max(len(self._table), 65536):
+            self._compact()
+
+    def _merge(self, rows):
+        """Combine SERIES_DTYPE rows into one row per group.
+
+        The series of a group are taken in time order and joined by the gap
+        between them; series that overlap in time (e.g. the same traffic in
+        two captures) are combined without one.
+        """
+        if not len(rows):
+            return rows
+        rows = rows[np.lexsort([rows[name] for name in reversed(EVENT_KEY + ["first"])])]
+        group_start = np.zeros(len(rows), dtype=bool)
+        group_start[0] = True
+        for name in EVENT_KEY:
+            group_start[1:] |= rows[name][1:] != rows[name][:-1]
+        starts = np.flatnonzero(group_start)
+
+        # A series is joined to the latest end of the series before it in its
+        # group (a running maximum of last, restarted per group through the
+        # rank of last offset by the group number)
+        group = np.cumsum(group_start) - 1
+        ends = np.sort(rows["last"])
+        rank = np.searchsorted(ends, rows["last"]) + group * len(rows)
+        latest = ends[np.maximum.accumulate(rank) - group * len(rows)]
+        joins = rows["first"][1:] - latest[:-1]
+        valid = ~group_start[1:] & (joins >= self.min_interval)
+        gap_count = rows["gaps"].copy()
+        gap_total = rows["total"].copy()
+        gap_squares = rows["squares"].copy()
+        gap_count[1:] += valid
+        gap_total[1:] += np.where(valid, joins, 0)
+        gap_squares[1:] += np.where(valid, joins * joins, 0)
+
+        merged = rows[starts]
+        merged["first"] = np.minimum.reduceat(rows["first"], starts)
+        merged["last"] = np.maximum.reduceat(rows["last"], starts)
+        merged["gaps"] = np.add.reduceat(gap_count, starts)
+        merged["total"] = np.add.reduceat(gap_total, starts)
+        merged["squares"] = np.add.reduceat(gap_squares, starts)
+        return merged
+
+    def _compact(self):
+        if self._parts:
+            self._table = self._merge(np.concatenate([self._table] + self._parts))
+            self._parts = []
+            self._pending = 0
+
+    def findings(self):
+        """Return the periodic (source, destination, port, protocol) groups, most regular first."""
+        self._compact()
+        series = self._table
+        count = series["gaps"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = series["total"] / count
+            jitter = np.sqrt(np.maximum(series["squares"] / count - mean * mean, 0)) / mean
+        periodic = np.flatnonzero((count + 1 >= self.min_events) & (jitter <= self.max_jitter))
+
+        findings = []
+        for g in periodic[np.argsort(jitter[periodic], kind="stable")]:
+            row = series[g]
+            findings.append({
+                "source": ip_to_str(row["src_ip_hi"], row["src_ip_lo"]),
+                "destination": ip_to_str(row["dest_ip_hi"], row["dest_ip_lo"]),
+                "dest_port": int(row["dest_port"]),
+                "protocol": int(row["protocol"]),
+                "events": int(count[g]) + 1,
+                "interval": float(mean[g]),
+                "jitter": float(jitter[g]),
+                "first_seen": float(row["first"]),
+                "last_seen": float(row["last"]),
+            })
+        return findings
@@ -0,0 +1,95 @@
+import codecs
+import os
+import pytsk3
+from fnmatch import fnmatch
+from capture import CAPTURE_EXTENSIONS, PCAPNG_MAGIC
+from pcap import PCAP_MAGIC
+
+
+# Network evidence, in match order. A file is a candidate when its name
+# has one of the extensions or matches a name/path pattern (lowercase,
+# "/" separated); it is only accepted once its first bytes carry the magic
+# and, for text logs, the marker.
+NETWORK_SIGNATURES = [
+    {"kind": "pcap", "parser": "capture", "extensions": CAPTURE_EXTENSIONS,
+     "magic": tuple(PCAP_MAGIC)},
+    {"kind": "pcapng", "parser": "capture", "extensions": CAPTURE_EXTENSIONS + (".ntar",),
+     "magic": (PCAPNG_MAGIC,)},
+    {"kind": "firewall_log", "parser": "w3c", "names": ("pfirewall.log*",),
+     "paths": ("*/system32/logfiles/firewall/*",),
+     "magic": (b"#",), "marker": b"Windows Firewall"},
+    {"kind": "iis_log", "parser": "w3c", "names": ("u_ex*.log", "ex*.log", "u_in*.log", "u_nc*.log"),
+     "paths": ("*/inetpub/logs/*", "*/system32/logfiles/w3svc*/*"),
+     "magic": (b"#",), "marker": b"Internet Information Services"},
+    {"kind": "httperr_log", "parser": "w3c", "names": ("httperr*.log",),
+     "paths": ("*/system32/logfiles/httperr/*",),
+     "magic": (b"#",), "marker": b"HTTP API"},
+    {"kind": "w3c_log", "parser": "w3c", "paths": ("*/system32/logfiles/*",),
+     "magic": (b"#",), "marker": b"#Fields:"},
+]
+HEADER_SIZE = 1024
+
+
+def _is_candidate(signature, name, path):
+    return (name.endswith(signature.get("extensions", ()))
+            or any(fnmatch(name, pattern) for pattern in signature.get("names", ()))
+            or any(fnmatch(path, pattern) for pattern in signature.get("paths", ())))
+
+
+def _has_magic(signature, header):
+    if header.startswith(codecs.BOM_UTF8):
+        header = header[len(codecs.BOM_UTF8):]
+    if not header.startswith(signature["magic"]):
+        return False
+    return signature.get("marker", b"") in header
+
+
+def match_signature(name, path, read_header, signatures=NETWORK_SIGNATURES):
+    """Return the signature a file matches, or None.
+
+    name and path are compared lowercase. read_header() is only called
+    when some signature names the file as a candidate, or the file has no
+    extension (renamed captures); all signatures are then checked against
+    the header in order, so the content decides the parser.
+    """
+    name, path = name.lower(), path.lower().replace("\\", "/")
+    if os.path.splitext(name)[1] and not any(_is_candidate(s, name, path) for s in signatures):
+        return None
+    header = bytes(read_header())
+    for signature in signatures:
+        if _has_magic(signature, header):
+            return signature
+    return None
+
+
+def iter_network_evidence(fs, signatures=NETWORK_SIGNATURES, header_size=HEADER_SIZE):
+    """Walk the whole file system once, yielding (signature, file_entry, file_path) per evidence file."""
+    seen = set()
+
+    def walk(directory, parent_path):
+        for entry in directory:
+            name = entry.info.name.name
+            if name in [b".", b".."] or not entry.info.meta:
+                continue
+            file_path = os.path.join(parent_path, name.decode(errors="replace"))
+            meta = entry.info.meta
+            if meta.type == pytsk3.TSK_FS_META_TYPE_DIR:
+                if meta.addr in seen:
+                    continue
+                seen.add(meta.addr)
+                try:
+                    yield from walk(entry.as_directory(), file_path)
+                except IOError as e:
+                    print(f"Skipping directory {file_path}: {e}")
+            elif meta.type == pytsk3.TSK_FS_META_TYPE_REG and meta.size:
+                size = min(header_size, meta.size)
+                try:
+                    signature = match_signature(os.path.basename(file_path), file_path,
+                                                lambda: entry.read_random(0, size), signatures)
+                except IOError as e:
+                    print(f"Skipping {file_path}: {e}")
+                    continue
+                if signature:
+                    yield signature, entry, file_path
+
+    yield from walk(fs.open_dir("/"), "/")
@@ -0,0 +1,67 @@
+import ipaddress
+import numpy as np
+from pcap import IPV4_MAPPED
+
+
+DEFAULT_ALLOWED_PORTS = (80, 443, 22)
+UINT64_MASK = 0xFFFFFFFFFFFFFFFF
+
+
+def parse_networks(cidrs):
+    """Turn CIDR strings into (hi, lo, mask_hi, mask_lo) tuples matching the split address columns."""
+    networks = []
+    for cidr in cidrs or []:
+        network = ipaddress.ip_network(cidr, strict=False)
+        if network.version == 4:
+            # IPv4 addresses are stored IPv4-mapped, i.e. under ::ffff:0:0/96
+            mask = 0xFFFFFFFF00000000 | ((0xFFFFFFFF << 32 - network.prefixlen) & 0xFFFFFFFF)
+            networks.append((0, IPV4_MAPPED | int(network.network_address), UINT64_MASK, mask))
+        else:
+            value = int(network.network_address)
+            mask = ((1 << 128) - 1) ^ ((1 << 128 - network.prefixlen) - 1)
+            networks.append((value >> 64, value & UINT64_MASK, mask >> 64, mask & UINT64_MASK))
+    return networks
+
+
+def in_networks(hi, lo, networks):
+    """Boolean mask of the addresses (hi/lo columns) inside any of the parsed networks."""
+    inside = np.zeros(len(hi), dtype=bool)
+    for net_hi, net_lo, mask_hi, mask_lo in networks:
+        inside |= (((hi & np.uint64(mask_hi)) == np.uint64(net_hi))
+                   & ((lo & np.uint64(mask_lo)) == np.uint64(net_lo)))
+    return inside
+
+
+def evaluate_anomaly_rules(rows, allowed_ports=DEFAULT_ALLOWED_PORTS, allowed_networks=None):
+    """Evaluate the anomaly rules over PACKET_DTYPE or FLOW_DTYPE rows.
+
+    Every rule is one boolean mask over whole columns. allowed_ports is the
+    set of expected TCP/UDP destination ports; allowed_networks an optional
+    list of CIDRs, and traffic with an endpoint outside all of them is
+    flagged. Returns {"total", "flagged", "rules": {name: {"count",
+    "indices"}}} with row indices into rows.
+    """
+    port_allowed = np.zeros(65536, dtype=bool)
+    port_allowed[list(allowed_ports)] = True
+    timestamps = rows["timestamp"] if "timestamp" in rows.dtype.names else rows["first_seen"]
+
+    masks = {
+        "ip_mismatch": (rows["src_ip_hi"] != rows["dest_ip_hi"]) | (rows["src_ip_lo"] != rows["dest_ip_lo"]),
+        "unexpected_port": np.isin(rows["protocol"], [6, 17]) & ~port_allowed[rows["dest_port"]],
+        "missing_timestamp": timestamps == 0,
+    }
+    networks = parse_networks(allowed_networks)
+    if networks:
+        ip_rows = rows["ip_version"] != 0
+        masks["outside_allowlist"] = ip_rows & ~(
+            in_networks(rows["src_ip_hi"], rows["src_ip_lo"], networks)
+            & in_networks(rows["dest_ip_hi"], rows["dest_ip_lo"], networks)
+        )
+
+    flagged = np.zeros(len(rows), dtype=bool)
+    results = {}
+    for name, mask in masks.items():
+        flagged |= mask
+        indices = np.flatnonzero(mask)
+        results[name] = {"count": len(indices), "indices": indices}
+    return {"total": len(rows), "flagged": int(np.count_nonzero(flagged)), "rules": results}
@@ -1,7 +1,18 @@
 import pyewf
 import pytsk3
+import numpy as np
 import os
 from datetime import datetime
+from capture import CaptureFile, detect_capture_format, iter_capture_packets
+from compression import open_input
+from flows import FlowTable, describe_flow
+from netbehavior import BeaconDetector, ScanDetector
+from netdiscovery import iter_network_evidence
+from netrules import DEFAULT_ALLOWED_PORTS, evaluate_anomaly_rules
+from imagefile import open_image_file
+from pcap import PACKET_DTYPE, PcapFormatError, ip_to_str
+from recordstore import RecordWriter
+from w3clog import iter_w3c_packets
 
 # Custom Img_Info class for pytsk3 to read from pyewf
 class EWFImgInfo(pytsk3.Img_Info):
@@ -53,66 +64,112 @@ def list_files_with_timestamps(file_entry, parent_path="/"):
                 list_files_with_timestamps(sub_entry, file_path)
 
 
-def detect_network_anomalies(packet_data):
-    """Detect network anomalies and display source IPs with timestamps."""
-    anomaly_count = 0
-    total_count = len(packet_data)
-
-    for packet in packet_data:
-        src_ip = packet.get("src_ip")
-        dest_ip = packet.get("dest_ip")
-        src_port = packet.get("src_port")
-        dest_port = packet.get("dest_port")
-        timestamp = packet.get("timestamp")
-
-        print(f"Source IP: {src_ip}, Destination IP: {dest_ip}")
-        print(f"  Source Port: {src_port}, Destination Port: {dest_port}")
-        print(f"  Timestamp: {format_timestamp(timestamp)}")
-
-        # Detect anomalies
-        if src_ip != dest_ip:
-            anomaly_count += 1  # IP mismatch
-        elif dest_port not in [80, 443, 22]:
-            anomaly_count += 1  # Unusual port scanning behavior
-        elif timestamp is None:
-            anomaly_count += 1  # Missing timestamp
-
-    # Calculate anomaly percentage
-    if total_count > 0:
-        anomaly_percentage = (anomaly_count / total_count) * 100
-    else:
-        anomaly_percentage = 0
+def detect_network_anomalies(data, allowed_ports=DEFAULT_ALLOWED_PORTS, allowed_networks=None, show=5):
+    """Run the anomaly rules over packet or flow rows and display a few hits per rule.
+
+    data is a PACKET_DTYPE or FLOW_DTYPE array. allowed_ports and
+    allowed_networks (CIDR strings) configure the rules. Returns the
+    per-rule counts and row indices from evaluate_anomaly_rules.
+    """
+    results = evaluate_anomaly_rules(data, allowed_ports, allowed_networks)
+    is_flows = "packets" in data.dtype.names
+
+    for name, rule in results["rules"].items():
+        print(f"Rule {name}: {rule['count']} of {results['total']} {'flows' if is_flows else 'packets'}")
+        for row in data[rule["indices"][:show]]:
+            if is_flows:
+                print(f"  {describe_flow(row)}, first seen {format_timestamp(row['first_seen'] or None)}")
+            else:
+                print(f"  Source IP: {ip_to_str(row['src_ip_hi'], row['src_ip_lo'])}:{row['src_port']}, "
+                      f"Destination IP: {ip_to_str(row['dest_ip_hi'], row['dest_ip_lo'])}:{row['dest_port']}, "
+                      f"Timestamp: {format_timestamp(row['timestamp'] or None)}")
+    return results
+
+
+def iter_image_capture(file_entry, file_path):
+    """Yield PACKET_DTYPE chunks parsed straight from a pcap/pcapng file on the image."""
+    try:
+        with open_image_file(file_entry) as reader:
+            for packets in iter_capture_packets(reader):
+                yield packets
+    except PcapFormatError as e:
+        print(f"Skipping {file_path}: {e}")
+
+
+def iter_image_w3c_log(file_entry, file_path, record_sink=None):
+    """Yield PACKET_DTYPE chunks for a firewall/IIS log on the image, one row per logged connection."""
+    with open_image_file(file_entry) as reader:
+        yield from iter_w3c_packets(reader, file_path, record_sink)
 
-    return anomaly_percentage
+
+def load_network_logs_from_file(path):
+    """Parse an extracted pcap/pcapng file into one PACKET_DTYPE array.
+
+    Plain files are memory-mapped; gzip/zstd compressed copies (as kept in
+    the blob store) are decompressed as a stream.
+    """
+    chunks = []
+    try:
+        with open(path, "rb") as f:
+            compressed = detect_capture_format(f.read(4)) is None
+        if compressed:
+            with open_input(path) as stream:
+                chunks = list(iter_capture_packets(stream))
+        else:
+            with CaptureFile(path) as capture:
+                chunks = list(capture.packets())
+    except PcapFormatError as e:
+        print(f"Skipping {path}: {e}")
+    print(f"Parsed {sum(len(c) for c in chunks)} packets from {path}")
+
+    if not chunks:
+        return np.zeros(0, dtype=PACKET_DTYPE)
+    return np.concatenate(chunks)
+
+
+def iter_network_packets(fs, record_sink=None):
+    """Yield PACKET_DTYPE chunks from all network evidence on the image.
+
+    The file system is walked once by iter_network_evidence; every match
+    is handed to the parser its signature names: captures to the
+    pcap/pcapng decoder, firewall and IIS logs to the W3C log parser
+    (whose records also go to record_sink).
+    """
+    parsers = {
+        "capture": iter_image_capture,
+        "w3c": lambda file_entry, file_path: iter_image_w3c_log(file_entry, file_path, record_sink),
+    }
+    for signature, file_entry, file_path in iter_network_evidence(fs):
+        print(f"Found {signature['kind']} file: {file_path}")
+        count = 0
+        for packets in parsers[signature["parser"]](file_entry, file_path):
+            count += len(packets)
+            yield packets
+        print(f"Parsed {count} {'packets' if signature['parser'] == 'capture' else 'connections'} "
+              f"from {file_path}")
 
 
 def load_network_logs_from_image(fs):
-    """Extract network-related data (mocked here)."""
-    network_data = []
-
-    # Assuming there is a file with network logs (e.g., PCAP or CSV)
-    for file_entry in fs.open_dir("/"):
-        if file_entry.info.name.name.endswith(b".pcap") or file_entry.info.name.name.endswith(b".log"):
-            file_path = os.path.join("/", file_entry.info.name.name.decode())
-            print(f"Found network log file: {file_path}")
-
-            # Mocking some packet data here for demonstration
-            network_data.append({
-                "src_ip": "192.168.1.1",
-                "dest_ip": "192.168.1.2",
-                "src_port": 12345,
-                "dest_port": 80,
-                "timestamp": datetime.now().timestamp()
-            })
-            network_data.append({
-                "src_ip": "192.168.1.2",
-                "dest_ip": "192.168.1.3",
-                "src_port": 12346,
-                "dest_port": 443,
-                "timestamp": datetime.now().timestamp()
-            })
-    
-    return network_data
+    """Parse the network evidence on the image into one PACKET_DTYPE array."""
+    chunks = list(iter_network_packets(fs))
+    if not chunks:
+        return np.zeros(0, dtype=PACKET_DTYPE)
+    return np.concatenate(chunks)
+
+
+def build_flow_table(chunks, *detectors):
+    """Aggregate PACKET_DTYPE chunks into a FlowTable as they stream in.
+
+    Each chunk is also passed to the given detectors (e.g. ScanDetector,
+    BeaconDetector), so all of them are fed in a single pass.
+    """
+    table = FlowTable()
+    for packets in chunks:
+        table.add(packets)
+        for detector in detectors:
+            detector.add(packets)
+    print(f"Aggregated {table.packets} packets into {len(table)} flows ({table.non_ip} non-IP packets)")
+    return table
 
 
 def main():
@@ -151,13 +208,28 @@ def main():
 
         print(f"Listing complete.")
         
-        # Load network logs from the SMART image
+        # Aggregate the captures and firewall/IIS logs on the SMART image into flows
         print("Extracting network log data...")
-        network_data = load_network_logs_from_image(fs)
+        scans = ScanDetector()
+        beacons = BeaconDetector()
+        with RecordWriter(os.path.join("network_logs", "w3c_records.jsonl")) as w3c_sink:
+            flow_table = build_flow_table(iter_network_packets(fs, w3c_sink), scans, beacons)
 
         # Perform network anomaly detection
-        anomaly_percentage = detect_network_anomalies(network_data)
-        print(f"Anomaly percentage detected in network traffic: {anomaly_percentage:.2f}%")
+        results = detect_network_anomalies(flow_table.flows())
+        if results["total"]:
+            print(f"Flagged {results['flagged']} of {results['total']} flows "
+                  f"({results['flagged'] / results['total'] * 100:.2f}%)")
+
+        # Behaviour over time: port/host scans and periodic beacons
+        for scan in scans.findings():
+            print(f"Possible scan from {scan['source']} between {format_timestamp(scan['window_start'])} and "
+                  f"{format_timestamp(scan['window_end'])}: {scan['distinct_ports']} ports, "
+                  f"{scan['distinct_hosts']} hosts")
+        for beacon in beacons.findings():
+            print(f"Possible beacon {beacon['source']} -> {beacon['destination']}:{beacon['dest_port']} "
+                  f"every {beacon['interval']:.1f}s ({beacon['events']} connections, "
+                  f"jitter {beacon['jitter']:.2%})")
         
     except Exception as e:
         print(f"An error occurred: {e}")
@@ -0,0 +1,228 @@
+import ipaddress
+import struct
+import numpy as np
+
+
+# One row per packet. Addresses are 128-bit, split into two uint64 halves;
+# IPv4 addresses are stored IPv4-mapped (::ffff:a.b.c.d) so both families
+# share the same columns.
+PACKET_DTYPE = np.dtype([
+    ("timestamp", "f8"),
+    ("offset", "u8"),
+    ("interface", "u2"),
+    ("caplen", "u4"),
+    ("length", "u4"),
+    ("ip_version", "u1"),
+    ("protocol", "u1"),
+    ("src_ip_hi", "u8"),
+    ("src_ip_lo", "u8"),
+    ("dest_ip_hi", "u8"),
+    ("dest_ip_lo", "u8"),
+    ("src_port", "u2"),
+    ("dest_port", "u2"),
+    ("tcp_flags", "u1"),
+])
+
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = (12, 101, 228, 229)
+LINKTYPE_LINUX_SLL = 113
+
+PCAP_MAGIC = {
+    b"\xd4\xc3\xb2\xa1": ("<", 1e-6),
+    b"\xa1\xb2\xc3\xd4": (">", 1e-6),
+    b"\x4d\x3c\xb2\xa1": ("<", 1e-9),
+    b"\xa1\xb2\x3c\x4d": (">", 1e-9),
+}
+
+IPV4_MAPPED = 0xFFFF << 32
+HEADER_SNAP = 96  # enough for Ethernet + VLAN + IPv4 with options + TCP
+HEADER_BLOCK = 8192  # packets whose header bytes are gathered at once
+DEFAULT_BATCH_SIZE = 65536  # packets per array yielded when reading a buffer
+MAX_PACKET_SIZE = 64 * 1024 * 1024
+
+
+class PcapFormatError(Exception):
+    pass
+
+
+def _be(head, pos, width):
+    """Read a big-endian unsigned field at a per-packet position."""
+    cols = np.minimum(pos[:, None] + np.arange(width), HEADER_SNAP - 1)
+    data = np.take_along_axis(head, cols, axis=1).astype(np.uint64)
+    value = np.zeros(len(head), dtype=np.uint64)
+    for k in range(width):
+        value = (value << np.uint64(8)) | data[:, k]
+    return value
+
+
+def decode_packets(data, offsets, caplens, lengths, timestamps, linktype, interfaces=0, file_offset=0):
+    """Decode the link, network and transport headers of many packets at once.
+
+    data is any buffer (bytes, mmap); offsets point at the first byte of
+    each captured packet and, plus file_offset, become the ``offset``
+    column. linktype and interfaces may be scalars or one value per packet.
+    Returns a PACKET_DTYPE array; fields a packet does not have (non-IP,
+    truncated, fragments) are left 0.
+    """
+    count = len(offsets)
+    packets = np.zeros(count, dtype=PACKET_DTYPE)
+    if not count:
+        return packets
+    packets["timestamp"] = timestamps
+    packets["offset"] = np.asarray(offsets, dtype=np.uint64) + np.uint64(file_offset)
+    packets["interface"] = interfaces
+    packets["caplen"] = caplens
+    packets["length"] = lengths
+
+    # Copy the first HEADER_SNAP bytes of every packet into one 2-D array,
+    # HEADER_BLOCK packets at a time so the index arrays stay small
+    buf = np.frombuffer(data, dtype=np.uint8)
+    offsets = np.asarray(offsets, dtype=np.intp)
+    caplens = np.asarray(caplens, dtype=np.int64)
+    cols = np.arange(HEADER_SNAP, dtype=np.intp)
+    head = np.zeros((count, HEADER_SNAP), dtype=np.uint8)
+    for first in range(0, count, HEADER_BLOCK):
+        block = slice(first, first + HEADER_BLOCK)
+        idx = np.minimum(offsets[block, None] + cols, len(buf) - 1)
+        head[block] = np.where(cols < caplens[block, None], buf[idx], 0)
+    rows = np.arange(count)
+
+    # Link layer: where does the IP header start, and what does it carry?
+    linktype = np.broadcast_to(np.asarray(linktype), (count,))
+    l3 = np.full(count, -1, dtype=np.int64)
+    ethertype = np.zeros(count, dtype=np.uint64)
+    eth = linktype == LINKTYPE_ETHERNET
+    ethertype[eth] = _be(head, np.full(count, 12), 2)[eth]
+    vlan = eth & np.isin(ethertype, [0x8100, 0x88A8])
+    ethertype[vlan] = _be(head, np.full(count, 16), 2)[vlan]
+    l3[eth] = np.where(vlan, 18, 14)[eth]
+    sll = linktype == LINKTYPE_LINUX_SLL
+    ethertype[sll] = _be(head, np.full(count, 14), 2)[sll]
+    l3[sll] = 16
+    raw = np.isin(linktype, LINKTYPE_RAW)
+    l3[raw] = 0
+
+    has_l3 = l3 >= 0
+    version = np.where(has_l3, head[rows, np.clip(l3, 0, HEADER_SNAP - 1)] >> 4, 0)
+    ipv4 = has_l3 & (version == 4) & (raw | (ethertype == 0x0800)) & (caplens >= l3 + 20)
+    ipv6 = has_l3 & (version == 6) & (raw | (ethertype == 0x86DD)) & (caplens >= l3 + 40)
+    l3 = np.clip(l3, 0, HEADER_SNAP - 1)
+
+    # IPv4
+    ihl = (head[rows, l3] & 0x0F).astype(np.int64) * 4
+    proto4 = head[rows, np.minimum(l3 + 9, HEADER_SNAP - 1)]
+    fragment = _be(head, l3 + 6, 2) & np.uint64(0x1FFF)
+    packets["ip_version"][ipv4] = 4
+    packets["protocol"][ipv4] = proto4[ipv4]
+    packets["src_ip_lo"][ipv4] = (_be(head, l3 + 12, 4) | np.uint64(IPV4_MAPPED))[ipv4]
+    packets["dest_ip_lo"][ipv4] = (_be(head, l3 + 16, 4) | np.uint64(IPV4_MAPPED))[ipv4]
+
+    # IPv6 (extension headers are not followed)
+    packets["ip_version"][ipv6] = 6
+    packets["protocol"][ipv6] = head[rows, np.minimum(l3 + 6, HEADER_SNAP - 1)][ipv6]
+    packets["src_ip_hi"][ipv6] = _be(head, l3 + 8, 8)[ipv6]
+    packets["src_ip_lo"][ipv6] = _be(head, l3 + 16, 8)[ipv6]
+    packets["dest_ip_hi"][ipv6] = _be(head, l3 + 24, 8)[ipv6]
+    packets["dest_ip_lo"][ipv6] = _be(head, l3 + 32, 8)[ipv6]
+
+    # TCP/UDP ports, only for unfragmented (or first-fragment) payloads
+    l4 = np.where(ipv4, l3 + ihl, l3 + 40)
+    protocol = packets["protocol"]
+    has_l4 = ((ipv4 & (fragment == 0) & (ihl >= 20)) | ipv6) & np.isin(protocol, [6, 17])
+    has_l4 &= caplens >= l4 + 4
+    l4 = np.clip(l4, 0, HEADER_SNAP - 4)
+    packets["src_port"][has_l4] = _be(head, l4, 2)[has_l4]
+    packets["dest_port"][has_l4] = _be(head, l4 + 2, 2)[has_l4]
+    tcp = has_l4 & (protocol == 6) & (caplens >= l4 + 14)
+    packets["tcp_flags"][tcp] = head[rows, np.minimum(l4 + 13, HEADER_SNAP - 1)][tcp]
+    return packets
+
+
+def _walk_pcap_records(buf, record, pos=0, limit=None):
+    """Return the start of every complete record in buf (up to limit) and the end of the last one."""
+    starts = []
+    size = len(buf)
+    header_size = record.size
+    caplen_at = struct.Struct(record.format[0] + "I").unpack_from
+    while pos + header_size <= size and (limit is None or len(starts) < limit):
+        caplen = caplen_at(buf, pos + 8)[0]
+        if caplen > MAX_PACKET_SIZE:
+            raise PcapFormatError(f"Implausible packet length {caplen} at offset {pos}")
+        end = pos + header_size + caplen
+        if end > size:
+            break
+        starts.append(pos)
+        pos = end
+    return np.asarray(starts, dtype=np.int64), pos
+
+
+def _decode_pcap_records(buf, starts, record, scale, linktype, file_offset=0):
+    # Record headers are decoded column-wise: ts_sec, ts_frac, caplen, length
+    headers = np.frombuffer(buf, dtype=np.uint8)[starts[:, None] + np.arange(record.size)]
+    fields = headers.view(np.dtype(record.format[0] + "u4"))
+    timestamps = fields[:, 0].astype(np.float64) + fields[:, 1].astype(np.float64) * scale
+    return decode_packets(buf, starts + record.size, fields[:, 2], fields[:, 3], timestamps, linktype,
+                          file_offset=file_offset)
+
+
+def read_pcap_header(header):
+    """Parse a libpcap global header, returning (record struct, timestamp scale, linktype)."""
+    if len(header) < 24 or header[:4] not in PCAP_MAGIC:
+        raise PcapFormatError("Not a libpcap capture file")
+    endian, scale = PCAP_MAGIC[header[:4]]
+    linktype = struct.unpack_from(endian + "I", header, 20)[0] & 0x0FFFFFFF
+    return struct.Struct(endian + "IIII"), scale, linktype
+
+
+def iter_pcap_packets(stream, chunk_size=16 * 1024 * 1024):
+    """Yield PACKET_DTYPE arrays for a libpcap capture, one per chunk read from stream."""
+    record, scale, linktype = read_pcap_header(stream.read(24))
+    pending = b""
+    file_offset = 24  # file position of buf[0]
+    while True:
+        data = stream.read(chunk_size)
+        if not data:
+            break
+        buf = pending + data if pending else data
+        starts, end = _walk_pcap_records(buf, record)
+        if len(starts):
+            yield _decode_pcap_records(buf, starts, record, scale, linktype, file_offset)
+        pending = buf[end:]
+        file_offset += end
+    if pending:
+        print(f"Warning: capture ends with a truncated packet ({len(pending)} bytes)")
+
+
+def iter_pcap_buffer(buf, batch_size=DEFAULT_BATCH_SIZE):
+    """Yield PACKET_DTYPE arrays for a libpcap capture held in a buffer such as an mmap.
+
+    Packet bytes are read in place; only batch_size record offsets are
+    collected at a time.
+    """
+    record, scale, linktype = read_pcap_header(buf[:24])
+    pos = 24
+    while True:
+        starts, end = _walk_pcap_records(buf, record, pos, batch_size)
+        if not len(starts):
+            break
+        yield _decode_pcap_records(buf, starts, record, scale, linktype)
+        pos = end
+    if pos < len(buf):
+        print(f"Warning: capture ends with a truncated packet ({len(buf) - pos} bytes)")
+
+
+def ip_to_str(hi, lo):
+    """Format an address stored as two uint64 halves."""
+    hi, lo = int(hi), int(lo)
+    if hi == 0 and lo >> 32 == 0xFFFF:
+        return str(ipaddress.IPv4Address(lo & 0xFFFFFFFF))
+    return str(ipaddress.IPv6Address((hi << 64) | lo))
+
+
+def ip_from_str(text):
+    """Split an IPv4/IPv6 address into the (hi, lo) halves used in PACKET_DTYPE."""
+    address = ipaddress.ip_address(text)
+    if address.version == 4:
+        return 0, IPV4_MAPPED | int(address)
+    value = int(address)
+    return value >> 64, value & 0xFFFFFFFFFFFFFFFF
@@ -0,0 +1,182 @@
+import struct
+import numpy as np
+from pcap import DEFAULT_BATCH_SIZE, MAX_PACKET_SIZE, PcapFormatError, decode_packets
+
+
+BLOCK_SHB = 0x0A0D0D0A
+BLOCK_IDB = 0x00000001
+BLOCK_SPB = 0x00000003
+BLOCK_EPB = 0x00000006
+
+BYTE_ORDER_MAGIC = {b"\x4d\x3c\x2b\x1a": "<", b"\x1a\x2b\x3c\x4d": ">"}
+
+OPTION_END = 0
+OPTION_IF_TSRESOL = 9
+OPTION_IF_TSOFFSET = 14
+
+
+class _Interface:
+    __slots__ = ("linktype", "snaplen", "units", "offset")
+
+    def __init__(self, linktype, snaplen, units=1000000, offset=0):
+        self.linktype = linktype
+        self.snaplen = snaplen
+        self.units = units  # timestamp ticks per second
+        self.offset = offset
+
+
+class PcapngParser:
+    """Incremental pcapng block parser.
+
+    ``parse`` decodes every complete block in a buffer and returns where it
+    stopped, so the same parser works on streamed chunks and on a whole
+    memory-mapped file. Section header and interface description blocks
+    are handled in Python (they are rare); runs of consecutive enhanced or
+    simple packet blocks are decoded column-wise with NumPy. Interfaces
+    are numbered across sections in the order they are described.
+    """
+
+    def __init__(self):
+        self.endian = None
+        self.interfaces = []
+        self.section_base = 0
+
+    def parse(self, buf, pos=0, file_offset=0, batch_size=None):
+        """Decode complete blocks of buf from pos; returns (packet arrays, end position)."""
+        arrays = []
+        size = len(buf)
+        while pos + 12 <= size:
+            if buf[pos:pos + 4] == b"\x0a\x0d\x0d\x0a":
+                end = self._section_header(buf, pos)
+                if end is None:
+                    break
+                pos = end
+                continue
+            if self.endian is None:
+                raise PcapFormatError("Not a pcapng capture file")
+
+            block_type, length = struct.unpack_from(self.endian + "II", buf, pos)
+            if length < 12 or length % 4 or length > MAX_PACKET_SIZE:
+                raise PcapFormatError(f"Invalid block length {length} at offset {file_offset + pos}")
+            if pos + length > size:
+                break
+
+            if block_type in (BLOCK_EPB, BLOCK_SPB):
+                starts, pos = self._walk_blocks(buf, pos, block_type, batch_size)
+                arrays.append(self._decode(buf, starts, block_type, file_offset))
+                if batch_size:
+                    return arrays, pos
+                continue
+            if block_type == BLOCK_IDB:
+                self._interface_description(buf, pos, length)
+            pos += length  # name resolution, statistics, custom blocks, ...
+        return arrays, pos
+
+    def _section_header(self, buf, pos):
+        if pos + 12 > len(buf):
+            return None
+        endian = BYTE_ORDER_MAGIC.get(bytes(buf[pos + 8:pos + 12]))
+        if endian is None:
+            raise PcapFormatError("Invalid pcapng byte-order magic")
+        length = struct.unpack_from(endian + "I", buf, pos + 4)[0]
+        if length < 28 or length % 4:
+            raise PcapFormatError(f"Invalid section header length {length}")
+        if pos + length > len(buf):
+            return None
+        self.endian = endian
+        self.section_base = len(self.interfaces)  # interface ids restart in every section
+        return pos + length
+
+    def _interface_description(self, buf, pos, length):
+        linktype, _, snaplen = struct.unpack_from(self.endian + "HHI", buf, pos + 8)
+        interface = _Interface(linktype, snaplen)
+        option = pos + 16
+        end = pos + length - 4
+        while option + 4 <= end:
+            code, option_length = struct.unpack_from(self.endian + "HH", buf, option)
+            if code == OPTION_END:
+                break
+            value = option + 4
+            if code == OPTION_IF_TSRESOL and option_length >= 1:
+                resolution = buf[value]
+                # High bit set: negative power of two, else negative power of ten
+                interface.units = 2 ** (resolution & 0x7F) if resolution & 0x80 else 10 ** resolution
+            elif code == OPTION_IF_TSOFFSET and option_length >= 8:
+                interface.offset = struct.unpack_from(self.endian + "q", buf, value)[0]
+            option = value + (option_length + 3) // 4 * 4
+        self.interfaces.append(interface)
+
+    def _walk_blocks(self, buf, pos, block_type, limit=None):
+        """Collect the starts of consecutive complete blocks of one type."""
+        starts = []
+        size = len(buf)
+        header = struct.Struct(self.endian + "II").unpack_from
+        while pos + 12 <= size and (limit is None or len(starts) < limit):
+            current_type, length = header(buf, pos)
+            if current_type != block_type or length < 12 or length % 4 or pos + length > size:
+                break
+            starts.append(pos)
+            pos += length
+        return np.asarray(starts, dtype=np.int64), pos
+
+    def _decode(self, buf, starts, block_type, file_offset):
+        u4 = np.dtype(self.endian + "u4")
+        section = self.interfaces[self.section_base:]
+        if not section:
+            raise PcapFormatError("Packet block before any interface description")
+        linktypes = np.array([i.linktype for i in section], dtype=np.int64)
+
+        if block_type == BLOCK_EPB:
+            # type, length, interface id, timestamp high/low, captured length, original length
+            fields = np.frombuffer(buf, dtype=np.uint8)[starts[:, None] + np.arange(28)].view(u4)
+            local = fields[:, 2].astype(np.int64)
+            if local.max() >= len(section):
+                raise PcapFormatError(f"Packet references unknown interface {local.max()}")
+            units = np.array([i.units for i in section], dtype=np.uint64)[local]
+            offsets = np.array([i.offset for i in section], dtype=np.float64)[local]
+            ticks = (fields[:, 3].astype(np.uint64) << np.uint64(32)) | fields[:, 4].astype(np.uint64)
+            timestamps = (ticks // units).astype(np.float64) + (ticks % units).astype(np.float64) / units + offsets
+            caplens = np.minimum(fields[:, 5].astype(np.int64), fields[:, 1].astype(np.int64) - 32)
+            return decode_packets(buf, starts + 28, caplens, fields[:, 6], timestamps, linktypes[local],
+                                  interfaces=local + self.section_base, file_offset=file_offset)
+
+        # Simple packet blocks: interface 0, no timestamp
+        fields = np.frombuffer(buf, dtype=np.uint8)[starts[:, None] + np.arange(12)].view(u4)
+        caplens = np.minimum(fields[:, 2].astype(np.int64), fields[:, 1].astype(np.int64) - 16)
+        if section[0].snaplen:
+            caplens = np.minimum(caplens, section[0].snaplen)
+        return decode_packets(buf, starts + 12, caplens, fields[:, 2], 0.0, linktypes[0],
+                              interfaces=self.section_base, file_offset=file_offset)
+
+
+def iter_pcapng_packets(stream, chunk_size=16 * 1024 * 1024):
+    """Yield PACKET_DTYPE arrays for a pcapng capture read from stream in chunks."""
+    parser = PcapngParser()
+    pending = b""
+    file_offset = 0  # file position of buf[0]
+    while True:
+        data = stream.read(chunk_size)
+        if not data:
+            break
+        buf = pending + data if pending else data
+        arrays, end = parser.parse(buf, file_offset=file_offset)
+        for packets in arrays:
+            yield packets
+        pending = buf[end:]
+        file_offset += end
+    if pending:
+        print(f"Warning: capture ends with a truncated block ({len(pending)} bytes)")
+
+
+def iter_pcapng_buffer(buf, batch_size=DEFAULT_BATCH_SIZE):
+    """Yield PACKET_DTYPE arrays for a pcapng capture held in a buffer such as an mmap."""
+    parser = PcapngParser()
+    pos = 0
+    while pos < len(buf):
+        arrays, end = parser.parse(buf, pos, batch_size=batch_size)
+        for packets in arrays:
+            yield packets
+        if end == pos:
+            print(f"Warning: capture ends with a truncated block ({len(buf) - pos} bytes)")
+            break
+        pos = end
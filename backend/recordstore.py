@@ -0,0 +1,116 @@
+import json
+import os
+import threading
+from compression import normalize_compression, open_input, open_output, output_path
+
+
+class RecordWriter:
+    """Append-only JSON Lines writer for parsed records.
+
+    Records are written as they are produced, so large result sets never
+    have to be held in memory. With a compression, the file gets a .gz/.zst
+    suffix and is compressed as it is written. With append, records are
+    added to an existing file instead of replacing it. Safe to share
+    between writer threads.
+    """
+
+    def __init__(self, path, compression=None, append=False):
+        compression = normalize_compression(compression)
+        self.path = output_path(path, compression)
+        self.count = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._file = open_output(self.path, compression, encoding="utf-8", append=append)
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self.count += 1
+
+    def write_many(self, records):
+        lines = [json.dumps(record, ensure_ascii=False, default=str) for record in records]
+        if not lines:
+            return
+        with self._lock:
+            self._file.write("\n".join(lines) + "\n")
+            self.count += len(lines)
+
+    def flush(self):
+        """Push every record written so far through the compressor to the file."""
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def read_records(path):
+    """Yield the records stored in a (possibly compressed) JSON Lines file."""
+    with open_input(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def filter_records(path, keep, compression=None):
+    """Rewrite a record file, keeping only the records keep() accepts.
+
+    Used on resume to drop the partial output of interrupted jobs; a tail
+    torn by the crash is dropped too. Returns (kept, dropped).
+    """
+    compression = normalize_compression(compression)
+    path = output_path(path, compression)
+    if not os.path.exists(path):
+        return 0, 0
+
+    kept = dropped = 0
+    tmp_path = path + ".tmp"
+    with open_output(tmp_path, compression, encoding="utf-8") as out:
+        try:
+            with open_input(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        dropped += 1
+                        continue
+                    if keep(record):
+                        out.write(line if line.endswith("\n") else line + "\n")
+                        kept += 1
+                    else:
+                        dropped += 1
+        except Exception as e:
+            print(f"Warning: {path} is truncated, dropping the rest: {e}")
+    os.replace(tmp_path, path)
+    return kept, dropped
+
+
+class MultiSink:
+    """Forward records to several sinks, e.g. a RecordWriter and an index."""
+
+    def __init__(self, *sinks):
+        self.sinks = [sink for sink in sinks if sink is not None]
+
+    @property
+    def path(self):
+        """Output file of the first sink that has one, for manifests."""
+        return next((sink.path for sink in self.sinks if hasattr(sink, "path")), None)
+
+    def write(self, record):
+        for sink in self.sinks:
+            sink.write(record)
+
+    def write_many(self, records):
+        for sink in self.sinks:
+            sink.write_many(records)
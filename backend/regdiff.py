@@ -0,0 +1,238 @@
+import hashlib
+import os
+import struct
+import regf
+from recordstore import RecordWriter
+
+
+KEY_CHANGES = ("key_added", "key_removed", "key_modified")
+VALUE_CHANGES = ("value_added", "value_removed", "value_modified")
+FIELD = struct.Struct("<Q")
+
+
+def _field(digest, data):
+    # Length-prefixed, so adjacent fields cannot run into each other
+    digest.update(FIELD.pack(len(data)))
+    digest.update(data)
+
+
+def _display(value):
+    """JSON friendly form of a decoded value: bytes as hex, datetimes and numbers as text."""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).hex()
+    if isinstance(value, (str, list)):
+        return value
+    return str(value)
+
+
+class HiveDigests:
+    """Subtree (Merkle) digests of the keys of one hive, computed once per key and memoized by offset.
+
+    A key's own digest covers its lowercased name, its last write time
+    (unless include_timestamps is off) and its values, sorted by name, with
+    their type and raw data. Its subtree digest adds the (name, subtree
+    digest) pairs of its subkeys, so two keys with equal subtree digests
+    have identical contents all the way down.
+    """
+
+    def __init__(self, registry, include_timestamps=True):
+        self.registry = registry
+        self.include_timestamps = include_timestamps
+        self._digests = {}
+
+    def own(self, key):
+        return self._get(key)[1]
+
+    def subtree(self, key):
+        return self._get(key)[0]
+
+    def key_count(self, key):
+        """Number of keys in the subtree, the key included."""
+        return self._get(key)[2]
+
+    def _get(self, key):
+        entry = self._digests.get(key.offset())
+        if entry is None:
+            entry = self._compute(key, set())
+        return entry
+
+    def _compute(self, key, ancestors):
+        offset = key.offset()
+        entry = self._digests.get(offset)
+        if entry is not None:
+            return entry
+        ancestors.add(offset)
+
+        own = hashlib.sha256()
+        _field(own, key.name().lower().encode("utf-8"))
+        if self.include_timestamps:
+            _field(own, key.timestamp().isoformat().encode("ascii"))
+        for value in sorted(key.iter_values(), key=lambda v: v.name().lower()):
+            _field(own, value.name().lower().encode("utf-8"))
+            _field(own, FIELD.pack(value.value_type()))
+            _field(own, value.raw_data())
+        own = own.digest()
+
+        subtree = hashlib.sha256(own)
+        count = 1
+        children = []
+        for subkey in key.iter_subkeys():
+            if subkey.offset() in ancestors:
+                continue  # a corrupt hive can link a key below itself
+            children.append((subkey.name().lower(), self._compute(subkey, ancestors)))
+        for name, (digest, _, subkeys) in sorted(children):
+            _field(subtree, name.encode("utf-8"))
+            subtree.update(digest)
+            count += subkeys
+
+        ancestors.discard(offset)
+        entry = self._digests[offset] = (subtree.digest(), own, count)
+        return entry
+
+
+def _by_name(items):
+    return {item.name().lower(): item for item in items}
+
+
+def diff_keys(old, new, path, old_digests, new_digests):
+    """Yield the changes between two keys, descending only into subtrees whose digests differ."""
+    if old_digests.subtree(old) == new_digests.subtree(new):
+        return
+
+    if old_digests.own(old) != new_digests.own(new):
+        if old_digests.include_timestamps and old.timestamp() != new.timestamp():
+            yield {"change": "key_modified", "path": path,
+                   "old": old.timestamp().isoformat(), "new": new.timestamp().isoformat()}
+        old_values, new_values = _by_name(old.iter_values()), _by_name(new.iter_values())
+        for name in sorted(old_values.keys() | new_values.keys()):
+            before, after = old_values.get(name), new_values.get(name)
+            if after is None:
+                yield {"change": "value_removed", "path": path, "name": before.name(),
+                       "type": before.value_type_str(), "old": _display(before.value())}
+            elif before is None:
+                yield {"change": "value_added", "path": path, "name": after.name(),
+                       "type": after.value_type_str(), "new": _display(after.value())}
+            elif (before.value_type(), before.raw_data()) != (after.value_type(), after.raw_data()):
+                yield {"change": "value_modified", "path": path, "name": after.name(),
+                       "type": after.value_type_str(), "old_type": before.value_type_str(),
+                       "old": _display(before.value()), "new": _display(after.value())}
+
+    old_subkeys, new_subkeys = _by_name(old.iter_subkeys()), _by_name(new.iter_subkeys())
+    for name in sorted(old_subkeys.keys() | new_subkeys.keys()):
+        before, after = old_subkeys.get(name), new_subkeys.get(name)
+        if after is None:
+            yield {"change": "key_removed", "path": f"{path}\\{before.name()}",
+                   "last_written": before.timestamp().isoformat(), "keys": old_digests.key_count(before)}
+        elif before is None:
+            yield {"change": "key_added", "path": f"{path}\\{after.name()}",
+                   "last_written": after.timestamp().isoformat(), "keys": new_digests.key_count(after)}
+        else:
+            yield from diff_keys(before, after, f"{path}\\{after.name()}", old_digests, new_digests)
+
+
+def diff_hives(old_registry, new_registry, include_timestamps=True):
+    """Yield the changes from one parsed hive to another, top-down.
+
+    Keys and values are matched by name, case-insensitively. An added or
+    removed key is reported once, with the number of keys in its subtree,
+    rather than once per descendant. Paths start at the root key, as in
+    regf.RegistryKey.path().
+    """
+    old_root, new_root = old_registry.root(), new_registry.root()
+    yield from diff_keys(old_root, new_root, new_root.name(),
+                         HiveDigests(old_registry, include_timestamps),
+                         HiveDigests(new_registry, include_timestamps))
+
+
+def diff_hive_data(hive_name, old_data, new_data, sink, include_timestamps=True):
+    """Diff two hives given as paths or bytes, writing changes tagged with hive_name to sink.
+
+    Returns the number of changes of each kind.
+    """
+    counts = dict.fromkeys(KEY_CHANGES + VALUE_CHANGES, 0)
+    with regf.Registry(old_data) as old, regf.Registry(new_data) as new:
+        for change in diff_hives(old, new, include_timestamps):
+            counts[change["change"]] += 1
+            sink.write(dict(change, hive=hive_name))
+    return counts
+
+
+def diff_images(old_directory, new_directory, sink, include_timestamps=True):
+    """Diff the hives two EWF images have in common, and report hives present in only one of them.
+
+    Hives are matched by name (SYSTEM, SOFTWARE, NTUSER_<user>); hives
+    with equal SHA-256 hashes are skipped without being parsed.
+    """
+    from registry import RegistryExtractor
+
+    old_extractor, new_extractor = RegistryExtractor(old_directory), RegistryExtractor(new_directory)
+    old_handle = new_handle = None
+    totals = dict.fromkeys(KEY_CHANGES + VALUE_CHANGES, 0)
+    try:
+        old_handle, old_fs = old_extractor.open_image()
+        new_handle, new_fs = new_extractor.open_image()
+        if old_fs is None or new_fs is None:
+            return totals
+        old_hives, new_hives = dict(old_extractor.list_hives(old_fs)), dict(new_extractor.list_hives(new_fs))
+
+        for hive_name in sorted(old_hives.keys() | new_hives.keys()):
+            if hive_name not in new_hives:
+                print(f"Hive {hive_name} only in {old_directory}")
+                sink.write({"change": "hive_removed", "hive": hive_name, "path": old_hives[hive_name]})
+                continue
+            if hive_name not in old_hives:
+                print(f"Hive {hive_name} only in {new_directory}")
+                sink.write({"change": "hive_added", "hive": hive_name, "path": new_hives[hive_name]})
+                continue
+            try:
+                old_data, old_sha256 = old_extractor.read_hive(old_fs, old_hives[hive_name], hive_name, None)
+                new_data, new_sha256 = new_extractor.read_hive(new_fs, new_hives[hive_name], hive_name, None)
+                if old_sha256 == new_sha256:
+                    print(f"Hive {hive_name} is unchanged")
+                    continue
+                print(f"Diffing hive {hive_name}...")
+                counts = diff_hive_data(hive_name, old_data, new_data, sink, include_timestamps)
+            except Exception as e:
+                print(f"Error diffing hive {hive_name}: {str(e)}")
+                continue
+            for change, count in counts.items():
+                totals[change] += count
+    finally:
+        for handle in (old_handle, new_handle):
+            if handle:
+                handle.close()
+    return totals
+
+
+def main():
+    """Compare two hives, or the hives of two EWF images."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Report added, removed and modified registry keys and values')
+    parser.add_argument('old', help='Baseline hive file (or image directory with --image)')
+    parser.add_argument('new', help='Hive file (or image directory with --image) to compare against it')
+    parser.add_argument('--image', action='store_true',
+                      help='Compare the SYSTEM, SOFTWARE and NTUSER.DAT hives of two directories of .Exx split files')
+    parser.add_argument('--name', default=None,
+                      help='Hive name recorded with each change when comparing hive files (default: new file name)')
+    parser.add_argument('--ignore-timestamps', action='store_true',
+                      help='Do not report keys whose last write time is the only change')
+    parser.add_argument('--output', '-o', default='registry_diff.jsonl',
+                      help='JSON Lines file the changes are written to (default: registry_diff.jsonl)')
+    args = parser.parse_args()
+
+    include_timestamps = not args.ignore_timestamps
+    with RecordWriter(args.output) as sink:
+        if args.image:
+            counts = diff_images(args.old, args.new, sink, include_timestamps)
+        else:
+            hive_name = args.name or os.path.basename(args.new)
+            counts = diff_hive_data(hive_name, args.old, args.new, sink, include_timestamps)
+
+    for change, count in counts.items():
+        print(f"{change}: {count}")
+    print(f"Wrote {sink.count} changes to {sink.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+import mmap
+import struct
+from datetime import datetime, timedelta
+
+
+# Value types, numbered as in python-registry
+RegNone = 0x0000
+RegSZ = 0x0001
+RegExpandSZ = 0x0002
+RegBin = 0x0003
+RegDWord = 0x0004
+RegBigEndian = 0x0005
+RegLink = 0x0006
+RegMultiSZ = 0x0007
+RegResourceList = 0x0008
+RegFullResourceDescriptor = 0x0009
+RegResourceRequirementsList = 0x000A
+RegQWord = 0x000B
+RegFileTime = 0x0010
+
+VALUE_TYPE_NAMES = {
+    RegNone: "RegNone", RegSZ: "RegSZ", RegExpandSZ: "RegExpandSZ", RegBin: "RegBin",
+    RegDWord: "RegDWord", RegBigEndian: "RegBigEndian", RegLink: "RegLink", RegMultiSZ: "RegMultiSZ",
+    RegResourceList: "RegResourceList", RegFullResourceDescriptor: "RegFullResourceDescriptor",
+    RegResourceRequirementsList: "RegResourceRequirementsList", RegQWord: "RegQWord",
+    RegFileTime: "RegFileTime",
+}
+
+REGF_SIGNATURE = b"regf"
+HBIN_START = 4096
+NO_OFFSET = 0xFFFFFFFF
+BIG_DATA_SEGMENT = 16344
+KEY_HIVE_ENTRY = 0x0004
+KEY_COMP_NAME = 0x0020
+VALUE_COMP_NAME = 0x0001
+FILETIME_EPOCH = datetime(1601, 1, 1)
+
+# Cell layouts, from the start of the cell data (after the 4-byte size)
+BASE_BLOCK = struct.Struct("<4sIIQIIIII")         # signature .. root cell offset
+NK_RECORD = struct.Struct("<2sHQ15IHH")           # "nk" .. key name length, class name length
+VK_RECORD = struct.Struct("<2sHIIIH")             # "vk", name length, data size/offset/type, flags
+LIST_HEADER = struct.Struct("<2sH")               # lf/lh/li/ri signature and element count
+DB_RECORD = struct.Struct("<2sHI")                # "db", segment count, segment list offset
+UINT32 = struct.Struct("<I")
+
+
+class RegistryException(Exception):
+    """Base class for errors reading a hive."""
+
+
+class RegfFormatError(RegistryException):
+    """The buffer is not a regf hive, or a cell is not what its referrer expects."""
+
+
+class RegistryKeyNotFoundException(RegistryException):
+    pass
+
+
+class RegistryValueNotFoundException(RegistryException):
+    pass
+
+
+def filetime_to_datetime(filetime):
+    """Convert a FILETIME (100 ns ticks since 1601) to a naive UTC datetime."""
+    microseconds, rest = divmod(filetime, 10)
+    if rest > 5 or (rest == 5 and microseconds % 2):
+        microseconds += 1
+    return FILETIME_EPOCH + timedelta(microseconds=microseconds)
+
+
+def decode_utf16le(data):
+    """Decode a UTF-16LE string up to its first NUL, tolerating odd lengths."""
+    return bytes(data[:len(data) & ~1]).decode("utf-16-le", errors="replace").partition("\x00")[0]
+
+
+class Registry:
+    """A regf hive, parsed lazily.
+
+    source is a path (memory-mapped), a bytes-like object or mmap, or a
+    file-like object, which is read into memory. Nothing is decoded up
+    front: keys and values are unpacked from their cells with struct when
+    they are visited, following the offsets in the nk, vk and subkey list
+    records. The key/value API follows python-registry.
+    """
+
+    def __init__(self, source):
+        self._file = None
+        self._mmap = None
+        if isinstance(source, str):
+            self._file = open(source, "rb")
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            source = self._mmap
+        elif hasattr(source, "read"):
+            source = source.read()
+        self._buf = memoryview(source)
+
+        if len(source) < HBIN_START:
+            self.close()
+            raise RegfFormatError("Hive is shorter than its base block")
+        (signature, _, _, _, self.major_version, self.minor_version,
+         _, _, self._root_offset) = BASE_BLOCK.unpack_from(source, 0)
+        if signature != REGF_SIGNATURE:
+            self.close()
+            raise RegfFormatError("Not a regf hive")
+
+    def _cell(self, offset, expected=None):
+        """Position of a cell's data in the buffer, checking its signature if given."""
+        position = HBIN_START + offset + 4
+        if expected:
+            if self._buf[position:position + 2] not in expected:
+                raise RegfFormatError(f"Expected {expected} cell at 0x{offset:x}")
+        elif offset == NO_OFFSET or position + 2 > len(self._buf):
+            raise RegfFormatError(f"Cell offset 0x{offset:x} is outside the hive")
+        return position
+
+    def _iter_subkey_offsets(self, offset):
+        """Yield the nk offsets of a subkey list, descending through ri index roots."""
+        position = self._cell(offset, (b"lf", b"lh", b"li", b"ri"))
+        signature, count = LIST_HEADER.unpack_from(self._buf, position)
+        position += LIST_HEADER.size
+        if signature in (b"lf", b"lh"):
+            # (offset, name hint or hash) pairs
+            yield from struct.unpack_from(f"<{2 * count}I", self._buf, position)[::2]
+        elif signature == b"li":
+            yield from struct.unpack_from(f"<{count}I", self._buf, position)
+        else:
+            for sublist in struct.unpack_from(f"<{count}I", self._buf, position):
+                yield from self._iter_subkey_offsets(sublist)
+
+    def _value_offsets(self, offset, count):
+        if not count or offset == NO_OFFSET:
+            return ()
+        return struct.unpack_from(f"<{count}I", self._buf, self._cell(offset))
+
+    def _data(self, offset, size):
+        """Bytes of a value's data cell, joining big data (db) segments."""
+        position = self._cell(offset)
+        if size > BIG_DATA_SEGMENT and self._buf[position:position + 2] == b"db":
+            _, count, segments = DB_RECORD.unpack_from(self._buf, position)
+            parts = []
+            remaining = size
+            for segment in struct.unpack_from(f"<{count}I", self._buf, self._cell(segments)):
+                start = self._cell(segment)
+                part = self._buf[start:start + min(remaining, BIG_DATA_SEGMENT)]
+                parts.append(part)
+                remaining -= len(part)
+            return b"".join(parts)
+        return self._buf[position:position + size].tobytes()
+
+    def root(self):
+        """Return the root key of the hive."""
+        return RegistryKey(self, self._root_offset)
+
+    def open(self, path):
+        """Return a key by its backslash separated path below the root (without the hive name)."""
+        return self.root().find_key(path.strip("\\"))
+
+    def close(self):
+        self._buf.release()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class RegistryKey:
+    """A key (nk record). Subkeys and values are only read when asked for."""
+
+    __slots__ = ("_hive", "_offset", "_flags", "_timestamp", "_parent", "_subkey_count", "_subkey_list",
+                 "_value_count", "_value_list", "_name")
+
+    def __init__(self, hive, offset):
+        position = hive._cell(offset, (b"nk",))
+        (_, flags, timestamp, _, parent, subkey_count, _, subkey_list, _, value_count, value_list,
+         *_, name_length, _) = NK_RECORD.unpack_from(hive._buf, position)
+        self._hive = hive
+        self._offset = offset
+        self._flags = flags
+        self._timestamp = timestamp
+        self._parent = parent
+        self._subkey_count = subkey_count
+        self._subkey_list = subkey_list
+        self._value_count = value_count
+        self._value_list = value_list
+        start = position + NK_RECORD.size
+        # Compressed names keep the low byte of each UTF-16 code unit, i.e. Latin-1
+        raw = hive._buf[start:start + name_length]
+        if flags & KEY_COMP_NAME:
+            self._name = str(raw, "latin-1")
+        else:
+            self._name = str(raw, "utf-16-le", "replace")
+
+    def name(self):
+        return self._name
+
+    def offset(self):
+        return self._offset
+
+    def timestamp(self):
+        """Last write time as a naive UTC datetime."""
+        return filetime_to_datetime(self._timestamp)
+
+    def is_root(self):
+        return bool(self._flags & KEY_HIVE_ENTRY)
+
+    def parent(self):
+        if self.is_root():
+            raise RegistryKeyNotFoundException(f"{self._name} has no parent key")
+        return RegistryKey(self._hive, self._parent)
+
+    def path(self):
+        """Full path including the root key's name, e.g. "ROOT\\Software\\Microsoft"."""
+        names = [self._name]
+        key, seen = self, {self._offset}
+        while not key.is_root():
+            key = key.parent()
+            if key._offset in seen:
+                names.append("[path cycle]")
+                break
+            seen.add(key._offset)
+            names.append(key._name)
+        return "\\".join(reversed(names))
+
+    def subkeys_number(self):
+        return self._subkey_count
+
+    def values_number(self):
+        return self._value_count
+
+    def iter_subkeys(self):
+        """Yield the subkeys one at a time."""
+        if not self._subkey_count or self._subkey_list == NO_OFFSET:
+            return
+        for offset in self._hive._iter_subkey_offsets(self._subkey_list):
+            yield RegistryKey(self._hive, offset)
+
+    def subkeys(self):
+        return list(self.iter_subkeys())
+
+    def subkey(self, name):
+        """Return the subkey with the given name (case-insensitive)."""
+        wanted = name.lower()
+        for subkey in self.iter_subkeys():
+            if subkey._name.lower() == wanted:
+                return subkey
+        raise RegistryKeyNotFoundException(f"{self.path()}\\{name}")
+
+    def find_key(self, path):
+        key = self
+        for name in path.split("\\") if path else ():
+            key = key.subkey(name)
+        return key
+
+    def iter_values(self):
+        for offset in self._hive._value_offsets(self._value_list, self._value_count):
+            yield RegistryValue(self._hive, offset)
+
+    def values(self):
+        return list(self.iter_values())
+
+    def value(self, name):
+        """Return the value with the given name (case-insensitive); "(default)" is the unnamed value."""
+        wanted = "" if name == "(default)" else name.lower()
+        for value in self.iter_values():
+            if value._name.lower() == wanted:
+                return value
+        raise RegistryValueNotFoundException(f"{self.path()} : {name}")
+
+
+class RegistryValue:
+    """A value (vk record). Its data is only read by raw_data/value."""
+
+    __slots__ = ("_hive", "_size", "_data_offset", "_type", "_name")
+
+    def __init__(self, hive, offset):
+        position = HBIN_START + offset + 4
+        signature, name_length, size, data_offset, data_type, flags = VK_RECORD.unpack_from(hive._buf, position)
+        if signature != b"vk":
+            raise RegfFormatError(f"Expected vk cell at 0x{offset:x}")
+        self._hive = hive
+        self._size = size
+        self._data_offset = data_offset
+        self._type = data_type
+        start = position + VK_RECORD.size + 2
+        raw = hive._buf[start:start + name_length]
+        if flags & VALUE_COMP_NAME:
+            self._name = str(raw, "latin-1")
+        else:
+            self._name = str(raw, "utf-16-le", "replace")
+
+    def name(self):
+        """Value name; "(default)" for the unnamed value."""
+        return self._name or "(default)"
+
+    def value_type(self):
+        return self._type
+
+    def value_type_str(self):
+        return VALUE_TYPE_NAMES.get(self._type, f"RegUnknown_{self._type:x}")
+
+    def raw_data(self):
+        size = self._size
+        if size & 0x80000000:
+            # Data of up to 4 bytes is stored in the offset field itself
+            return UINT32.pack(self._data_offset)[:size & 0x7FFFFFFF]
+        if not size:
+            return b""
+        return self._hive._data(self._data_offset, size)
+
+    def value(self):
+        """Decoded data: str for strings, list for multi-strings, int for numbers, else bytes."""
+        data = self.raw_data()
+        data_type = self._type
+        if data_type in (RegSZ, RegExpandSZ):
+            return decode_utf16le(data)
+        if data_type == RegMultiSZ:
+            return bytes(data[:len(data) & ~1]).decode("utf-16-le", errors="replace").split("\x00")
+        if data_type in (RegDWord, RegBigEndian, RegQWord, RegFileTime):
+            width = 8 if data_type in (RegQWord, RegFileTime) else 4
+            number = int.from_bytes(data[:width].ljust(width, b"\x00"),
+                                    "big" if data_type == RegBigEndian else "little")
+            return filetime_to_datetime(number) if data_type == RegFileTime else number
+        return data
@@ -1,12 +1,65 @@
 import pyewf
 import pytsk3
-import os
+import hashlib
 import json
-import csv
+import os
+import numpy as np
 import pandas as pd
-from datetime import datetime
-from Registry import Registry
-from collections import Counter
+import re
+from datetime import datetime, timedelta, timezone
+import regf
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from checkpoint import CheckpointJournal
+from compression import COMPRESSION_CHOICES, DEFAULT_COMPRESSION, normalize_compression, open_output, output_path
+from imagefile import open_image_file
+from hivecache import HiveCache, config_fingerprint
+from keytrie import KeyPathTrie
+from regrules import EXECUTABLE_PATTERN, OPERATION_RULES, classify_entries, load_rules
+from recordstore import RecordWriter, read_records
+from vocabulary import DEFAULT_VOCABULARY_PATH, FeatureVocabulary
+from tablestore import TABLE_FORMAT_CHOICES, DEFAULT_TABLE_FORMAT, normalize_table_format, write_table
+
+# EWF header dates: "acquiry_date" is formatted per libewf's date format setting
+EWF_DATE_FORMATS = ['%a %b %d %H:%M:%S %Y', '%b %d %Y %H:%M:%S', '%Y %m %d %H %M %S', '%m/%d/%Y %H:%M:%S']
+EWF_DATE_ZONE = re.compile(r'\s*(?:(?P<utc>UTC|GMT|Z)|(?P<sign>[+-])(?P<hours>\d{2}):?(?P<minutes>\d{2}))$',
+                           re.IGNORECASE)
+
+
+def parse_ewf_date(value):
+    """Parse an EWF header date into a datetime, or return None.
+
+    The result is aware when the date names its zone (a trailing UTC, GMT,
+    Z or +hh:mm offset). Otherwise it is naive and, as EnCase and libewf
+    write it, in the local time of the acquiring machine.
+    """
+    if not value:
+        return None
+    value = ' '.join(value.split())
+    zone = None
+    match = EWF_DATE_ZONE.search(value)
+    if match:
+        value = value[:match.start()]
+        if match.group('utc'):
+            zone = timezone.utc
+        else:
+            offset = timedelta(hours=int(match.group('hours')), minutes=int(match.group('minutes')))
+            zone = timezone(-offset if match.group('sign') == '-' else offset)
+
+    for date_format in EWF_DATE_FORMATS:
+        try:
+            parsed = datetime.strptime(value, date_format)
+            break
+        except ValueError:
+            continue
+    else:
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            print(f"Unrecognized EWF date: {value}")
+            return None
+    return parsed.replace(tzinfo=zone) if zone else parsed
+
 
 class EWFImgInfo(pytsk3.Img_Info):
     def __init__(self, ewf_handle):
@@ -51,9 +104,103 @@ class EWFImgInfo(pytsk3.Img_Info):
             print(f"Error getting media size: {str(e)}")
             raise
 
+class RegistryFeatureTable:
+    """Collects one summary row per registry key as typed columns.
+
+    A sink like RecordWriter: entries are reduced to their summary fields
+    as they arrive, and to_frame() turns the columns into a DataFrame with
+    a datetime last_written, boolean flags and categorical hive and
+    operation_type, ready for write_table and clean_data.
+    """
+
+    COLUMNS = [
+        'hive', 'path', 'last_written', 'value_count',
+        'subkey_count', 'has_binary', 'has_executable',
+        'key_depth', 'value_types', 'operation_type', 'frequency'
+    ]
+
+    def __init__(self):
+        self.columns = {name: [] for name in self.COLUMNS}
+        self.count = 0
+
+    def write(self, entry):
+        if 'error' in entry:
+            return
+        values = entry['values'].values()
+        types = sorted({v['type'] for v in values})
+        row = (
+            entry.get('hive', 'UNKNOWN'),
+            entry['path'],
+            entry['last_written'],
+            len(entry['values']),
+            len(entry['subkeys']),
+            'RegBin' in types,
+            any(EXECUTABLE_PATTERN.search(str(v['value'])) for v in values),
+            entry['key_depth'],
+            ','.join(types),
+            entry['operation_type'],
+            entry['frequency']
+        )
+        for column, value in zip(self.columns.values(), row):
+            column.append(value)
+        self.count += 1
+
+    def write_many(self, entries):
+        for entry in entries:
+            self.write(entry)
+
+    def to_frame(self):
+        columns = self.columns
+        return pd.DataFrame({
+            'hive': pd.Categorical(columns['hive']),
+            'path': pd.Series(columns['path'], dtype=object),
+            'last_written': pd.to_datetime(pd.Series(columns['last_written'], dtype=object), format='ISO8601'),
+            'value_count': np.array(columns['value_count'], dtype=np.int32),
+            'subkey_count': np.array(columns['subkey_count'], dtype=np.int32),
+            'has_binary': np.array(columns['has_binary'], dtype=bool),
+            'has_executable': np.array(columns['has_executable'], dtype=bool),
+            'key_depth': np.array(columns['key_depth'], dtype=np.int16),
+            'value_types': pd.Series(columns['value_types'], dtype=object),
+            'operation_type': pd.Categorical(columns['operation_type']),
+            'frequency': np.array(columns['frequency'], dtype=np.int64),
+        })
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
 class RegistryExtractor:
-    def __init__(self, image_directory):
+    def __init__(self, image_directory, output_dir='registry-entries', compression=None, resume=False,
+                 export_hives=False, workers=None, max_in_flight=8, entry_limit=None, cache_path=None,
+                 table_format=None, vocabulary_path=None, reference_time=None, rules_path=None):
         self.image_directory = image_directory
+        self.output_dir = output_dir
+        self.compression = normalize_compression(compression)
+        self.table_format = table_format or DEFAULT_TABLE_FORMAT
+        self.vocabulary_path = vocabulary_path
+        # Keys are classified relative to this time (naive UTC); taken from the image unless given
+        if reference_time is not None and reference_time.tzinfo:
+            reference_time = reference_time.astimezone(timezone.utc).replace(tzinfo=None)
+        self.reference_time = reference_time
+        self.operation_rules = load_rules(rules_path) if rules_path else OPERATION_RULES
+        self.classify_batch_size = 4096
+        self.disk_image_info = {}
+        self.resume = resume
+        self.export_hives = export_hives
+        self.workers = workers
+        self.max_in_flight = max_in_flight
+        self.cache_path = cache_path
+        self.cache = None
+        self.journal = None
+        # key_paths match per path component, case-insensitively; a component may use
+        # fnmatch wildcards, and '**' stands for any number of components
         self.target_paths = {
             'SYSTEM': {
                 'base_paths': [
@@ -93,11 +240,12 @@ class RegistryExtractor:
                 ]
             }
         }
-        self.output_data = []
-        self.entry_limit = 350
+        self.entry_limit = entry_limit
         self.current_entries = 0
+        self.hive_name = None
+        self.sink = None
+        self.max_depth = 2
         self.key_frequency = Counter()
-        self.operation_history = {}
 
     def get_split_files(self):
         """Get and verify split image files with better error handling."""
@@ -141,6 +289,85 @@ class RegistryExtractor:
             print(f"Error enumerating split files: {str(e)}")
             return []
 
+    def collect_image_metadata(self, split_files, ewf_handle=None):
+        """Collect metadata about the disk image, including its acquisition time.
+
+        The acquisition time comes from the EWF header; when the header has
+        none, the last modification of the segment files stands in for it.
+        Times are naive UTC, like key timestamps, except an acquisition time
+        without a zone, which is kept in the acquiring machine's local time.
+        """
+        try:
+            self.disk_image_info['files'] = split_files
+            self.disk_image_info['segment_count'] = len(split_files)
+            
+            total_size = 0
+            earliest_creation = None
+            latest_modification = None
+            
+            for file_path in split_files:
+                try:
+                    stat_info = os.stat(file_path)
+                    total_size += stat_info.st_size
+                    
+                    creation_time = datetime.fromtimestamp(stat_info.st_ctime, timezone.utc).replace(tzinfo=None)
+                    modification_time = datetime.fromtimestamp(stat_info.st_mtime, timezone.utc).replace(tzinfo=None)
+                    
+                    if earliest_creation is None or creation_time < earliest_creation:
+                        earliest_creation = creation_time
+                    if latest_modification is None or modification_time > latest_modification:
+                        latest_modification = modification_time
+                        
+                except Exception as e:
+                    print(f"Error collecting metadata for {file_path}: {str(e)}")
+
+            header_values = {}
+            if ewf_handle is not None:
+                try:
+                    header_values = ewf_handle.get_header_values()
+                except Exception as e:
+                    print(f"Error reading EWF header values: {str(e)}")
+            acquisition_time = parse_ewf_date(header_values.get('acquiry_date'))
+            if acquisition_time is not None and acquisition_time.tzinfo:
+                acquisition_time = acquisition_time.astimezone(timezone.utc).replace(tzinfo=None)
+                self.disk_image_info['acquisition_time_zone'] = 'UTC'
+            elif acquisition_time is not None:
+                self.disk_image_info['acquisition_time_zone'] = 'local'
+                if self.reference_time is None:
+                    print("Warning: the EWF acquisition time has no time zone and is in the acquiring machine's "
+                          "local time, so key ages may be off by its UTC offset. Pass --reference-time with the "
+                          "acquisition time in UTC to classify keys against the exact time.")
+
+            self.disk_image_info['total_size'] = total_size
+            self.disk_image_info['creation_time'] = earliest_creation.isoformat() if earliest_creation else None
+            self.disk_image_info['modification_time'] = latest_modification.isoformat() if latest_modification else None
+            self.disk_image_info['acquisition_time'] = acquisition_time.isoformat() if acquisition_time else None
+            self.disk_image_info['header'] = header_values
+            
+            print("Disk Image Information:")
+            print(f"Total Size: {total_size / (1024*1024*1024):.2f} GB")
+            print(f"Segments: {len(split_files)}")
+            print(f"Acquired: {acquisition_time}")
+            print(f"Last Modified: {latest_modification}")
+            
+            if self.reference_time is None:
+                self.reference_time = acquisition_time or latest_modification
+            
+        except Exception as e:
+            print(f"Error collecting image metadata: {str(e)}")
+
+    def save_image_metadata(self, output_dir):
+        """Save disk image metadata to a JSON file."""
+        try:
+            metadata_file = os.path.join(output_dir, 'disk_image_metadata.json')
+            info = dict(self.disk_image_info,
+                        reference_time=self.reference_time.isoformat() if self.reference_time else None)
+            with open(metadata_file, 'w', encoding='utf-8') as f:
+                json.dump(info, f, indent=2, ensure_ascii=False, default=str)
+            print(f"Saved disk image metadata to {metadata_file}")
+        except Exception as e:
+            print(f"Error saving image metadata: {str(e)}")
+
     def verify_registry_paths(self, fs):
         """Verify registry paths exist and are accessible."""
         working_paths = {}
@@ -158,25 +385,6 @@ class RegistryExtractor:
                     continue
         return working_paths
 
-    def detect_operation_type(self, key):
-        """Detect the type of operation based on key metadata"""
-        try:
-            last_write_time = key.timestamp()
-            current_time = datetime.now()
-            time_diff = (current_time - last_write_time).total_seconds()
-            
-            # Basic heuristics for operation detection
-            if time_diff < 3600:  # Within last hour
-                return 'RECENT_MODIFICATION'
-            elif any(v.value_type() == Registry.RegBin for v in key.values()):
-                return 'BINARY_OPERATION'
-            elif any('.exe' in str(v.value()).lower() for v in key.values()):
-                return 'EXECUTABLE_OPERATION'
-            else:
-                return 'READ_OPERATION'
-        except:
-            return 'UNKNOWN_OPERATION'
-
     def safe_decode(self, byte_string):
         """Safely decode byte strings with multiple encodings."""
         if not isinstance(byte_string, bytes):
@@ -190,26 +398,18 @@ class RegistryExtractor:
                 continue
         return byte_string.hex()
 
-    def extract_registry_key(self, registry, key_path):
-        """Extract data from a registry key with error handling."""
-        if self.current_entries >= self.entry_limit:
+    def limit_reached(self):
+        return self.entry_limit is not None and self.current_entries >= self.entry_limit
+
+    def extract_key(self, key, key_path):
+        """Extract data from an already opened registry key with error handling."""
+        if self.limit_reached():
             return None
 
         try:
-            if key_path.startswith('ROOT\\'):
-                key_path = key_path[5:]
-            
-            try:
-                key = registry.open(key_path)
-            except Registry.RegistryKeyNotFoundException:
-                key = registry.open(key_path.replace('/', '\\'))
-
             # Update frequency counter
             self.key_frequency[key_path] += 1
             
-            # Detect operation
-            operation_type = self.detect_operation_type(key)
-            
             key_data = {
                 'path': key_path,
                 'last_written': key.timestamp().isoformat(),
@@ -217,7 +417,6 @@ class RegistryExtractor:
                 'subkeys': [],
                 'key_name': self.safe_decode(key.name()),
                 'key_depth': len(key_path.split('\\')),
-                'operation_type': operation_type,
                 'frequency': self.key_frequency[key_path]
             }
             
@@ -226,10 +425,10 @@ class RegistryExtractor:
                     value_name = self.safe_decode(value.name()) if value.name() else "(Default)"
                     value_data = value.value()
                     
-                    if value.value_type() == Registry.RegSZ or \
-                       value.value_type() == Registry.RegExpandSZ:
+                    if value.value_type() == regf.RegSZ or \
+                       value.value_type() == regf.RegExpandSZ:
                         value_data = self.safe_decode(value_data)
-                    elif value.value_type() == Registry.RegBin:
+                    elif value.value_type() == regf.RegBin:
                         value_data = value_data.hex()
                     else:
                         value_data = str(value_data)
@@ -256,240 +455,268 @@ class RegistryExtractor:
             print(f"Error extracting registry key {key_path}: {str(e)}")
             return None
 
-    def extract_hive(self, fs, hive_path, hive_name, output_dir):
-        """Extract and process a registry hive."""
-        try:
-            print(f"Processing hive: {hive_path}")
-            f = fs.open(hive_path)
-            outfile = os.path.join(output_dir, f"{hive_name}.hive")
-            
-            with open(outfile, 'wb') as out:
-                chunk_size = 1024 * 1024
-                total_size = f.info.meta.size
-                offset = 0
-                while offset < total_size:
-                    size = min(chunk_size, total_size - offset)
-                    data = f.read_random(offset, size)
-                    out.write(data)
-                    offset += size
-            
-            registry = Registry.Registry(outfile)
-            root = registry.root()
-            
-            hive_type = 'NTUSER' if hive_name.startswith('NTUSER') else hive_name
-            print(f"Processing hive type: {hive_type}")
-
-            if hive_type in self.target_paths:
-                for key_path in self.target_paths[hive_type]['key_paths']:
+    def read_hive(self, fs, hive_path, hive_name, output_dir):
+        """Read a hive straight from the image, without staging it on disk.
+
+        The hive is read once through a buffered reader over the TSK file
+        object and hashed on the way; only with export_hives is a copy
+        written to output_dir. Returns (data, sha256).
+        """
+        f = fs.open(hive_path)
+        with open_image_file(f, digest=hashlib.sha256()) as reader:
+            data = reader.read()
+            sha256 = reader.raw.hexdigest()
+
+        if self.export_hives:
+            outfile = output_path(os.path.join(output_dir, f"{hive_name}.hive"), self.compression)
+            with open_output(outfile, self.compression) as out:
+                out.write(data)
+            print(f"Exported hive copy to {outfile}")
+        return data, sha256
+
+    def extract_hive(self, registry, hive_name, sink):
+        """Extract the target keys of a parsed hive, writing every entry to sink as it is produced."""
+        self.hive_name = hive_name
+        self.sink = sink
+        hive_type = 'NTUSER' if hive_name.startswith('NTUSER') else hive_name
+        print(f"Processing hive type: {hive_type}")
+
+        if hive_type in self.target_paths:
+            # One pass over the hive, descending only where a target path can still match
+            trie = KeyPathTrie(self.target_paths[hive_type]['key_paths'])
+            self.recursive_key_extraction(registry.root(), trie, trie.start())
+
+    def process_hives(self, fs, hives, output_dir, sinks):
+        """Extract (hive_name, hive_path) pairs across a process pool into sinks.
+
+        Hives are read from the image here and parsed by extract_hive_entries
+        in the workers, at most max_in_flight at a time; each worker streams
+        its entries to a part file. The parts are then streamed into the
+        sinks in the order of hives, so the output does not depend on which
+        worker finishes first and no hive is ever held in memory as entries.
+        Hives finished by a resumed run are merged from their existing part,
+        and hives whose hash and extraction config are in the HiveCache are
+        merged from the cache without being parsed.
+        """
+        config = config_fingerprint(target_paths=self.target_paths, max_depth=self.max_depth,
+                                    entry_limit=self.entry_limit)
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            for hive_name, hive_path in hives:
+                part_path = os.path.join(output_dir, 'checkpoint', f'{hive_name}.jsonl')
+                if self.journal and self.journal.is_done(f"hive:{hive_name}"):
+                    print(f"Skipping finished hive {hive_name}")
+                    pending.append((hive_name, None, output_path(part_path, self.compression), None))
+                else:
                     try:
-                        key = registry.open(key_path)
-                        self.recursive_key_extraction(registry, key, key_path)
+                        print(f"Processing hive: {hive_path}")
+                        data, sha256 = self.read_hive(fs, hive_path, hive_name, output_dir)
                     except Exception as e:
-                        print(f"Error processing key path {key_path}: {str(e)}")
+                        print(f"Error processing hive {hive_path}: {str(e)}")
                         continue
-            
-            for entry in self.output_data:
-                if 'hive' not in entry:
-                    entry['hive'] = hive_name
-                    
-        except Exception as e:
-            print(f"Error processing hive {hive_path}: {str(e)}")
-
-    def recursive_key_extraction(self, registry, key, prefix='', max_depth=2):
-        """Recursively extract registry keys with depth limit."""
-        if self.current_entries >= self.entry_limit:
+                    if self.cache and self.cache.has(sha256, config):
+                        print(f"Hive {hive_name} unchanged (sha256 {sha256}): using cached entries")
+                        pending.append((hive_name, None, None, (sha256, config)))
+                    else:
+                        future = executor.submit(extract_hive_entries, hive_name, data, self.target_paths,
+                                                 self.entry_limit, part_path, self.compression)
+                        pending.append((hive_name, future, None, (sha256, config)))
+                if len(pending) >= self.max_in_flight:
+                    self._merge_one(pending, sinks)
+            while pending:
+                self._merge_one(pending, sinks)
+
+    def _merge_one(self, pending, sinks):
+        hive_name, future, part_path, cache_key = pending.popleft()
+        if future is not None:
+            try:
+                part_path = future.result()
+            except Exception as e:
+                print(f"Error processing hive {hive_name}: {str(e)}")
+                return
+            if self.journal:
+                # The part lets a resumed run skip parsing this hive again
+                self.journal.mark_artifact(f"hive:{hive_name}", outputs=[part_path])
+            if self.cache:
+                self.cache.store(*cache_key, read_records(part_path))
+
+        if part_path is None:
+            entries = (dict(entry, hive=hive_name) for entry in self.cache.entries(*cache_key))
+        else:
+            entries = read_records(part_path)
+
+        # Frequencies, the entry limit and the operation rules span all hives, so they are applied
+        # here, in hive order; the rules run once per batch of entries
+        merged = 0
+        batch = []
+        for entry in entries:
+            if self.limit_reached():
+                break
+            self.key_frequency[entry['path']] += 1
+            entry['frequency'] = self.key_frequency[entry['path']]
+            batch.append(entry)
+            self.current_entries += 1
+            merged += 1
+            if len(batch) >= self.classify_batch_size:
+                self._write_classified(batch, sinks)
+                batch = []
+        self._write_classified(batch, sinks)
+        print(f"Merged {merged} entries from hive {hive_name}")
+
+    def _write_classified(self, batch, sinks):
+        if not batch:
             return
+        classify_entries(batch, self.operation_rules, self.reference_time)
+        for sink in sinks:
+            sink.write_many(batch)
+
+    def recursive_key_extraction(self, key, trie, states, path='', depth_left=-1):
+        """Extract the keys below key that match the target trie, plus max_depth levels under each match.
+
+        states is the trie state of key; a subkey is only descended into
+        while the trie can still match below it or it lies within
+        max_depth levels of a matched key. depth_left is the number of
+        levels still to extract under key (-1 outside matched subtrees).
+        """
+        for subkey in key.iter_subkeys():
+            if self.limit_reached():
+                return
+            subkey_path = path
+            try:
+                name = self.safe_decode(subkey.name())
+                subkey_path = f"{path}\\{name}" if path else name
+                subkey_states = trie.step(states, name)
+                subkey_left = max(depth_left - 1, self.max_depth if trie.accepts(subkey_states) else -1)
+                if subkey_left < 0 and not subkey_states:
+                    continue
 
+                if subkey_left >= 0:
+                    # Work on the handle we already hold instead of re-opening the key by path
+                    key_data = self.extract_key(subkey, subkey_path)
+                    if key_data:
+                        self.sink.write(dict(key_data, hive=self.hive_name))
+                if subkey_left > 0 or subkey_states:
+                    self.recursive_key_extraction(subkey, trie, subkey_states, subkey_path, subkey_left)
+            except Exception as e:
+                print(f"Error in recursive extraction for {subkey_path}: {str(e)}")
+
+    def clean_data(self, df, output_file):
+        """Turn the registry feature table into a numeric matrix for ML; returns the path written.
+
+        Every column is converted in one vectorized step. The hive type
+        (NTUSER for every user's hive) and operation_type become codes, and
+        value_types one has_<type> column per exact type, all taken from
+        the persisted vocabulary, so the same category has the same code
+        (and column) in every case.
+        """
         try:
-            current_key_data = self.extract_registry_key(registry, prefix if prefix else '\\')
-            if current_key_data:
-                self.output_data.append(current_key_data)
+            vocabulary = FeatureVocabulary(self.vocabulary_path)
+            hive = df['hive'].astype(str)
+            hive = hive.mask(hive.str.startswith('NTUSER'), 'NTUSER')
+            cleaned_df = pd.DataFrame({
+                'hive': vocabulary.encode('hive', hive),
+                # Unix timestamps for ML
+                'last_written': df['last_written'].astype('datetime64[s]').astype('int64'),
+                'value_count': df['value_count'],
+                'subkey_count': df['subkey_count'],
+                'has_binary': df['has_binary'].astype(np.int8),
+                'has_executable': df['has_executable'].astype(np.int8),
+                'key_depth': df['key_depth'],
+                'operation_type': vocabulary.encode('operation_type', df['operation_type']),
+                'frequency': df['frequency'],
+            }, index=df.index)
+
+            value_types = vocabulary.one_hot('value_type', df['value_types'])
+            value_types.columns = [f'has_{vtype.lower()}' for vtype in value_types.columns]
+            # key_depth already counts the path's components
+            path_depth = df['key_depth'].rename('path_depth')
+            cleaned_df = pd.concat([cleaned_df, value_types, path_depth], axis=1)
+
+            path = write_table(cleaned_df, output_file, self.table_format, self.compression)
+            vocabulary.save()
+            return path
 
-            if max_depth > 0:
-                for subkey in key.subkeys():
-                    try:
-                        subkey_name = self.safe_decode(subkey.name())
-                        new_prefix = f"{prefix}/{subkey_name}" if prefix else subkey_name
-                        
-                        if any(target in new_prefix for target in 
-                              self.target_paths[current_key_data.get('hive', '')].get('key_paths', [])):
-                            self.recursive_key_extraction(registry, subkey, new_prefix, max_depth - 1)
-                    except Exception as e:
-                        print(f"Error in recursive extraction for {new_prefix}: {str(e)}")
-                        continue
-        except Exception as e:
-            print(f"Error in recursive extraction: {str(e)}")
-
-    def clean_data(self, input_file, output_file):
-        """Clean and preprocess the registry data for ML."""
-        try:
-            # Read the raw CSV
-            df = pd.read_csv(input_file)
-            
-            # Data cleaning steps
-            cleaned_df = df.copy()
-            
-            # 1. Handle missing values
-            cleaned_df = cleaned_df.fillna({
-                'hive': 'UNKNOWN',
-                'value_count': 0,
-                'subkey_count': 0,
-                'has_binary': False,
-                'has_executable': False,
-                'key_depth': 0,
-                'frequency': 1
-            })
-            
-            # 2. Convert boolean columns to integers
-            cleaned_df['has_binary'] = cleaned_df['has_binary'].astype(int)
-            cleaned_df['has_executable'] = cleaned_df['has_executable'].astype(int)
-            
-            # 3. Convert timestamps to Unix timestamps for ML
-            cleaned_df['last_written'] = pd.to_datetime(cleaned_df['last_written']).astype(int) // 10**9
-            
-            # 4. Encode categorical variables
-            cleaned_df['hive'] = pd.Categorical(cleaned_df['hive']).codes
-            cleaned_df['operation_type'] = pd.Categorical(cleaned_df['operation_type']).codes
-            
-            # 5. Create value_type features
-            value_types = set()
-            for types in cleaned_df['value_types'].str.split(','):
-                if isinstance(types, list):
-                    value_types.update(types)
-            
-            for vtype in value_types:
-                if vtype and pd.notna(vtype):
-                    cleaned_df[f'has_{vtype.lower()}'] = cleaned_df['value_types'].str.contains(vtype).astype(int)
-            
-            # 6. Drop original value_types column
-            cleaned_df = cleaned_df.drop('value_types', axis=1)
-            
-            # 7. Handle path column - create feature for path depth
-            cleaned_df['path_depth'] = cleaned_df['path'].str.count('\\') + 1
-            
-            # 8. Remove or encode the path column
-            cleaned_df = cleaned_df.drop('path', axis=1)
-            
-            # 9. Remove any remaining non-numeric columns
-            numeric_df = cleaned_df.select_dtypes(include=['int64', 'float64'])
-            
-            # Save cleaned data
-            numeric_df.to_csv(output_file, index=False)
-            
         except Exception as e:
             print(f"Error in data cleaning: {str(e)}")
+            return None
 
-    def extract_to_csv(self, output_dir):
-        """Extract registry data to CSV files."""
-        os.makedirs(output_dir, exist_ok=True)
-        raw_output = os.path.join(output_dir, 'registry_raw.csv')
-        cleaned_output = os.path.join(output_dir, 'registry_cleaned.csv')
-        
+    def open_image(self):
+        """Open the split image's file system; returns (ewf_handle, fs), or (None, None) without split files."""
+        # Get and verify split files
+        split_files = self.get_split_files()
+
+        if not split_files:
+            print("Error: No valid split files found to process")
+            return None, None
+
+        print("Opening EWF handle...")
+        ewf_handle = pyewf.handle()
+        ewf_handle.open(split_files)
+
+        print("Collecting disk image metadata...")
+        self.collect_image_metadata(split_files, ewf_handle)
+
+        print("Creating image info...")
+        img_info = EWFImgInfo(ewf_handle)
+
+        print("Opening filesystem...")
+        return ewf_handle, pytsk3.FS_Info(img_info)
+
+    def list_hives(self, fs):
+        """Return (hive_name, hive_path) for SYSTEM, SOFTWARE and every user's NTUSER.DAT found on fs."""
+        print("Verifying registry paths...")
+        hives = list(self.verify_registry_paths(fs).items())
+        if not hives:
+            return hives
         try:
-            # Write raw CSV
-            with open(raw_output, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow([
-                    'hive', 'path', 'last_written', 'value_count', 
-                    'subkey_count', 'has_binary', 'has_executable', 
-                    'key_depth', 'value_types', 'operation_type', 'frequency'
-                ])
-                
-                for entry in self.output_data:
-                    if 'error' not in entry:
-                        has_binary = any(
-                            v['type'] == 'REG_BINARY' 
-                            for v in entry['values'].values()
-                        )
-                        has_executable = any(
-                            '.exe' in str(v['value']).lower() 
-                            for v in entry['values'].values()
-                        )
-                        value_types = ','.join(set(
-                            v['type'] for v in entry['values'].values()
-                        ))
-                        
-                        writer.writerow([
-                            entry.get('hive', 'UNKNOWN'),
-                            entry['path'],
-                            entry['last_written'],
-                            len(entry['values']),
-                            len(entry['subkeys']),
-                            has_binary,
-                            has_executable,
-                            entry['key_depth'],
-                            value_types,
-                            entry['operation_type'],
-                            entry['frequency']
-                        ])
-            
-            # Clean and process the data
-            self.clean_data(raw_output, cleaned_output)
-            print(f"Successfully created raw CSV at {raw_output}")
-            print(f"Successfully created cleaned CSV at {cleaned_output}")
-            
+            print("Processing user profiles...")
+            users_dir = fs.open_dir('Users')
+            for user_entry in users_dir:
+                if user_entry.info.name.name not in [b".", b".."]:
+                    user_name = self.safe_decode(user_entry.info.name.name)
+                    hives.append((f"NTUSER_{user_name}", f"Users/{user_name}/NTUSER.DAT"))
         except Exception as e:
-            print(f"Error in CSV extraction: {str(e)}")
+            print(f"Error processing users directory: {str(e)}")
+        return hives
 
     def process_image(self):
         """Process the disk image and extract registry information."""
         ewf_handle = None
         try:
-            # Get and verify split files
-            split_files = self.get_split_files()
-            
-            if not split_files:
-                print("Error: No valid split files found to process")
+            ewf_handle, fs = self.open_image()
+            if fs is None:
                 return
 
-            print("Opening EWF handle...")
-            ewf_handle = pyewf.handle()
-            ewf_handle.open(split_files)
-            
-            print("Creating image info...")
-            img_info = EWFImgInfo(ewf_handle)
-            
-            print("Opening filesystem...")
-            fs = pytsk3.FS_Info(img_info)
-
             print("Creating output directory...")
-            output_dir = "registry-entries"
+            output_dir = self.output_dir
             os.makedirs(output_dir, exist_ok=True)
-
-            print("Verifying registry paths...")
-            working_paths = self.verify_registry_paths(fs)
-            
-            if working_paths:
-                print("Processing registry hives...")
-                for hive_name, hive_path in working_paths.items():
-                    print(f"Extracting hive: {hive_name}")
-                    self.extract_hive(fs, hive_path, hive_name, output_dir)
-
-                try:
-                    print("Processing user profiles...")
-                    users_dir = fs.open_dir('Users')
-                    for user_entry in users_dir:
-                        if user_entry.info.name.name not in [b".", b".."]:
-                            try:
-                                user_name = self.safe_decode(user_entry.info.name.name)
-                                ntuser_path = f"Users/{user_name}/NTUSER.DAT"
-                                print(f"Processing NTUSER.DAT for user: {user_name}")
-                                self.extract_hive(fs, ntuser_path, f"NTUSER_{user_name}", output_dir)
-                            except Exception as e:
-                                print(f"Error processing user {user_name}: {str(e)}")
-                                continue
-                except Exception as e:
-                    print(f"Error processing users directory: {str(e)}")
-
-                if self.output_data:
-                    print("Creating output files...")
-                    self.extract_to_csv(output_dir)
-                    
-                    # Save full JSON data
-                    json_path = os.path.join(output_dir, 'registry_full.json')
-                    with open(json_path, 'w', encoding='utf-8') as f:
-                        json.dump(self.output_data, f, indent=2, ensure_ascii=False)
-                    print(f"Created full JSON output at {json_path}")
+            self.save_image_metadata(output_dir)
+            if self.reference_time is None:
+                print("Warning: no acquisition time for the image, keys are not classified by age")
+            else:
+                print(f"Classifying keys relative to {self.reference_time.isoformat()}")
+            self.journal = CheckpointJournal(os.path.join(output_dir, 'checkpoint', 'journal.jsonl'),
+                                             resume=self.resume)
+            if self.cache_path:
+                self.cache = HiveCache(self.cache_path)
+
+            hives = self.list_hives(fs)
+            if hives:
+                print(f"Processing {len(hives)} registry hives...")
+                full_path = os.path.join(output_dir, 'registry_full.jsonl')
+                with RecordWriter(full_path, self.compression) as full, RegistryFeatureTable() as table:
+                    self.process_hives(fs, hives, output_dir, sinks=(full, table))
+                print(f"Created full JSON Lines output at {full.path} ({full.count} entries)")
+
+                if table.count:
+                    self.table_format = normalize_table_format(self.table_format)
+                    features = table.to_frame()
+                    raw_path = write_table(features, os.path.join(output_dir, 'registry_raw'),
+                                           self.table_format, self.compression)
+                    print(f"Successfully created raw feature table at {raw_path}")
+                    cleaned_path = self.clean_data(features, os.path.join(output_dir, 'registry_cleaned'))
+                    if cleaned_path:
+                        print(f"Successfully created cleaned feature table at {cleaned_path}")
 
                 print("Processing complete!")
             else:
@@ -498,10 +725,26 @@ class RegistryExtractor:
         except Exception as e:
             print(f"Critical error during image processing: {str(e)}")
         finally:
+            if self.journal:
+                self.journal.close()
+            if self.cache:
+                self.cache.close()
             if ewf_handle:
                 print("Closing EWF handle...")
                 ewf_handle.close()
 
+def extract_hive_entries(hive_name, data, target_paths, entry_limit, part_path, compression=None):
+    """Parse one hive's bytes in a worker process, streaming its entries to a part file.
+
+    Returns the path of the part file.
+    """
+    extractor = RegistryExtractor(None, compression=compression, entry_limit=entry_limit)
+    extractor.target_paths = target_paths
+    with RecordWriter(part_path, compression) as part:
+        extractor.extract_hive(regf.Registry(data), hive_name, part)
+    return part.path
+
+
 def main():
     """Main function to run the registry extractor."""
     import argparse
@@ -510,6 +753,32 @@ def main():
     parser.add_argument('image_directory', help='Directory containing the .Exx split files')
     parser.add_argument('--output', '-o', default='registry-entries',
                       help='Output directory for extracted data (default: registry-entries)')
+    parser.add_argument('--compress', choices=COMPRESSION_CHOICES, default=DEFAULT_COMPRESSION,
+                      help=f'Compression for hive copies, CSV and JSON output (default: {DEFAULT_COMPRESSION})')
+    parser.add_argument('--table-format', choices=TABLE_FORMAT_CHOICES, default=DEFAULT_TABLE_FORMAT,
+                      help=f'Format of the raw and cleaned feature tables; parquet and arrow need pyarrow '
+                           f'(default: {DEFAULT_TABLE_FORMAT})')
+    parser.add_argument('--vocabulary', default=DEFAULT_VOCABULARY_PATH,
+                      help='JSON file of category codes shared across cases, extended with new categories '
+                           f'(default: {DEFAULT_VOCABULARY_PATH})')
+    parser.add_argument('--reference-time', type=datetime.fromisoformat, default=None,
+                      help='UTC time keys are classified against, e.g. 2024-05-01T12:00:00 '
+                           '(default: the image acquisition time)')
+    parser.add_argument('--rules', default=None,
+                      help='JSON list of extra operation rules, checked before the built-in ones')
+    parser.add_argument('--export-hives', action='store_true',
+                      help='Also write a copy of every hive to the output directory')
+    parser.add_argument('--limit', type=int, default=None,
+                      help='Stop after this many registry keys (default: no limit)')
+    parser.add_argument('--cache', default=None,
+                      help='SQLite cache of extracted hives, reused when a hive hash matches '
+                           '(default: hive_cache.sqlite in the output directory)')
+    parser.add_argument('--no-cache', action='store_true',
+                      help='Do not read or write the hive cache')
+    parser.add_argument('--workers', type=int, default=None,
+                      help='Worker processes parsing hives in parallel (default: one per CPU)')
+    parser.add_argument('--resume', action='store_true',
+                      help='Reuse hives finished by an interrupted run instead of parsing them again')
     
     args = parser.parse_args()
     
@@ -520,6 +789,21 @@ def main():
     print(f"Processing image files from: {args.image_directory}")
     print(f"Output will be saved to: {args.output}")
     
-    extractor = RegistryExtractor(args.image_directory)
+    cache_path = None if args.no_cache else (args.cache or os.path.join(args.output, 'hive_cache.sqlite'))
+    try:
+        table_format = normalize_table_format(args.table_format)
+        extractor = RegistryExtractor(args.image_directory, output_dir=args.output, compression=args.compress,
+                                      resume=args.resume, export_hives=args.export_hives,
+                                      workers=args.workers, entry_limit=args.limit, cache_path=cache_path,
+                                      table_format=table_format,
+                                      vocabulary_path=args.vocabulary,
+                                      reference_time=args.reference_time, rules_path=args.rules)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
     extractor.process_image()
-    print("Extraction process completed. Check the output directory for results.")
\ No newline at end of file
+    print("Extraction process completed. Check the output directory for results.")
+
+
+if __name__ == "__main__":
+    main()
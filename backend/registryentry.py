@@ -1,7 +1,15 @@
 import pyewf
 import pytsk3
+import argparse
 import os
+import threading
 from datetime import datetime
+from blobstore import BlobStore
+from checkpoint import CheckpointJournal
+from compression import DEFAULT_COMPRESSION
+from imagefile import iter_file_chunks
+from manifest import ExtractionManifest, run_manifest_path
+from writerpool import WriterPool
 
 
 class EWFImgInfo(pytsk3.Img_Info):
@@ -9,11 +17,13 @@ class EWFImgInfo(pytsk3.Img_Info):
 
     def __init__(self, ewf_handle):
         self._ewf_handle = ewf_handle
+        self._lock = threading.Lock()  # seek+read must not interleave across writer threads
         super().__init__()
 
     def read(self, offset, size):
-        self._ewf_handle.seek(offset)
-        return self._ewf_handle.read(size)
+        with self._lock:
+            self._ewf_handle.seek(offset)
+            return self._ewf_handle.read(size)
 
     def get_size(self):
         return self._ewf_handle.get_media_size()
@@ -26,46 +36,70 @@ def format_timestamp(timestamp):
     return datetime.utcfromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
 
 
-def extract_registry_entries(file_entry, parent_path="/", output_dir="extracted_registry"):
-    """Extract registry files and save them locally."""
+def extract_registry_entries(file_entry, parent_path="/", output_dir="extracted_registry", pool=None, store=None,
+                             manifest=None, journal=None):
+    """Extract registry files into a BlobStore, queueing writes on the pool if given.
+
+    With a CheckpointJournal, work finished by a previous run is skipped.
+    """
     if not file_entry.info.meta or not file_entry.info.meta.size:
         return
 
+    if store is None:
+        store = BlobStore(output_dir)
+
     # Construct the file path
     file_path = os.path.join(parent_path, file_entry.info.name.name.decode())
 
     # If directory, process contents recursively
     if file_entry.info.meta.type == pytsk3.TSK_FS_META_TYPE_DIR:
+        if journal:
+            if journal.dir_done(file_path):
+                print(f"Skipping finished directory: {file_path}")
+                return
+            journal.enter(file_path, parent_path)
         for sub_entry in file_entry.as_directory():
             if sub_entry.info.name.name not in [b".", b".."]:
-                extract_registry_entries(sub_entry, file_path, output_dir)
+                extract_registry_entries(sub_entry, file_path, output_dir, pool, store, manifest, journal)
+        if journal:
+            journal.release(file_path)
     else:
         registry_file_name = file_entry.info.name.name.decode().lower()
         if registry_file_name in ["ntuser.dat", "system", "software", "sam", "security"]:
             print(f"Found registry file: {file_path}")
-            save_registry_file(file_entry, file_path, output_dir)
-
-
-def save_registry_file(file_entry, file_path, output_dir):
-    """Save registry file locally."""
-    os.makedirs(output_dir, exist_ok=True)
-    output_file = os.path.join(output_dir, os.path.basename(file_path.replace("/", "_")))
-
+            job = save_registry_file
+            if journal:
+                if journal.is_done(f"copy:{file_path}"):
+                    print(f"Skipping finished registry file: {file_path}")
+                    return
+                job = journal.track(f"copy:{file_path}", parent_path, save_registry_file)
+            if pool:
+                pool.submit(job, file_entry, file_path, store, manifest)
+            else:
+                job(file_entry, file_path, store, manifest)
+
+
+def save_registry_file(file_entry, file_path, store, manifest=None):
+    """Save registry file into the blob store and add it to the run manifest."""
     try:
-        with open(output_file, "wb") as out_file:
-            offset = 0
-            size = 1024 * 1024  # 1MB chunks
-            while offset < file_entry.info.meta.size:
-                data = file_entry.read_random(offset, size)
-                if not data:
-                    break
-                out_file.write(data)
-                offset += len(data)
-
-        print(f"Saved registry file: {output_file}")
+        digest, blob_path, size, is_new = store.put(iter_file_chunks(file_entry))
+        if manifest:
+            manifest.record(file_entry, file_path, sha256=digest, output=blob_path, kind="registry_hive")
+
+        if is_new:
+            print(f"Saved registry file: {file_path} -> {blob_path}")
+        else:
+            print(f"Duplicate registry file: {file_path} already stored as {blob_path}")
+        return blob_path
     except Exception as e:
         print(f"Error saving registry file {file_path}: {e}")
+        return False
+
 
+parser = argparse.ArgumentParser(description="Extract registry hives from a SMART disk image")
+parser.add_argument("--resume", action="store_true",
+                    help="Continue an interrupted run, skipping work recorded in extracted_registry/checkpoint.jsonl")
+args = parser.parse_args()
 
 # Define the folder containing the split files
 split_files_directory = "/home/pranaash31/techotrace/dfir/diskfile/manjula/"
@@ -96,9 +130,17 @@ try:
     # Extract registry entries from the root directory
     print(f"Extracting registry entries from SMART image...")
     root_dir = fs.open_dir("/")
-    for entry in root_dir:
-        if entry.info.name.name not in [b".", b".."]:
-            extract_registry_entries(entry)
+    store = BlobStore("extracted_registry", compression=DEFAULT_COMPRESSION)
+    if args.resume:
+        store.remove_partial()
+    with CheckpointJournal(os.path.join("extracted_registry", "checkpoint.jsonl"), resume=args.resume) as journal, \
+            ExtractionManifest(run_manifest_path("extracted_registry")) as manifest:
+        journal.attach(manifest)
+        with WriterPool(workers=4, max_pending=64) as pool:
+            for entry in root_dir:
+                if entry.info.name.name not in [b".", b".."]:
+                    extract_registry_entries(entry, pool=pool, store=store, manifest=manifest, journal=journal)
+    print(f"Extraction manifest: {manifest.path} ({manifest.count} registry files)")
 
     print(f"Registry extraction complete. Files saved in 'extracted_registry' directory.")
 except Exception as e:
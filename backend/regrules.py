@@ -0,0 +1,153 @@
+import json
+import re
+import numpy as np
+import pandas as pd
+
+
+# Executable and script file names in value data, matched in one pass
+EXECUTABLE_EXTENSIONS = ("exe", "dll", "sys", "scr", "cpl", "ocx", "msi",
+                         "bat", "cmd", "ps1", "psm1", "vbs", "vbe", "js", "jse", "wsf", "hta", "lnk")
+EXECUTABLE_PATTERN = re.compile(r"\.(?:" + "|".join(EXECUTABLE_EXTENSIONS) + r")\b", re.IGNORECASE)
+
+# Checked in order, the first matching rule names the key. A rule matches
+# when all of its conditions hold:
+#   max_age             key last written less than this many seconds before the reference time
+#   value_types         some value has one of these types (e.g. "RegBin")
+#   value_pattern       some value's data matches this regex
+#   value_name_pattern  some value's name matches this regex
+#   path_pattern        the key path matches this regex
+OPERATION_RULES = [
+    {"name": "RECENT_MODIFICATION", "max_age": 3600},
+    {"name": "BINARY_OPERATION", "value_types": ["RegBin"]},
+    {"name": "EXECUTABLE_OPERATION", "value_pattern": EXECUTABLE_PATTERN},
+]
+DEFAULT_OPERATION = "READ_OPERATION"
+PATTERN_FIELDS = ("value_pattern", "value_name_pattern", "path_pattern")
+CONDITION_FIELDS = ("max_age", "value_types") + PATTERN_FIELDS
+
+
+def validate_rule(rule):
+    """Raise ValueError unless rule is a dict with a name, known keys only and at least one condition.
+
+    A mistyped condition would otherwise be ignored and the rule would
+    name every key it sees.
+    """
+    if not isinstance(rule, dict):
+        raise ValueError(f"Rule is not an object: {rule!r}")
+    if not isinstance(rule.get("name"), str):
+        raise ValueError(f"Rule without a name: {rule}")
+    unknown = sorted(set(rule) - {"name"} - set(CONDITION_FIELDS))
+    if unknown:
+        raise ValueError(f"Unknown keys {unknown} in rule {rule['name']} "
+                         f"(allowed: name, {', '.join(CONDITION_FIELDS)})")
+    if not any(field in rule for field in CONDITION_FIELDS):
+        raise ValueError(f"Rule {rule['name']} has no condition (one of {', '.join(CONDITION_FIELDS)})")
+    if "max_age" in rule and (isinstance(rule["max_age"], bool) or not isinstance(rule["max_age"], (int, float))):
+        raise ValueError(f"max_age of rule {rule['name']} must be a number of seconds")
+    if "value_types" in rule and not (isinstance(rule["value_types"], list)
+                                      and all(isinstance(t, str) for t in rule["value_types"])):
+        raise ValueError(f"value_types of rule {rule['name']} must be a list of type names, e.g. [\"RegBin\"]")
+    for field in PATTERN_FIELDS:
+        if field in rule and not isinstance(rule[field], (str, re.Pattern)):
+            raise ValueError(f"{field} of rule {rule['name']} must be a regular expression string")
+
+
+def compile_rules(rules):
+    """Return validated rules with their regex fields compiled (case-insensitive)."""
+    compiled = []
+    for rule in rules:
+        validate_rule(rule)
+        rule = dict(rule)
+        for field in PATTERN_FIELDS:
+            if isinstance(rule.get(field), str):
+                try:
+                    rule[field] = re.compile(rule[field], re.IGNORECASE)
+                except re.error as e:
+                    raise ValueError(f"Invalid {field} in rule {rule['name']}: {e}")
+        compiled.append(rule)
+    return compiled
+
+
+def load_rules(path):
+    """Load user rules (a JSON list in the OPERATION_RULES format) and put them before the defaults."""
+    with open(path, encoding="utf-8") as f:
+        rules = json.load(f)
+    if not isinstance(rules, list):
+        raise ValueError(f"{path} must contain a JSON list of rules")
+    try:
+        return compile_rules(rules) + OPERATION_RULES
+    except ValueError as e:
+        raise ValueError(f"{path}: {e}")
+
+
+def _matches(pattern, texts):
+    """Boolean mask of texts matching pattern; each distinct text is only matched once."""
+    codes, uniques = pd.factorize(texts)
+    hits = np.fromiter((pattern.search(text) is not None for text in uniques), dtype=bool, count=len(uniques))
+    return hits[codes]
+
+
+def _any_per_key(mask, value_keys, key_count):
+    hit = np.zeros(key_count, dtype=bool)
+    hit[value_keys[mask]] = True
+    return hit
+
+
+def evaluate_operation_rules(paths, last_written, value_keys, value_names, value_types, value_data,
+                             rules=OPERATION_RULES, reference_time=None, default=DEFAULT_OPERATION):
+    """Name every key by the first rule it matches; returns an object array of operation names.
+
+    Keys are given as columns (paths, last_written as datetime64) and
+    their values as a flat table whose value_keys column holds the index
+    of the owning key. Every rule condition is one boolean mask over all
+    keys. Without a reference_time (e.g. the image acquisition time),
+    rules with max_age never match.
+    """
+    key_count = len(paths)
+    operations = np.full(key_count, default, dtype=object)
+    undecided = np.ones(key_count, dtype=bool)
+    if reference_time is not None:
+        age = (np.datetime64(reference_time, "us") - last_written.astype("datetime64[us]")) / np.timedelta64(1, "s")
+
+    for rule in rules:
+        mask = undecided.copy()
+        if "max_age" in rule:
+            if reference_time is None:
+                continue
+            mask &= age < rule["max_age"]
+        if "value_types" in rule:
+            mask &= _any_per_key(np.isin(value_types, list(rule["value_types"])), value_keys, key_count)
+        if "value_pattern" in rule:
+            mask &= _any_per_key(_matches(rule["value_pattern"], value_data), value_keys, key_count)
+        if "value_name_pattern" in rule:
+            mask &= _any_per_key(_matches(rule["value_name_pattern"], value_names), value_keys, key_count)
+        if "path_pattern" in rule:
+            mask &= _matches(rule["path_pattern"], paths)
+        operations[mask] = rule["name"]
+        undecided &= ~mask
+    return operations
+
+
+def classify_entries(entries, rules=OPERATION_RULES, reference_time=None):
+    """Set operation_type on a batch of extracted registry entries, evaluating the rules once for all of them."""
+    value_keys, value_names, value_types, value_data = [], [], [], []
+    for index, entry in enumerate(entries):
+        for name, value in entry["values"].items():
+            value_keys.append(index)
+            value_names.append(name)
+            value_types.append(value["type"])
+            value_data.append(str(value["value"]))
+
+    operations = evaluate_operation_rules(
+        np.array([entry["path"] for entry in entries], dtype=object),
+        pd.to_datetime(pd.Series([entry["last_written"] for entry in entries], dtype=object),
+                       format="ISO8601").to_numpy(),
+        np.array(value_keys, dtype=np.int64),
+        np.array(value_names, dtype=object),
+        np.array(value_types, dtype=object),
+        np.array(value_data, dtype=object),
+        rules, reference_time,
+    )
+    for entry, operation in zip(entries, operations):
+        entry["operation_type"] = operation
+    return entries
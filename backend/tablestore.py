@@ -0,0 +1,79 @@
+import os
+from compression import normalize_compression, open_input, open_output, output_path
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # only needed for Parquet and Arrow; CSV tables work without it
+    pyarrow = None
+
+
+TABLE_SUFFIXES = {"parquet": ".parquet", "arrow": ".arrow", "csv": ".csv"}
+DEFAULT_TABLE_FORMAT = "parquet"
+TABLE_FORMAT_CHOICES = ["parquet", "arrow", "csv"]
+
+
+def normalize_table_format(table_format):
+    """Map a user supplied table format to parquet/arrow/csv.
+
+    Raises ValueError for Parquet and Arrow when pyarrow is not installed;
+    CSV is only ever written when asked for.
+    """
+    table_format = table_format or DEFAULT_TABLE_FORMAT
+    if table_format not in TABLE_SUFFIXES:
+        raise ValueError(f"Unknown table format: {table_format}")
+    if table_format != "csv" and pyarrow is None:
+        raise ValueError(f"Writing {table_format} tables needs pyarrow (see dependencies.txt); "
+                         "install it or choose --table-format csv")
+    return table_format
+
+
+def table_path(path, table_format, compression=None):
+    """Return path (without extension) with the suffix of the table format.
+
+    Parquet and Arrow files compress their columns internally, so only
+    CSV gets the .gz/.zst suffix of the compression.
+    """
+    table_format = normalize_table_format(table_format)
+    path += TABLE_SUFFIXES[table_format]
+    return output_path(path, compression) if table_format == "csv" else path
+
+
+def write_table(df, path, table_format, compression=None):
+    """Write a DataFrame as Parquet, Arrow IPC or CSV; returns the path written.
+
+    Parquet and Arrow keep the column types (timestamps, booleans,
+    categories), so the table loads back without parsing text.
+    """
+    table_format = normalize_table_format(table_format)
+    compression = normalize_compression(compression)
+    path = table_path(path, table_format, compression)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if table_format == "csv":
+        with open_output(path, compression, encoding="utf-8", newline="") as f:
+            df.to_csv(f, index=False)
+        return path
+
+    table = pyarrow.Table.from_pandas(df, preserve_index=False)
+    if table_format == "parquet":
+        pyarrow.parquet.write_table(table, path, compression=compression or "none")
+    else:
+        # Arrow IPC buffers support lz4/zstd only
+        options = pyarrow.ipc.IpcWriteOptions(compression="zstd" if compression else None)
+        with pyarrow.ipc.new_file(path, table.schema, options=options) as writer:
+            writer.write_table(table)
+    return path
+
+
+def read_table(path):
+    """Load a table written by write_table into a DataFrame."""
+    import pandas as pd
+
+    if path.endswith(TABLE_SUFFIXES["parquet"]):
+        return pd.read_parquet(path)
+    if path.endswith(TABLE_SUFFIXES["arrow"]):
+        with pyarrow.ipc.open_file(path) as reader:
+            return reader.read_pandas()
+    with open_input(path, encoding="utf-8") as f:
+        return pd.read_csv(f)
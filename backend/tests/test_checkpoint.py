@@ -0,0 +1,75 @@
+import os
+import signal
+import subprocess
+import sys
+from collections import Counter
+
+import pytest
+
+from checkpoint import CheckpointJournal
+from compression import zstandard
+from recordstore import RecordWriter, filter_records, read_records
+
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FILES = 40
+RECORDS_PER_FILE = 25
+KILL_AFTER = 30
+
+# Parses FILES fake files the way logfile.py does (records to a RecordWriter,
+# then the journaled job returns), and kills itself without any cleanup
+# after KILL_AFTER of them, leaving records in the compressor's buffers.
+RUN = """
+import os, signal, sys
+from checkpoint import CheckpointJournal
+from recordstore import RecordWriter
+
+out, compression = sys.argv[1], sys.argv[2]
+journal = CheckpointJournal(os.path.join(out, "checkpoint.jsonl"), batch_size=4)
+events = RecordWriter(os.path.join(out, "records.jsonl"), compression)
+journal.attach(events)
+
+def parse(index):
+    events.write_many([{"source": f"file{index}", "n": n} for n in range(%(records)d)])
+
+for index in range(%(files)d):
+    if index == %(kill_after)d:
+        os.kill(os.getpid(), signal.SIGKILL)
+    journal.track(f"parse:file{index}", "/", parse)(index)
+""" % {"records": RECORDS_PER_FILE, "files": FILES, "kill_after": KILL_AFTER}
+
+
+def resume(out, compression):
+    """Resume the killed run as logfile.py does: drop unjournaled records, redo unfinished files."""
+    with CheckpointJournal(os.path.join(out, "checkpoint.jsonl"), resume=True) as journal:
+        filter_records(os.path.join(out, "records.jsonl"),
+                       lambda record: journal.is_done(f"parse:{record['source']}"), compression)
+        with RecordWriter(os.path.join(out, "records.jsonl"), compression, append=True) as events:
+            journal.attach(events)
+            redone = 0
+            for index in range(FILES):
+                name = f"parse:file{index}"
+                if journal.is_done(name):
+                    continue
+                journal.track(name, "/", lambda: events.write_many(
+                    [{"source": f"file{index}", "n": n} for n in range(RECORDS_PER_FILE)]))()
+                redone += 1
+    return events.path, redone
+
+
+@pytest.mark.parametrize("compression", [
+    "gzip",
+    pytest.param("zstd", marks=pytest.mark.skipif(zstandard is None, reason="zstandard is not installed")),
+])
+def test_resume_after_kill_keeps_every_record(tmp_path, compression):
+    out = str(tmp_path)
+    run = subprocess.run([sys.executable, "-c", RUN, out, compression], cwd=BACKEND,
+                         env=dict(os.environ, PYTHONPATH=os.pathsep.join([BACKEND] + sys.path)))
+    assert run.returncode == -signal.SIGKILL
+
+    path, redone = resume(out, compression)
+
+    # Some finished files were not journaled yet and had to be parsed again
+    assert 0 < redone < FILES
+    counts = Counter(record["source"] for record in read_records(path))
+    assert counts == {f"file{index}": RECORDS_PER_FILE for index in range(FILES)}
@@ -0,0 +1,136 @@
+import signal
+import struct
+
+import pytest
+
+from evtx import CHUNK_SIGNATURE, CHUNK_SIZE, RECORD_SIGNATURE, RECORDS_START, parse_chunk
+
+
+class BinXml:
+    """Writes Binary XML at known chunk offsets, names defined inline."""
+
+    def __init__(self, chunk, pos):
+        self.chunk = chunk
+        self.pos = pos
+
+    def put(self, data):
+        self.chunk[self.pos:self.pos + len(data)] = data
+        self.pos += len(data)
+
+    def name(self, text):
+        self.put(struct.pack("<I", self.pos + 4))
+        self.put(struct.pack("<IHH", 0, 0, len(text)) + text.encode("utf-16-le") + b"\x00\x00")
+
+    def fragment_header(self):
+        self.put(b"\x0f\x01\x01\x00")
+
+    def open(self, name, attrs=None):
+        self.put(bytes([0x41 if attrs else 0x01]) + struct.pack("<HI", 0xFFFF, 0))
+        self.name(name)
+        if attrs:
+            self.put(struct.pack("<I", 0))
+            for attr_name, value in attrs.items():
+                self.put(b"\x06")
+                self.name(attr_name)
+                self.text(value)
+        self.put(b"\x02")
+
+    def close(self):
+        self.put(b"\x04")
+
+    def text(self, value):
+        self.put(b"\x05\x01" + struct.pack("<H", len(value)) + value.encode("utf-16-le"))
+
+    def substitution(self, index, value_type):
+        self.put(b"\x0d" + struct.pack("<HB", index, value_type))
+
+    def end(self):
+        self.put(b"\x00")
+
+
+def chunk_with(*writers):
+    """A chunk whose records (ids 1, 2, ...) are written by the given functions of a BinXml."""
+    chunk = bytearray(CHUNK_SIZE)
+    chunk[:8] = CHUNK_SIGNATURE
+    pos = RECORDS_START
+    for record_id, write in enumerate(writers, 1):
+        xml = BinXml(chunk, pos + 24)
+        write(xml)
+        size = xml.pos + 4 - pos
+        chunk[pos:pos + 24] = RECORD_SIGNATURE + struct.pack("<IQQ", size, record_id, 0)
+        chunk[pos + size - 4:pos + size] = struct.pack("<I", size)
+        pos += size
+    struct.pack_into("<I", chunk, 48, pos)
+    return bytes(chunk)
+
+
+def simple_event(event_id):
+    def write(xml):
+        xml.fragment_header()
+        xml.open("Event")
+        xml.open("System")
+        xml.open("EventID")
+        xml.text(str(event_id))
+        xml.close()
+        xml.close()
+        xml.close()
+        xml.end()
+    return write
+
+
+@pytest.fixture
+def deadline():
+    """Fail the test instead of hanging when parsing does not finish."""
+    def expire(signum, frame):
+        raise TimeoutError("parse did not finish")
+    previous = signal.signal(signal.SIGALRM, expire)
+    signal.alarm(10)
+    yield
+    signal.alarm(0)
+    signal.signal(signal.SIGALRM, previous)
+
+
+@pytest.mark.parametrize("token", [0x00, 0x02, 0x03, 0x06, 0x0C, 0x0F])
+def test_unexpected_token_in_element_content(deadline, token):
+    def corrupted(xml):
+        xml.fragment_header()
+        xml.open("Event")
+        xml.put(bytes([token]) + b"\xff" * 16)
+
+    first, broken, last = parse_chunk(chunk_with(simple_event(4624), corrupted, simple_event(4625)))
+    assert first["event_id"] == 4624
+    assert broken["record_id"] == 2 and "error" in broken
+    assert last["event_id"] == 4625
+
+
+def test_embedded_binxml_substitution(deadline):
+    def write(xml):
+        xml.fragment_header()
+        # Template instance with a resident definition: Event/EventData holding substitution 0
+        start = xml.pos
+        xml.put(b"\x0c\x01" + struct.pack("<II", 0, start + 10))
+        definition = xml.pos
+        xml.put(b"\x00" * 24)
+        xml.fragment_header()
+        xml.open("Event")
+        xml.open("EventData")
+        xml.substitution(0, 0x21)
+        xml.close()
+        xml.close()
+        xml.end()
+        struct.pack_into("<I", xml.chunk, definition + 20, xml.pos - definition - 24)
+
+        # One BinXml value: <Data Name="TargetUserName">alice</Data>, names inline at chunk offsets
+        count = xml.pos
+        xml.put(struct.pack("<I", 1) + b"\x00" * 4)
+        value = xml.pos
+        xml.fragment_header()
+        xml.open("Data", {"Name": "TargetUserName"})
+        xml.text("alice")
+        xml.close()
+        xml.end()
+        struct.pack_into("<HBx", xml.chunk, count + 4, xml.pos - value, 0x21)
+
+    [record] = parse_chunk(chunk_with(write))
+    assert "error" not in record
+    assert record["data"] == {"TargetUserName": "alice"}
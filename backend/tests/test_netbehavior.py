@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from flows import FlowTable
+from netbehavior import BeaconDetector, ScanDetector
+from pcap import PACKET_DTYPE, ip_from_str
+
+SYN, ACK = 0x02, 0x10
+
+
+def packets(rows):
+    """PACKET_DTYPE array from (time, source, source port, destination, destination port, protocol, flags)."""
+    out = np.zeros(len(rows), dtype=PACKET_DTYPE)
+    for i, (time, src, src_port, dest, dest_port, protocol, flags) in enumerate(rows):
+        out[i]["timestamp"] = time
+        out[i]["ip_version"] = 4
+        out[i]["protocol"] = protocol
+        out[i]["src_ip_hi"], out[i]["src_ip_lo"] = ip_from_str(src)
+        out[i]["dest_ip_hi"], out[i]["dest_ip_lo"] = ip_from_str(dest)
+        out[i]["src_port"] = src_port
+        out[i]["dest_port"] = dest_port
+        out[i]["tcp_flags"] = flags
+    return out
+
+
+def https_session(time, client_port):
+    """Handshake and one request/response between a client and 10.0.0.1:443."""
+    client, server = "192.168.1.10", "10.0.0.1"
+    return [
+        (time, client, client_port, server, 443, 6, SYN),
+        (time + 0.01, server, 443, client, client_port, 6, SYN | ACK),
+        (time + 0.02, client, client_port, server, 443, 6, ACK),
+        (time + 0.03, server, 443, client, client_port, 6, ACK),
+    ]
+
+
+def busy_client():
+    return packets([row for port in range(200) for row in https_session(port * 0.1, 40000 + port)])
+
+
+def test_server_replies_are_not_a_scan():
+    detector = ScanDetector()
+    detector.add(busy_client())
+    assert detector.findings() == []
+
+
+def test_server_replies_are_not_a_scan_in_flows():
+    table = FlowTable()
+    table.add(busy_client())
+    detector = ScanDetector()
+    detector.add(table.flows())
+    assert detector.findings() == []
+
+
+def test_port_scan_is_found():
+    detector = ScanDetector()
+    detector.add(packets([(port * 0.1, "192.168.1.66", 50000, "10.0.0.1", port, 6, SYN) for port in range(1, 201)]))
+    [finding] = detector.findings()
+    assert finding["source"] == "192.168.1.66"
+    assert finding["distinct_ports"] == 200
+    assert finding["distinct_hosts"] == 1
+
+
+def test_beacon_across_chunks():
+    beacon = [(i * 30.0 + (i % 2) * 0.5, "192.168.1.10", 50000 + i, "203.0.113.5", 8443, 6, SYN) for i in range(12)]
+    other = [(i * 7.3, "192.168.1.10", 51000 + i, "198.51.100.7", 80, 6, SYN) for i in range(0, 40, 3)]
+    rows = packets(beacon + other)
+    rows = rows[np.argsort(rows["timestamp"], kind="stable")]
+
+    detector = BeaconDetector()
+    for chunk in np.array_split(rows, 5):
+        detector.add(chunk)
+    findings = detector.findings()
+
+    whole = BeaconDetector()
+    whole.add(rows)
+    assert findings == [pytest.approx(finding, abs=1e-6) for finding in whole.findings()]
+    beacon_findings = [f for f in findings if f["destination"] == "203.0.113.5"]
+    assert len(beacon_findings) == 1
+    assert beacon_findings[0]["events"] == 12
+    assert abs(beacon_findings[0]["interval"] - 30.0) < 0.1
+    assert beacon_findings[0]["first_seen"] == 0.0
+    assert beacon_findings[0]["last_seen"] == 330.5
+
+
+def test_beacon_series_overlapping_in_time():
+    # The same beacon seen in two captures: a long series, then two short
+    # ones, the first of them inside the long one
+    beacon = [(i * 30.0, "192.168.1.10", 50000 + i, "203.0.113.5", 8443, 6, SYN) for i in range(11)]
+    detector = BeaconDetector()
+    detector.add(packets(beacon))
+    detector.add(packets([(100.0, "192.168.1.10", 50100, "203.0.113.5", 8443, 6, SYN)]))
+    detector.add(packets([(330.0, "192.168.1.10", 50200, "203.0.113.5", 8443, 6, SYN)]))
+    [finding] = detector.findings()
+    assert finding["events"] == 12
+    assert finding["interval"] == pytest.approx(30.0)
+    assert finding["jitter"] == pytest.approx(0.0, abs=1e-9)
+    assert finding["last_seen"] == 330.0
@@ -0,0 +1,42 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from regrules import OPERATION_RULES, classify_entries, compile_rules, load_rules
+
+
+def write_rules(tmp_path, rules):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps(rules), encoding="utf-8")
+    return str(path)
+
+
+def test_user_rules_come_first(tmp_path):
+    rules = load_rules(write_rules(tmp_path, [{"name": "RUN_KEY", "path_pattern": r"\\Run$"}]))
+    assert [rule["name"] for rule in rules] == ["RUN_KEY"] + [rule["name"] for rule in OPERATION_RULES]
+    entries = [
+        {"path": r"Microsoft\Windows\CurrentVersion\Run", "last_written": "2020-01-01T00:00:00",
+         "values": {"x": {"type": "RegSZ", "value": r"C:\evil.exe"}}},
+        {"path": r"Microsoft\Windows\CurrentVersion\RunOnce", "last_written": "2020-01-01T00:00:00",
+         "values": {"x": {"type": "RegBin", "value": "00"}}},
+    ]
+    classify_entries(entries, rules, reference_time=datetime(2024, 1, 1))
+    assert [entry["operation_type"] for entry in entries] == ["RUN_KEY", "BINARY_OPERATION"]
+
+
+@pytest.mark.parametrize("rule, message", [
+    ({"name": "TYPO", "maxage": 60}, "Unknown keys"),
+    ({"name": "EMPTY"}, "no condition"),
+    ({"path_pattern": "Run"}, "without a name"),
+    ({"name": "BIN", "value_types": "RegBin"}, "must be a list"),
+    ({"name": "OLD", "max_age": "3600"}, "must be a number"),
+    ({"name": "BAD", "path_pattern": "("}, "Invalid path_pattern"),
+])
+def test_invalid_rules_are_rejected(tmp_path, rule, message):
+    with pytest.raises(ValueError, match=message):
+        load_rules(write_rules(tmp_path, [rule]))
+
+
+def test_built_in_rules_are_valid():
+    compile_rules(OPERATION_RULES)
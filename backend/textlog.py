@@ -0,0 +1,112 @@
+import codecs
+import re
+from datetime import datetime
+
+
+# Leading timestamps recognised in plain-text logs
+ISO_TIMESTAMP = re.compile(rb"^\[?(\d{4}-\d{2}-\d{2})[ T](\d{2}:\d{2}:\d{2})")
+SYSLOG_TIMESTAMP = re.compile(rb"^([A-Z][a-z]{2}) +(\d{1,2}) (\d{2}:\d{2}:\d{2})")
+MONTHS = {m.encode(): i for i, m in enumerate(
+    ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"], 1)}
+
+
+def parse_line_time(line):
+    """Return the ISO timestamp a log line starts with, if any."""
+    match = ISO_TIMESTAMP.match(line)
+    if match:
+        return f"{match.group(1).decode()}T{match.group(2).decode()}"
+    match = SYSLOG_TIMESTAMP.match(line)
+    if match and match.group(1) in MONTHS:
+        # Syslog lines carry no year; keep month/day/time only
+        return f"--{MONTHS[match.group(1)]:02d}-{int(match.group(2)):02d}T{match.group(3).decode()}"
+    return None
+
+
+def detect_encoding(head):
+    """Guess the encoding of a log from its first bytes, or None for binary data."""
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    if b"\x00" in head:
+        return None
+    return "utf-8"
+
+
+def iter_log_lines(reader, source_path):
+    """Yield one record per line of a text log read from a binary stream.
+
+    Lines are decoded as they are read, so the log is never copied or held
+    in memory. Offsets are byte offsets into the original file.
+    """
+    encoding = detect_encoding(reader.peek(4096)[:4096])
+    if encoding is None:
+        return
+
+    if encoding == "utf-16":
+        yield from _iter_utf16_lines(reader, source_path)
+        return
+
+    offset = 0
+    for line_number, raw in enumerate(reader, 1):
+        text = raw.rstrip(b"\r\n")
+        if line_number == 1 and encoding == "utf-8-sig":
+            text = text[len(codecs.BOM_UTF8):]
+        if text:
+            yield {
+                "source": source_path,
+                "line": line_number,
+                "offset": offset,
+                "time": parse_line_time(text),
+                "text": text.decode("utf-8", errors="replace"),
+            }
+        offset += len(raw)
+
+
+def _iter_utf16_lines(reader, source_path):
+    """UTF-16 logs cannot be split on raw newline bytes; decode incrementally."""
+    bom = reader.read(2)
+    codec = "utf-16-le" if bom == codecs.BOM_UTF16_LE else "utf-16-be"
+    decoder = codecs.getincrementaldecoder(codec)(errors="replace")
+    offset = 2
+    line_number = 0
+    pending = ""
+    while True:
+        block = reader.read(1024 * 1024)
+        final = not block
+        pending += decoder.decode(block, final=final)
+        lines = pending.split("\n")
+        pending = "" if final else lines.pop()
+        for line in lines:
+            line_number += 1
+            text = line.rstrip("\r")
+            if text:
+                yield {
+                    "source": source_path,
+                    "line": line_number,
+                    "offset": offset,
+                    "time": parse_line_time(text.encode("utf-8", errors="replace")),
+                    "text": text,
+                }
+            offset += len(line.encode("utf-16-le")) + 2
+        if final:
+            break
+
+
+def summarize_log(records, source_path, size):
+    """Consume line records, returning a per-file summary record."""
+    summary = {
+        "source": source_path,
+        "size": size,
+        "lines": 0,
+        "first_time": None,
+        "last_time": None,
+        "parsed_at": datetime.utcnow().isoformat(),
+    }
+    for record in records:
+        summary["lines"] += 1
+        if record["time"]:
+            if summary["first_time"] is None:
+                summary["first_time"] = record["time"]
+            summary["last_time"] = record["time"]
+    return summary
@@ -0,0 +1,67 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+
+
+# One vocabulary for all cases, so every case (and model) uses the same codes
+DEFAULT_VOCABULARY_PATH = os.path.join(os.path.expanduser("~"), ".novatrace", "feature_vocabulary.json")
+
+
+class FeatureVocabulary:
+    """Persisted category lists, so categorical codes mean the same thing in every case.
+
+    Each feature (e.g. hive, operation_type, value_type) maps to an
+    ordered list of the categories seen so far. New categories are only
+    ever appended, so a category keeps its code across runs and models
+    trained on earlier cases stay valid. The lists are stored as JSON at
+    path; save() writes them atomically.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.categories = {}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.categories = json.load(f)
+
+    def extend(self, feature, values):
+        """Append the values not yet in feature's vocabulary; returns the full category list."""
+        categories = self.categories.setdefault(feature, [])
+        known = set(categories)
+        for value in values:
+            if value not in known and not pd.isna(value):
+                categories.append(value)
+                known.add(value)
+        return categories
+
+    def encode(self, feature, series):
+        """Integer codes of a series in feature's vocabulary (-1 for missing), extending it as needed."""
+        categories = self.extend(feature, sorted(pd.unique(series.dropna()), key=str))
+        return pd.Categorical(series, categories=categories).codes.astype(np.int32)
+
+    def one_hot(self, feature, series, sep=","):
+        """One-hot DataFrame of the exact tokens in sep-joined strings, one column per vocabulary entry.
+
+        Tokens are matched whole (no substring matching). The token matrix
+        is built once per distinct string and indexed by row, so the cost
+        grows with the number of distinct combinations rather than rows.
+        """
+        codes, combinations = pd.factorize(series, use_na_sentinel=True)
+        token_lists = [[token for token in combination.split(sep) if token] for combination in combinations]
+        categories = self.extend(feature, sorted({token for tokens in token_lists for token in tokens}))
+        position = {category: i for i, category in enumerate(categories)}
+
+        # One extra all-zero row for missing values (code -1)
+        matrix = np.zeros((len(combinations) + 1, len(categories)), dtype=np.int8)
+        for row, tokens in enumerate(token_lists):
+            matrix[row, [position[token] for token in tokens]] = 1
+        return pd.DataFrame(matrix[codes], columns=categories, index=series.index)
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path + ".partial", "w", encoding="utf-8") as f:
+            json.dump(self.categories, f, ensure_ascii=False, indent=1)
+        os.replace(self.path + ".partial", self.path)
@@ -0,0 +1,102 @@
+import numpy as np
+from datetime import datetime, timezone
+from pcap import PACKET_DTYPE, ip_from_str
+from textlog import iter_log_lines
+
+
+# Protocol names used in Windows Firewall logs
+W3C_PROTOCOLS = {"TCP": 6, "UDP": 17, "ICMP": 1, "ICMPV6": 58}
+TCP_FLAG_LETTERS = {"F": 0x01, "S": 0x02, "R": 0x04, "P": 0x08, "A": 0x10, "U": 0x20}
+
+
+def iter_w3c_records(lines):
+    """Turn the line records of a W3C extended log into dicts keyed by its #Fields.
+
+    Covers Windows Firewall (pfirewall.log), IIS and HTTPERR logs. A "-"
+    value becomes None, and "time" is replaced by the ISO date and time of
+    the entry. A log may restart its header (and change its fields) midway.
+    """
+    fields = None
+    for line in lines:
+        text = line["text"]
+        if text.startswith("#"):
+            if text.startswith("#Fields:"):
+                fields = text[len("#Fields:"):].split()
+            continue
+        if fields is None:
+            continue
+        record = {name: (None if value == "-" else value) for name, value in zip(fields, text.split())}
+        date, time = record.get("date"), record.get("time")
+        record["time"] = f"{date}T{time}" if date and time else None
+        record["source"] = line["source"]
+        record["line"] = line["line"]
+        yield record
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _timestamp(value):
+    try:
+        return datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def w3c_records_to_packets(records):
+    """Convert firewall/IIS records into PACKET_DTYPE rows for the flow and anomaly analysis.
+
+    Each entry is one connection, so it becomes one row: firewall entries
+    use src-ip/dst-ip and their ports, IIS entries the client (c-ip) and
+    server (s-ip, s-port). TCP rows without logged flags get SYN set so
+    they count as connection starts. Entries without two valid addresses
+    are left out.
+    """
+    rows = []
+    for record in records:
+        source = record.get("src-ip") or record.get("c-ip")
+        destination = record.get("dst-ip") or record.get("s-ip")
+        try:
+            src_hi, src_lo = ip_from_str(source or "")
+            dest_hi, dest_lo = ip_from_str(destination or "")
+        except ValueError:
+            continue
+        protocol = W3C_PROTOCOLS.get((record.get("protocol") or "TCP").upper(), 0)
+        flags = 0
+        for letter in record.get("tcpflags") or "":
+            flags |= TCP_FLAG_LETTERS.get(letter.upper(), 0)
+        if protocol == 6 and not flags:
+            flags = TCP_FLAG_LETTERS["S"]
+        rows.append((
+            _timestamp(record["time"]), 0, 0, 0,
+            _int(record.get("size") or record.get("sc-bytes")),
+            6 if ":" in source else 4, protocol,
+            src_hi, src_lo, dest_hi, dest_lo,
+            _int(record.get("src-port") or record.get("c-port")),
+            _int(record.get("dst-port") or record.get("s-port")),
+            flags,
+        ))
+    return np.array(rows, dtype=PACKET_DTYPE)
+
+
+def iter_w3c_packets(reader, source_path, record_sink=None, batch_size=65536):
+    """Yield PACKET_DTYPE chunks for a W3C log read from a binary stream.
+
+    The parsed records are also written to record_sink in the same batches.
+    """
+    batch = []
+    for record in iter_w3c_records(iter_log_lines(reader, source_path)):
+        batch.append(record)
+        if len(batch) >= batch_size:
+            if record_sink:
+                record_sink.write_many(batch)
+            yield w3c_records_to_packets(batch)
+            batch = []
+    if batch:
+        if record_sink:
+            record_sink.write_many(batch)
+        yield w3c_records_to_packets(batch)
@@ -0,0 +1,70 @@
+import queue
+import threading
+
+
+class WriterPool:
+    """Pool of writer threads fed from a bounded job queue.
+
+    The traversal enqueues extraction jobs and keeps walking while the
+    workers read from the image and write the outputs. When the queue is
+    full, ``submit`` blocks, so the walker can never run far ahead of the
+    writers and memory stays capped at roughly ``max_pending`` jobs.
+    """
+
+    def __init__(self, workers=4, max_pending=64):
+        self._jobs = queue.Queue(maxsize=max_pending)
+        self._threads = []
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.failed = 0
+
+        for i in range(workers):
+            thread = threading.Thread(target=self._worker, name=f"writer-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _worker(self):
+        while True:
+            job = self._jobs.get()
+            try:
+                if job is None:
+                    return
+                func, args, kwargs = job
+                try:
+                    func(*args, **kwargs)
+                    with self._lock:
+                        self.completed += 1
+                except Exception as e:
+                    with self._lock:
+                        self.failed += 1
+                    print(f"Error in writer job {getattr(func, '__name__', func)}: {e}")
+            finally:
+                self._jobs.task_done()
+
+    def submit(self, func, *args, **kwargs):
+        """Queue a job, blocking while the queue is full."""
+        if not self._threads:
+            raise RuntimeError("WriterPool is closed")
+        self._jobs.put((func, args, kwargs))
+
+    def join(self):
+        """Wait until every queued job has finished."""
+        self._jobs.join()
+
+    def close(self):
+        """Drain the queue and stop the worker threads."""
+        if not self._threads:
+            return
+        for _ in self._threads:
+            self._jobs.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        print(f"Writer pool finished: {self.completed} jobs completed, {self.failed} failed")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False